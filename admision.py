@@ -0,0 +1,111 @@
+"""Control de admisión del servidor: tope de transferencias simultáneas y cola con prioridad."""
+import threading
+import time
+
+OP_ADMISION = 0x12
+# Código de respuesta cuando la cola está llena (el cliente reintenta más tarde)
+CODIGO_OCUPADO = 0x03
+# Prioridad de las transferencias que no la indican (menor valor = antes)
+PRIORIDAD_NORMAL = 128
+# Tamaño con el que se encolan las transferencias que no lo anunciaron
+TAMANO_DESCONOCIDO = 2 ** 64 - 1
+COLA = 32
+# Segundos máximos en la cola antes de responder ocupado
+ESPERA_MAX = 120
+# Segundos tras los que un turno pasa delante de los más pequeños (así los grandes no esperan siempre)
+ENVEJECIMIENTO = 30
+# Cada cuánto se comprueba que el cliente sigue conectado mientras espera
+INTERVALO_SONDEO = 1.0
+
+
+class _Turno:
+    __slots__ = ('prioridad', 'tamano', 'llegada', 'admitido')
+
+    def __init__(self, prioridad, tamano):
+        self.prioridad = prioridad
+        self.tamano = tamano
+        self.llegada = time.monotonic()
+        self.admitido = False
+
+    def orden(self, ahora):
+        if ahora - self.llegada >= ENVEJECIMIENTO:
+            return (-1, 0, self.llegada)
+        return (self.prioridad, self.tamano, self.llegada)
+
+
+class ControlAdmision:
+    """Deja correr como mucho `maximo` transferencias y pone en cola hasta `cola` más.
+
+    Cuando queda un hueco entra el turno con menor (prioridad, tamaño): los archivos
+    pequeños adelantan a los grandes y acaban antes, lo que baja el tiempo medio de
+    finalización con el enlace saturado. Con la cola llena entrar() devuelve False al
+    momento para que el servidor responda ocupado. El turno es del hilo que lo pidió
+    (uno por conexión), así la sesión sabe si ya lo tiene sin pasarlo de mano en mano.
+    """
+
+    def __init__(self, maximo, cola=COLA, espera_max=ESPERA_MAX):
+        self.maximo = maximo
+        self.cola = cola
+        self.espera_max = espera_max
+        self._cond = threading.Condition()
+        self._esperando = []
+        self._local = threading.local()
+        self.activas = 0
+        self.contadores = {'admitidas': 0, 'encoladas': 0, 'rechazadas': 0, 'abandonadas': 0,
+                           'segundos_en_cola': 0.0}
+
+    def dentro(self):
+        """True si el hilo actual ya tiene turno"""
+        return getattr(self._local, 'dentro', False)
+
+    def entrar(self, prioridad=PRIORIDAD_NORMAL, tamano=None, sigue_ahi=None):
+        """Espera turno. Devuelve False si la cola está llena, se agota espera_max o
+        sigue_ahi() (p. ej. el cliente cerró la conexión) deja de ser verdadero"""
+        turno = _Turno(prioridad, TAMANO_DESCONOCIDO if tamano is None else tamano)
+        with self._cond:
+            if self.activas < self.maximo:
+                self.activas += 1
+                self.contadores['admitidas'] += 1
+                self._local.dentro = True
+                return True
+            if len(self._esperando) >= self.cola:
+                self.contadores['rechazadas'] += 1
+                return False
+            self._esperando.append(turno)
+            self.contadores['encoladas'] += 1
+            limite = turno.llegada + self.espera_max
+            while not turno.admitido:
+                restante = limite - time.monotonic()
+                if restante <= 0 or (sigue_ahi is not None and not sigue_ahi()):
+                    self._esperando.remove(turno)
+                    self.contadores['rechazadas' if restante <= 0 else 'abandonadas'] += 1
+                    return False
+                self._cond.wait(min(restante, INTERVALO_SONDEO))
+            self.contadores['segundos_en_cola'] += time.monotonic() - turno.llegada
+        self._local.dentro = True
+        return True
+
+    def salir(self):
+        """Libera el turno del hilo actual (si lo tiene) y se lo pasa al siguiente de la cola"""
+        if not self.dentro():
+            return
+        self._local.dentro = False
+        with self._cond:
+            self.activas -= 1
+            ahora = time.monotonic()
+            while self._esperando and self.activas < self.maximo:
+                siguiente = min(self._esperando, key=lambda t: t.orden(ahora))
+                self._esperando.remove(siguiente)
+                siguiente.admitido = True
+                self.activas += 1
+                self.contadores['admitidas'] += 1
+            self._cond.notify_all()
+
+    def resumen(self):
+        return (f"Servidor ocupado: {self.activas} transferencias en curso y "
+                f"{len(self._esperando)} en cola, reintentar más tarde")
+
+    def estadisticas(self):
+        with self._cond:
+            return dict(self.contadores, maximo=self.maximo, cola=self.cola, activas=self.activas,
+                        en_cola=len(self._esperando))
@@ -0,0 +1,258 @@
+"""Ajuste de sockets según el BDP de cada enlace (latencia × ancho de banda de los CSV de métricas).
+
+  python ajuste.py                      # plan para cada enlace de los metricas_*.csv
+  python ajuste.py 10.0.0.2:3843 ...    # logrado frente a teórico en servidores en marcha
+"""
+import argparse
+import socket
+import threading
+import time
+
+import metricas
+from metricas import conectar_midiendo, leer_metricas
+
+# El buffer cubre dos BDP: la ventana sigue llena mientras vuelven las confirmaciones
+FACTOR_BUFFER = 2
+BUFFER_MIN = 128 * 1024
+BUFFER_MAX = 64 * 1024 * 1024
+CHUNK_MIN = 256 * 1024
+CHUNK_MAX = 4 * 1024 * 1024
+# Segundos entre relecturas de los CSV de métricas
+INTERVALO_RECARGA = 30
+# Desactiva el ajuste (los sockets quedan con los valores del sistema)
+AJUSTE_ACTIVO = True
+
+# Máximo del autoajuste de Linux para cada buffer (tercer valor de tcp_wmem / tcp_rmem)
+_SYSCTL = {socket.SO_SNDBUF: '/proc/sys/net/ipv4/tcp_wmem', socket.SO_RCVBUF: '/proc/sys/net/ipv4/tcp_rmem'}
+# Tope de lo que se puede fijar a mano con setsockopt
+_LIMITE = {socket.SO_SNDBUF: 'net.core.wmem_max', socket.SO_RCVBUF: 'net.core.rmem_max'}
+
+_lock = threading.Lock()
+_metricas = {'leidas': 0.0, 'latencias': {}, 'anchos_banda': {}}
+# (origen, destino) -> datos del ajuste y bytes/segundos logrados por este proceso
+_enlaces = {}
+
+
+def _autoajuste_max(opcion):
+    """Tope del autoajuste del kernel para la opción, o None si el sistema no lo expone"""
+    try:
+        with open(_SYSCTL[opcion]) as f:
+            return int(f.read().split()[2])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _limite_fijo(opcion):
+    try:
+        with open('/proc/sys/' + _LIMITE[opcion].replace('.', '/')) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _leer(directorio='.'):
+    with _lock:
+        if time.monotonic() - _metricas['leidas'] >= INTERVALO_RECARGA:
+            latencias, anchos_banda, _ = leer_metricas(directorio)
+            _metricas.update(leidas=time.monotonic(), latencias=latencias, anchos_banda=anchos_banda)
+        return _metricas['latencias'], _metricas['anchos_banda']
+
+
+def _valido(x):
+    return x is not None and x == x and x > 0
+
+
+def datos_enlace(origen, destino, directorio='.'):
+    """(latencia_ms, mbps) del enlace; si falta un sentido se usa el otro. None si no hay datos"""
+    latencias, anchos_banda = _leer(directorio)
+    for clave in ((origen, destino), (destino, origen)):
+        latencia, mbps = latencias.get(clave), anchos_banda.get(clave)
+        if _valido(latencia) and _valido(mbps):
+            return latencia, mbps
+    return None
+
+
+def bdp(latencia_ms, mbps):
+    """Bytes en vuelo necesarios para llenar el enlace"""
+    return int(mbps * 1e6 / 8 * latencia_ms / 1000)
+
+
+def buffer_para(bdp_bytes):
+    return min(max(FACTOR_BUFFER * bdp_bytes, BUFFER_MIN), BUFFER_MAX)
+
+
+def chunk_para(bdp_bytes):
+    """Chunk de recepción/retransmisión: potencia de dos ~ BDP/4, entre 256 KiB y 4 MiB"""
+    chunk = CHUNK_MIN
+    while chunk < bdp_bytes // 4 and chunk < CHUNK_MAX:
+        chunk *= 2
+    return chunk
+
+
+def chunk_recomendado(directorio='.'):
+    """Chunk para el enlace con más BDP de las métricas, o None si no hay ninguno medido"""
+    latencias, anchos_banda = _leer(directorio)
+    bdps = [bdp(latencias[k], anchos_banda[k]) for k in latencias
+            if _valido(latencias[k]) and _valido(anchos_banda.get(k))]
+    return chunk_para(max(bdps)) if bdps else None
+
+
+def _fijar_buffer(sock, opcion, objetivo):
+    """Fija el buffer si el autoajuste del kernel no llega al objetivo.
+
+    En Linux fijar SO_SNDBUF/SO_RCVBUF desactiva el autoajuste, que suele llegar más
+    lejos que net.core.*mem_max, así que solo se toca cuando el autoajuste se queda
+    corto. Devuelve (bytes de ventana efectivos, True si se fijó a mano).
+    """
+    maximo = _autoajuste_max(opcion)
+    if maximo is not None and maximo >= objetivo:
+        return maximo, False
+    sock.setsockopt(socket.SOL_SOCKET, opcion, objetivo)
+    efectivo = sock.getsockopt(socket.SOL_SOCKET, opcion)
+    # Linux devuelve el doble de lo pedido (la mitad es para sus estructuras)
+    return (efectivo // 2 if maximo is not None else efectivo), True
+
+
+def ajustar(sock):
+    """Ajusta un socket TCP conectado al enlace con su extremo.
+
+    TCP_NODELAY siempre: cabeceras y confirmaciones son mensajes cortos que Nagle
+    retendría. Los buffers se dimensionan con el BDP del enlace; Linux calcula la escala
+    de ventana con el máximo del sistema, así que ampliarlos ya conectado sigue valiendo.
+    Devuelve el dict del enlace, o None si no hay métricas.
+    """
+    if not AJUSTE_ACTIVO:
+        return None
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        origen, destino = sock.getsockname()[0], sock.getpeername()[0]
+        medido = datos_enlace(origen, destino)
+        if medido is None:
+            return None
+        latencia, mbps = medido
+        objetivo = buffer_para(bdp(latencia, mbps))
+        envio, envio_fijado = _fijar_buffer(sock, socket.SO_SNDBUF, objetivo)
+        recepcion, recepcion_fijado = _fijar_buffer(sock, socket.SO_RCVBUF, objetivo)
+    except OSError as e:
+        print(f"[!] No se pudo ajustar el socket: {e}")
+        return None
+
+    with _lock:
+        enlace = _enlaces.get((origen, destino))
+        if enlace is None:
+            enlace = _enlaces[(origen, destino)] = {'conexiones': 0, 'bytes': 0, 'segundos': 0.0}
+            for opcion, efectivo, fijado in ((socket.SO_SNDBUF, envio, envio_fijado),
+                                             (socket.SO_RCVBUF, recepcion, recepcion_fijado)):
+                if fijado and efectivo < objetivo:
+                    print(f"[!] Buffer hacia {destino} limitado a {efectivo} bytes de {objetivo}; "
+                          f"subir {_LIMITE[opcion]}")
+        enlace.update(latencia_ms=latencia, mbps=mbps, bdp=bdp(latencia, mbps), objetivo=objetivo,
+                      envio=envio, recepcion=recepcion, fijado=envio_fijado or recepcion_fijado)
+        enlace['conexiones'] += 1
+    return enlace
+
+
+def conectar_ajustado(direccion, timeout=None):
+    """conectar_midiendo con el socket ya ajustado al enlace"""
+    sock = conectar_midiendo(direccion, timeout)
+    ajustar(sock)
+    return sock
+
+
+def registrar_envio(sock, nbytes, segundos):
+    """metricas.registrar_envio que además acumula lo logrado por el enlace para el informe"""
+    metricas.registrar_envio(sock, nbytes, segundos)
+    if segundos <= 0:
+        return
+    try:
+        clave = (sock.getsockname()[0], sock.getpeername()[0])
+    except OSError:
+        return
+    with _lock:
+        enlace = _enlaces.setdefault(clave, {'conexiones': 0, 'bytes': 0, 'segundos': 0.0})
+        enlace['bytes'] += nbytes
+        enlace['segundos'] += segundos
+
+
+def teorico_mbps(latencia_ms, mbps, ventana):
+    """Lo que permite el enlace con esa ventana: min(ancho de banda, ventana / RTT)"""
+    return min(mbps, ventana * 8 / (latencia_ms / 1000) / 1e6)
+
+
+def informe():
+    """Una fila por enlace usado por este proceso: ajuste aplicado, teórico y logrado"""
+    filas = []
+    with _lock:
+        enlaces = [(clave, dict(enlace)) for clave, enlace in _enlaces.items()]
+    for (origen, destino), enlace in sorted(enlaces):
+        fila = {'origen': origen, 'destino': destino, 'conexiones': enlace['conexiones']}
+        if 'mbps' in enlace:
+            ventana = min(enlace['envio'], enlace['recepcion'])
+            fila.update((k, enlace[k]) for k in ('latencia_ms', 'mbps', 'bdp', 'objetivo', 'envio',
+                                                   'recepcion', 'fijado'))
+            fila['teorico_mbps'] = round(teorico_mbps(enlace['latencia_ms'], enlace['mbps'], ventana), 1)
+        if enlace['segundos'] > 0:
+            fila['logrado_mbps'] = round(enlace['bytes'] * 8 / enlace['segundos'] / 1e6, 1)
+        filas.append(fila)
+    return filas
+
+
+def _mostrar(filas):
+    print(f"{'enlace':<34}{'RTT ms':>8}{'Mbps':>8}{'BDP KiB':>9}{'buffer KiB':>11}"
+          f"{'teórico':>9}{'logrado':>9}{'%':>6}")
+    for f in filas:
+        enlace = f"{f['origen']} -> {f['destino']}"
+        if 'mbps' not in f:
+            print(f"{enlace:<34}{'(sin métricas)':>36}{f.get('logrado_mbps', 0):>18.1f}")
+            continue
+        buffer = f"{min(f['envio'], f['recepcion']) // 1024}{'' if f['fijado'] else ' a'}"
+        linea = (f"{enlace:<34}{f['latencia_ms']:>8.1f}{f['mbps']:>8.1f}{f['bdp'] // 1024:>9}{buffer:>11}"
+                 f"{f['teorico_mbps']:>9.1f}")
+        if 'logrado_mbps' in f:
+            linea += f"{f['logrado_mbps']:>9.1f}{100 * f['logrado_mbps'] / f['teorico_mbps']:>6.0f}"
+        print(linea)
+
+
+def plan(directorio='.'):
+    """Filas del informe para todos los enlaces de los CSV, sin conexiones (lo que se aplicaría)"""
+    latencias, anchos_banda, _ = leer_metricas(directorio)
+    filas = []
+    for (origen, destino), latencia in sorted(latencias.items()):
+        mbps = anchos_banda.get((origen, destino))
+        if not (_valido(latencia) and _valido(mbps)):
+            continue
+        objetivo = buffer_para(bdp(latencia, mbps))
+        ventanas = []
+        fijado = False
+        for opcion in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+            maximo = _autoajuste_max(opcion)
+            if maximo is not None and maximo >= objetivo:
+                ventanas.append(maximo)
+            else:
+                ventanas.append(min(objetivo, _limite_fijo(opcion) or objetivo))
+                fijado = True
+        filas.append({'origen': origen, 'destino': destino, 'latencia_ms': latencia, 'mbps': mbps,
+                      'bdp': bdp(latencia, mbps), 'objetivo': objetivo, 'envio': ventanas[0],
+                      'recepcion': ventanas[1], 'fijado': fijado,
+                      'teorico_mbps': round(teorico_mbps(latencia, mbps, min(ventanas)), 1)})
+    return filas
+
+
+if __name__ == '__main__':
+    from estadisticas import consultar
+
+    parser = argparse.ArgumentParser(description="Ajuste de sockets por BDP: plan y logrado frente a teórico")
+    parser.add_argument("servidores", nargs='*', help="Servidores como ip:puerto; sin ellos se muestra el plan")
+    parser.add_argument("--dir", default='.', help="Directorio con los metricas_*.csv")
+    args = parser.parse_args()
+    if not args.servidores:
+        print(f"Plan de ajuste ('a' = autoajuste del kernel; chunk recomendado: {chunk_recomendado(args.dir)})")
+        _mostrar(plan(args.dir))
+    for servidor in args.servidores:
+        try:
+            datos = consultar(servidor)
+        except Exception as e:
+            print(f"== {servidor}: sin respuesta ({e}) ==")
+            continue
+        print(f"== {servidor} (chunk {datos.get('chunk', '?')}) ==")
+        _mostrar(datos.get('ajuste', []))
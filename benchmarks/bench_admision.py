@@ -0,0 +1,99 @@
+"""
+Ráfaga de envíos a un mismo servidor con y sin control de admisión.
+
+  python benchmarks/bench_admision.py --clientes 16 --mbps 200
+
+Todos los clientes empiezan a la vez contra un servidor cuyo enlace de entrada
+(--mbps, CubetaTokens) comparten, cada uno con un archivo de tamaño aleatorio entre
+--tam-min y --tam-max. Sin límite, todas las transferencias se reparten el enlace y
+casi todas terminan al final de la ráfaga. Con --max-transferencias el servidor deja
+pasar unas pocas y ordena la cola por tamaño, así cada una termina en cuanto le toca
+y baja el tiempo medio de finalización. El último modo usa una cola corta para que
+parte de los clientes reciba "ocupado" y reintente con espera exponencial.
+"""
+import argparse
+import filecmp
+import os
+import random
+import tempfile
+import threading
+import time
+
+from comun import CubetaTokens, ProxyLimitado, crear_archivo, detener, lanzar_servidor, puerto_libre
+
+import cliente
+from cliente import enviar_archivo
+from estadisticas import consultar
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del control de admisión del servidor")
+    parser.add_argument("--clientes", type=int, default=16, help="Clientes que envían a la vez")
+    parser.add_argument("--tam-min", type=int, default=1024 * 1024, help="Bytes mínimos de cada archivo")
+    parser.add_argument("--tam-max", type=int, default=8 * 1024 * 1024, help="Bytes máximos de cada archivo")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--mbps", type=float, default=200, help="Tasa del enlace de entrada del servidor")
+    parser.add_argument("--max", type=int, default=2, help="--max-transferencias del servidor con admisión")
+    args = parser.parse_args()
+
+    modos = [("sin límite", ()),
+             (f"admisión {args.max}", ("--max-transferencias", str(args.max))),
+             (f"admisión {args.max}, cola 4", ("--max-transferencias", str(args.max), "--cola", "4"))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        origen = os.path.join(tmp, "origen")
+        os.mkdir(origen)
+        azar = random.Random(args.semilla)
+        tamanos = [azar.randint(args.tam_min, args.tam_max) for _ in range(args.clientes)]
+        archivos = [crear_archivo(os.path.join(origen, f"archivo{i}.bin"), t) for i, t in enumerate(tamanos)]
+        mitad = sorted(tamanos)[len(tamanos) // 2]
+
+        resultados = {}
+        for modo, extra in modos:
+            destino = os.path.join(tmp, f"destino{len(resultados)}")
+            os.mkdir(destino)
+            puerto = puerto_libre()
+            proc = lanzar_servidor(puerto, destino, extra=extra)
+            proxy = ProxyLimitado(f"127.0.0.1:{puerto}", cubeta=CubetaTokens(args.mbps))
+            host, puerto_proxy = proxy.direccion.split(':')
+            tiempos = {}
+            inicio = time.perf_counter()
+
+            def enviar(archivo):
+                try:
+                    enviar_archivo(host, int(puerto_proxy), archivo, reintentos=0)
+                    tiempos[archivo] = time.perf_counter() - inicio
+                except Exception as e:
+                    print(f"[ERROR] {os.path.basename(archivo)}: {e}")
+
+            hilos = [threading.Thread(target=enviar, args=(a,)) for a in archivos]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            total = time.perf_counter() - inicio
+
+            for a in tiempos:
+                assert filecmp.cmp(a, os.path.join(destino, os.path.basename(a)), shallow=False)
+            admision = consultar(f"127.0.0.1:{puerto}").get('admision', {})
+            cliente.POOL.cerrar_todo()
+            proxy.cerrar()
+            detener(proc)
+
+            pequenos = [t for a, t in tiempos.items() if os.path.getsize(a) < mitad]
+            grandes = [t for a, t in tiempos.items() if os.path.getsize(a) >= mitad]
+            resultados[modo] = (sum(tiempos.values()) / max(len(tiempos), 1),
+                                sum(pequenos) / max(len(pequenos), 1),
+                                sum(grandes) / max(len(grandes), 1),
+                                total, len(archivos) - len(tiempos), admision.get('rechazadas', 0))
+
+    print()
+    print(f"{args.clientes} archivos de {args.tam_min} a {args.tam_max} bytes a la vez, enlace de {args.mbps} Mbps "
+          f"(segundos hasta terminar; pequeños/grandes: por debajo/encima de la mediana)")
+    print(f"{'modo':<22}{'media':>8}{'pequeños':>10}{'grandes':>9}{'total':>8}{'fallos':>8}{'ocupado':>9}")
+    for modo, (media, pequenos, grandes, total, fallos, ocupado) in resultados.items():
+        print(f"{modo:<22}{media:>8.2f}{pequenos:>10.2f}{grandes:>9.2f}{total:>8.2f}{fallos:>8}{ocupado:>9}")
+
+
+if __name__ == '__main__':
+    main()
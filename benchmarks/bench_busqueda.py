@@ -0,0 +1,108 @@
+"""
+Consultas punto a punto en un overlay grande: Dijkstra, bidireccional y ALT.
+
+  python benchmarks/bench_busqueda.py --nodos 20000 --consultas 50 --referencias 8
+
+Los nodos se reparten en un plano y cada uno enlaza con sus --vecinos más cercanos más
+algún enlace largo al azar; la latencia es proporcional a la distancia, como en un
+overlay real repartido por regiones. Para cada consulta se cuentan los nodos cerrados
+y el tiempo de dijkstra.dijkstra (sobre el DiGraph y sobre el CSR), de la búsqueda
+bidireccional y de ALT. El precálculo de las referencias se mide aparte: se hace una
+vez por instantánea de métricas.
+"""
+import argparse
+import random
+import statistics
+import time
+
+import networkx as nx
+import numpy as np
+
+import comun  # añade la raíz del repo al path
+from busqueda import Referencias, alt_csr, dijkstra_bidireccional_csr
+from dijkstra import dijkstra
+from grafo_csr import GrafoCSR, dijkstra_csr
+
+
+def overlay(nodos, vecinos, largos, semilla):
+    azar = np.random.default_rng(semilla)
+    puntos = azar.random((nodos, 2)) * 1000
+    origenes, destinos = [], []
+    for inicio in range(0, nodos, 1000):
+        bloque = puntos[inicio:inicio + 1000]
+        distancias = ((bloque[:, None, :] - puntos[None, :, :]) ** 2).sum(axis=2)
+        cercanos = np.argpartition(distancias, vecinos + 1, axis=1)[:, :vecinos + 1]
+        for i, fila in enumerate(cercanos, start=inicio):
+            for j in fila:
+                if j != i:
+                    origenes.append(i)
+                    destinos.append(int(j))
+    for _ in range(largos * nodos // 100):
+        i, j = azar.integers(nodos, size=2)
+        origenes.append(int(i))
+        destinos.append(int(j))
+    grafo = nx.DiGraph()
+    nombres = [f"n{i}" for i in range(nodos)]
+    grafo.add_nodes_from(nombres)
+    for i, j in zip(origenes, destinos):
+        latencia = 1 + float(np.hypot(*(puntos[i] - puntos[j]))) / 10
+        grafo.add_edge(nombres[i], nombres[j], weight=latencia)
+        grafo.add_edge(nombres[j], nombres[i], weight=latencia)
+    return grafo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsquedas punto a punto")
+    parser.add_argument("--nodos", type=int, default=20000)
+    parser.add_argument("--vecinos", type=int, default=4, help="Enlaces con los nodos más cercanos")
+    parser.add_argument("--largos", type=int, default=1, help="Enlaces largos al azar por cada 100 nodos")
+    parser.add_argument("--consultas", type=int, default=50)
+    parser.add_argument("--referencias", type=int, default=8)
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    grafo = overlay(args.nodos, args.vecinos, args.largos, args.semilla)
+    g = GrafoCSR.desde_networkx(grafo)
+    g.invertido()
+    inicio = time.perf_counter()
+    referencias = Referencias(g, args.referencias)
+    t_referencias = time.perf_counter() - inicio
+
+    azar = random.Random(args.semilla)
+    pares = [(azar.randrange(g.n), azar.randrange(g.n)) for _ in range(args.consultas)]
+    variantes = [
+        ("dijkstra (DiGraph)", None),
+        ("dijkstra (CSR)", lambda o, d, e: dijkstra_csr(g, o, d, e)),
+        ("bidireccional", lambda o, d, e: dijkstra_bidireccional_csr(g, o, d, e)),
+        ("ALT", lambda o, d, e: alt_csr(g, referencias, o, d, e)),
+    ]
+    resultados = {}
+    costos = {}
+    for nombre, funcion in variantes:
+        tiempos, asentados, costos[nombre] = [], [], []
+        for o, d in pares:
+            estadisticas = {}
+            inicio = time.perf_counter()
+            if funcion is None:
+                _, costo = dijkstra(grafo, g.nodos[o], g.nodos[d])
+            else:
+                _, costo = funcion(o, d, estadisticas)
+            tiempos.append(time.perf_counter() - inicio)
+            asentados.append(estadisticas.get('asentados'))
+            costos[nombre].append(costo)
+        resultados[nombre] = (statistics.median(tiempos) * 1000, statistics.mean(tiempos) * 1000,
+                              statistics.mean(asentados) if asentados[0] is not None else None)
+    for nombre in costos:
+        assert all(abs(a - b) < 1e-6 for a, b in zip(costos[nombre], costos["dijkstra (CSR)"])), nombre
+
+    print()
+    print(f"{g.n} nodos, {len(g.destinos)} aristas, {args.consultas} consultas; "
+          f"{len(referencias.indices)} referencias precalculadas en {t_referencias * 1000:.0f} ms")
+    print(f"{'variante':<22}{'mediana ms':>12}{'media ms':>10}{'nodos cerrados':>16}")
+    for nombre, (mediana, media, asentados) in resultados.items():
+        cerrados = f"{asentados:.0f}" if asentados is not None else "-"
+        print(f"{nombre:<22}{mediana:>12.2f}{media:>10.2f}{cerrados:>16}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Caché de contenido en un relay central: el mismo artefacto enviado a varios destinos.
+
+  python benchmarks/bench_cache.py --destinos 5 --tamano 16777216 --mbps 100
+
+Topología: A --(enlace lento, --mbps)--> R --> D1..Dn. Se manda el mismo archivo de A
+a cada destino pasando por R, primero con R sin caché y luego con R con caché
+(--cache-mb). Se mide el tiempo total, los bytes que cruzan el enlace A-R y los
+contadores de la caché. Al final se pide el contenido a R por su clave
+(OP_REQUEST 'sha256:<clave>').
+"""
+import argparse
+import filecmp
+import os
+import socket
+import struct
+import tempfile
+import time
+
+from comun import ProxyLimitado, crear_archivo, detener, lanzar_servidor, puerto_libre
+
+from cliente import enviar_por_relay_cache
+from estadisticas import consultar
+from manifiesto import clave_contenido, manifiesto_de
+from transporte import recv_all
+
+
+def pedir_por_clave(puerto, clave, destino):
+    nombre = f"sha256:{clave.hex()}".encode()
+    with socket.create_connection(('127.0.0.1', puerto)) as sock:
+        sock.sendall(struct.pack(">BI", 0x01, len(nombre)) + nombre)
+        assert ord(recv_all(sock, 1)) == 0x02, "El relay no tiene el contenido"
+        recv_all(sock, struct.unpack(">I", recv_all(sock, 4))[0])
+        tamano = struct.unpack(">Q", recv_all(sock, 8))[0]
+        with open(destino, 'wb') as f:
+            f.write(recv_all(sock, tamano))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la caché de contenido del relay")
+    parser.add_argument("--destinos", type=int, default=5, help="Destinos que reciben el mismo archivo")
+    parser.add_argument("--tamano", type=int, default=16 * 1024 * 1024, help="Bytes del archivo")
+    parser.add_argument("--mbps", type=float, default=100, help="Tasa del enlace A-R")
+    parser.add_argument("--cache-mb", type=float, default=256, help="Tope de la caché del relay")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        destinos = [f"D{i}" for i in range(1, args.destinos + 1)]
+        dirs = {n: os.path.join(tmp, n) for n in ["R"] + destinos}
+        puertos = {n: puerto_libre() for n in dirs}
+        for d in dirs.values():
+            os.mkdir(d)
+        procesos = [lanzar_servidor(puertos[n], dirs[n]) for n in destinos]
+        archivo = crear_archivo(os.path.join(tmp, "artefacto.bin"), args.tamano)
+
+        resultados = {}
+        for modo, extra in (("sin caché", ()), ("con caché", ("--cache-mb", str(args.cache_mb)))):
+            relay = lanzar_servidor(puertos["R"], dirs["R"], extra=extra)
+            proxy = ProxyLimitado(f"127.0.0.1:{puertos['R']}", args.mbps)
+            host, puerto = proxy.direccion.split(':')
+            inicio = time.perf_counter()
+            for n in destinos:
+                assert enviar_por_relay_cache(host, int(puerto), archivo, [f"127.0.0.1:{puertos[n]}"])
+                destino = os.path.join(dirs[n], "artefacto.bin")
+                assert filecmp.cmp(archivo, destino, shallow=False)
+                os.remove(destino)
+            resultados[modo] = (time.perf_counter() - inicio, proxy.bytes_ida)
+            proxy.cerrar()
+            if modo == "con caché":
+                copia = os.path.join(tmp, "desde_cache.bin")
+                pedir_por_clave(puertos["R"], clave_contenido(manifiesto_de(archivo)), copia)
+                assert filecmp.cmp(archivo, copia, shallow=False)
+                # El relay guarda los contadores de búsquedas cada tanto: se piden en vivo
+                estadisticas = consultar(f"127.0.0.1:{puertos['R']}")['cache']
+            detener(relay)
+
+        for proc in procesos:
+            detener(proc)
+
+    print()
+    print(f"{args.destinos} destinos, archivo de {args.tamano} bytes, enlace A-R de {args.mbps} Mbps")
+    print(f"{'modo':<12}{'segundos':>10}{'bytes A-R':>14}")
+    for modo, (duracion, bytes_ar) in resultados.items():
+        print(f"{modo:<12}{duracion:>10.2f}{bytes_ar:>14}")
+    print(f"Caché del relay: {estadisticas}")
+
+
+if __name__ == '__main__':
+    main()
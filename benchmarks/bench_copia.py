@@ -0,0 +1,114 @@
+"""
+Mide bytes/segundo de cada ruta de copia del servidor sobre sockets locales.
+
+  python benchmarks/bench_copia.py --tamano 268435456
+
+- servir: f.read(4096)+sendall (anterior) contra sendfile
+- retransmitir: recv de 4 KiB + sendall (anterior) contra recv_into con buffer
+  reutilizado y contra splice (Linux)
+"""
+import argparse
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from comun import crear_archivo
+
+import transporte
+
+
+def par_tcp():
+    """Dos sockets TCP conectados por loopback (sendfile/splice no aplican a socketpair AF_UNIX en todos los sistemas)"""
+    with socket.socket() as escucha:
+        escucha.bind(('127.0.0.1', 0))
+        escucha.listen(1)
+        a = socket.create_connection(escucha.getsockname())
+        b, _ = escucha.accept()
+    return a, b
+
+
+def drenar(sock, total):
+    buffer = memoryview(bytearray(1024 * 1024))
+    while total > 0:
+        n = sock.recv_into(buffer, min(len(buffer), total))
+        if not n:
+            break
+        total -= n
+
+
+def medir(nombre, tamano, funcion):
+    inicio = time.perf_counter()
+    funcion()
+    duracion = time.perf_counter() - inicio
+    print(f"{nombre:<28}{tamano / duracion / 1e6:>12.1f} MB/s")
+
+
+def servir_legacy(sock, ruta):
+    with open(ruta, 'rb') as f:
+        while chunk := f.read(4096):
+            sock.sendall(chunk)
+
+
+def servir_sendfile(sock, ruta):
+    with open(ruta, 'rb') as f:
+        transporte.enviar_desde_archivo(sock, f)
+
+
+def relay_legacy(origen, destino, total):
+    while total > 0:
+        chunk = b''
+        pedir = min(4096, total)
+        while len(chunk) < pedir:
+            chunk += origen.recv(pedir - len(chunk))
+        destino.sendall(chunk)
+        total -= len(chunk)
+
+
+def prueba_servir(ruta, tamano, funcion):
+    a, b = par_tcp()
+    receptor = threading.Thread(target=drenar, args=(b, tamano))
+    receptor.start()
+    funcion(a, ruta)
+    receptor.join()
+    a.close()
+    b.close()
+
+
+def prueba_relay(ruta, tamano, funcion):
+    # emisor -> (a, b) -> relay -> (c, d) -> receptor
+    a, b = par_tcp()
+    c, d = par_tcp()
+    emisor = threading.Thread(target=servir_sendfile, args=(a, ruta))
+    receptor = threading.Thread(target=drenar, args=(d, tamano))
+    emisor.start()
+    receptor.start()
+    funcion(b, c, tamano)
+    emisor.join()
+    receptor.join()
+    for s in (a, b, c, d):
+        s.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de rutas de copia (sendfile/splice/recv_into)")
+    parser.add_argument("--tamano", type=int, default=256 * 1024 * 1024, help="Bytes a transferir")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = crear_archivo(os.path.join(tmp, 'origen.bin'), args.tamano)
+        medir("servir read+sendall 4K", args.tamano, lambda: prueba_servir(ruta, args.tamano, servir_legacy))
+        medir("servir sendfile", args.tamano, lambda: prueba_servir(ruta, args.tamano, servir_sendfile))
+        medir("relay recv 4K+sendall", args.tamano, lambda: prueba_relay(ruta, args.tamano, relay_legacy))
+        medir("relay recv_into 1M", args.tamano,
+              lambda: prueba_relay(ruta, args.tamano, transporte._retransmitir_buffer))
+        if hasattr(os, 'splice'):
+            medir("relay splice", args.tamano, lambda: prueba_relay(ruta, args.tamano, transporte.retransmitir))
+        print("\nAcumulado por ruta en transporte:")
+        for nombre, (nbytes, segundos, tasa) in transporte.tasas().items():
+            print(f"  {nombre:<12}{nbytes:>14} bytes{tasa / 1e6:>10.1f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Reenvío de un archivo modificado: envío completo contra delta estilo rsync.
+
+  python benchmarks/bench_delta.py --tamano 134217728 --cambios 5 --mbps 200
+
+Topología: A --(enlace medido)--> B (relay) --> D. El destino D ya tiene la versión
+anterior del archivo; A tiene una copia con --cambios ediciones de pocos KB
+(sobrescrituras, inserciones y borrados). Se mide el tiempo y los bytes que cruzan
+el enlace A-B en cada sentido, incluidas las firmas que devuelve D.
+"""
+import argparse
+import filecmp
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from comun import ProxyLimitado, crear_archivo, detener, lanzar_servidor, puerto_libre
+
+import cliente
+from cliente import enviar_por_ruta, sincronizar_archivo
+from delta import ruta_cache_firmas
+
+
+def modificar(origen, destino, cambios, azar):
+    datos = bytearray(open(origen, 'rb').read())
+    for _ in range(cambios):
+        pos = azar.randrange(len(datos))
+        tipo = azar.choice(("sobrescribir", "insertar", "borrar"))
+        largo = azar.randint(1, 4096)
+        if tipo == "sobrescribir":
+            datos[pos:pos + largo] = os.urandom(len(datos[pos:pos + largo]))
+        elif tipo == "insertar":
+            datos[pos:pos] = os.urandom(largo)
+        else:
+            del datos[pos:pos + largo]
+    with open(destino, 'wb') as f:
+        f.write(datos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de envío delta contra envío completo")
+    parser.add_argument("--tamano", type=int, default=64 * 1024 * 1024, help="Bytes del archivo original")
+    parser.add_argument("--cambios", type=int, default=5, help="Ediciones de hasta 4 KiB")
+    parser.add_argument("--mbps", type=float, default=200, help="Tasa del enlace A-B")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dirs = {n: os.path.join(tmp, n) for n in "BD"}
+        puertos = {n: puerto_libre() for n in "BD"}
+        procesos = []
+        for n in "BD":
+            os.mkdir(dirs[n])
+            procesos.append(lanzar_servidor(puertos[n], dirs[n]))
+        proxy = ProxyLimitado(f"127.0.0.1:{puertos['B']}", args.mbps)
+        host, puerto = proxy.direccion.split(':')
+        ruta = [f"127.0.0.1:{puertos['D']}"]
+
+        anterior = crear_archivo(os.path.join(tmp, "anterior.bin"), args.tamano)
+        os.mkdir(os.path.join(tmp, "A"))
+        archivo = os.path.join(tmp, "A", "datos.bin")
+        modificar(anterior, archivo, args.cambios, random.Random(args.semilla))
+        copia_d = os.path.join(dirs["D"], "datos.bin")
+
+        def medir(enviar):
+            # copy2 conserva el mtime: la segunda pasada delta reutiliza las firmas guardadas
+            shutil.copy2(anterior, copia_d)
+            cliente.POOL.cerrar_todo()
+            proxy.bytes_ida = proxy.bytes_vuelta = 0
+            inicio = time.perf_counter()
+            assert enviar()
+            duracion = time.perf_counter() - inicio
+            assert filecmp.cmp(archivo, copia_d, shallow=False)
+            return duracion, proxy.bytes_ida, proxy.bytes_vuelta
+
+        resultados = {
+            "completo": medir(lambda: enviar_por_ruta(host, int(puerto), archivo, ruta)),
+            "delta (firmas en frío)": medir(lambda: sincronizar_archivo(host, int(puerto), archivo, ruta)),
+        }
+        assert os.path.exists(ruta_cache_firmas(copia_d))
+        resultados["delta (firmas en caché)"] = medir(lambda: sincronizar_archivo(host, int(puerto), archivo, ruta))
+
+        proxy.cerrar()
+        for proc in procesos:
+            detener(proc)
+
+    print()
+    print(f"Archivo de {args.tamano} bytes con {args.cambios} cambios, enlace A-B de {args.mbps} Mbps")
+    print(f"{'modo':<26}{'segundos':>10}{'bytes ida':>14}{'bytes vuelta':>14}{'ahorro':>9}")
+    base = resultados["completo"][1] + resultados["completo"][2]
+    for nombre, (duracion, ida, vuelta) in resultados.items():
+        ahorro = 100 * (1 - (ida + vuelta) / base)
+        print(f"{nombre:<26}{duracion:>10.2f}{ida:>14}{vuelta:>14}{ahorro:>8.1f}%")
+
+
+if __name__ == '__main__':
+    main()
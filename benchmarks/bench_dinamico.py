@@ -0,0 +1,81 @@
+"""
+Árbol de caminos mínimos dinámico frente a recalcular todo tras cada cambio de enlace.
+
+  python benchmarks/bench_dinamico.py --nodos 100,1000,10000 --cambios 200
+
+Usa la topología aleatoria de bench_grafos.py. En cada tamaño aplica --cambios
+actualizaciones de un solo enlace: la mitad sobre enlaces del árbol (son las que obligan
+a reparar un subárbol al subir) y la otra mitad al azar, con el peso multiplicado por un
+factor entre 0.5 y 2. Mide el tiempo medio de RutasDinamicas.actualizar y los nodos que
+toca, frente a un Dijkstra completo desde el origen (RutasDinamicas.recalcular y
+nx.single_source_dijkstra_path_length). Al final comprueba que las distancias
+coincidan con las recalculadas.
+"""
+import argparse
+import random
+import statistics
+import time
+
+import networkx as nx
+
+import comun  # añade la raíz del repo al path
+from bench_grafos import topologia
+from rutas_dinamicas import RutasDinamicas
+
+
+def medir(nodos, grado, cambios, semilla):
+    grafo = topologia(nodos, grado, semilla)
+    origen = next(iter(grafo.nodes))
+    rutas = RutasDinamicas(grafo, origen)
+    azar = random.Random(semilla)
+    aristas = list(grafo.edges)
+    nombres = list(grafo.nodes)
+
+    tiempos, tocados = [], []
+    for i in range(cambios):
+        if i % 2 == 0:
+            v = azar.choice(nombres)
+            while rutas.padres[v] is None:
+                v = azar.choice(nombres)
+            u = rutas.padres[v]
+        else:
+            u, v = azar.choice(aristas)
+        peso = grafo[u][v]['weight'] * azar.uniform(0.5, 2)
+        inicio = time.perf_counter()
+        rutas.actualizar(u, v, peso)
+        tiempos.append(time.perf_counter() - inicio)
+        tocados.append(rutas.reparados)
+
+    distancias = dict(rutas.distancias)
+    inicio = time.perf_counter()
+    rutas.recalcular()
+    t_recalcular = time.perf_counter() - inicio
+    assert all(abs(distancias[n] - rutas.distancias[n]) < 1e-6 for n in grafo.nodes)
+    inicio = time.perf_counter()
+    nx.single_source_dijkstra_path_length(grafo, origen)
+    t_nx = time.perf_counter() - inicio
+    return (statistics.mean(tiempos), statistics.median(tiempos), statistics.mean(tocados),
+            t_recalcular, t_nx)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de caminos mínimos dinámicos")
+    parser.add_argument("--nodos", default="100,1000,10000", help="Tamaños separados por comas")
+    parser.add_argument("--grado", type=int, default=4, help="Enlaces que abre cada nodo")
+    parser.add_argument("--cambios", type=int, default=200, help="Actualizaciones de enlace por tamaño")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    filas = [(int(n), medir(int(n), args.grado, args.cambios, args.semilla)) for n in args.nodos.split(',')]
+
+    print()
+    print(f"{args.cambios} cambios de un enlace por tamaño (ms)")
+    print(f"{'nodos':>8}{'actualizar media':>18}{'mediana':>10}{'nodos tocados':>15}"
+          f"{'recalcular':>12}{'networkx':>10}{'aceleración':>13}")
+    for n, (media, mediana, tocados, recalcular, t_nx) in filas:
+        print(f"{n:>8}{media * 1000:>18.3f}{mediana * 1000:>10.3f}{tocados:>15.1f}"
+              f"{recalcular * 1000:>12.2f}{t_nx * 1000:>10.2f}{recalcular / media:>12.0f}x")
+
+
+if __name__ == '__main__':
+    main()
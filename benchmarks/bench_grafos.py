@@ -0,0 +1,155 @@
+"""
+Dijkstra y Kruskal sobre topologías grandes: versión anterior, CSR y networkx.
+
+  python benchmarks/bench_grafos.py --nodos 10000 --grado 6 --consultas 20
+
+Genera una topología de overlay aleatoria (cada nodo con --grado enlaces de ida y
+vuelta con la misma latencia) como DiGraph y mide:
+- Dijkstra entre --consultas pares al azar: la versión anterior (dicts sobre todos los
+  nodos por llamada, camino con insert(0)), dijkstra.dijkstra sobre el DiGraph, sobre un
+  GrafoCSR ya convertido, y nx.dijkstra_path_length.
+- Kruskal: la versión anterior (to_undirected y grafo nuevo), kruskal.kruskal (que
+  convierte a CSR por dentro), kruskal_csr sobre el CSR y nx.minimum_spanning_tree.
+Se comprueba que todas den los mismos costos y el mismo peso total del árbol.
+"""
+import argparse
+import heapq
+import random
+import time
+
+import networkx as nx
+
+import comun  # añade la raíz del repo al path
+from dijkstra import dijkstra
+from grafo_csr import GrafoCSR, kruskal_csr
+from kruskal import kruskal
+
+
+def dijkstra_anterior(grafo, origen, destino):
+    distancias = {nodo: float('inf') for nodo in grafo.nodes}
+    previos = {nodo: None for nodo in grafo.nodes}
+    distancias[origen] = 0
+    heap = [(0, origen)]
+    visitados = set()
+    while heap:
+        distancia_actual, nodo_actual = heapq.heappop(heap)
+        if nodo_actual in visitados:
+            continue
+        visitados.add(nodo_actual)
+        if nodo_actual == destino:
+            break
+        for vecino in grafo[nodo_actual]:
+            peso = grafo[nodo_actual][vecino].get('weight', 1)
+            nueva_dist = distancia_actual + peso
+            if nueva_dist < distancias[vecino]:
+                distancias[vecino] = nueva_dist
+                previos[vecino] = nodo_actual
+                heapq.heappush(heap, (nueva_dist, vecino))
+    if distancias[destino] == float('inf'):
+        return None, float('inf')
+    camino = []
+    nodo = destino
+    while nodo:
+        camino.insert(0, nodo)
+        nodo = previos[nodo]
+    return camino, distancias[destino]
+
+
+def kruskal_anterior(grafo):
+    edges = [(u, v, d['weight']) for u, v, d in grafo.to_undirected().edges(data=True)]
+    edges.sort(key=lambda x: x[2])
+    parent = {nodo: nodo for nodo in grafo.nodes}
+
+    def find(n):
+        while parent[n] != n:
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+
+    mst = nx.Graph()
+    mst.add_nodes_from(grafo.nodes)
+    for u, v, peso in edges:
+        ru, rv = find(u), find(v)
+        if ru != rv:
+            parent[rv] = ru
+            datos = grafo.get_edge_data(u, v) or grafo.get_edge_data(v, u)
+            mst.add_edge(u, v, **datos)
+    return mst
+
+
+def topologia(nodos, grado, semilla):
+    azar = random.Random(semilla)
+    grafo = nx.DiGraph()
+    nombres = [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(nodos)]
+    grafo.add_nodes_from(nombres)
+    # Un anillo asegura que todo es alcanzable; el resto de enlaces es al azar
+    for i, u in enumerate(nombres):
+        enlaces = [nombres[(i + 1) % nodos]] + azar.sample(nombres, grado - 1)
+        for v in enlaces:
+            if u != v:
+                latencia = azar.uniform(5, 200)
+                grafo.add_edge(u, v, weight=latencia)
+                grafo.add_edge(v, u, weight=latencia)
+    return grafo
+
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def peso_total(mst):
+    return sum(d['weight'] for _, _, d in mst.edges(data=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de Dijkstra y Kruskal sobre CSR")
+    parser.add_argument("--nodos", type=int, default=10000)
+    parser.add_argument("--grado", type=int, default=6, help="Enlaces que abre cada nodo")
+    parser.add_argument("--consultas", type=int, default=20, help="Pares origen-destino para Dijkstra")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    grafo = topologia(args.nodos, args.grado, args.semilla)
+    azar = random.Random(args.semilla)
+    pares = [tuple(azar.sample(list(grafo.nodes), 2)) for _ in range(args.consultas)]
+    csr, t_convertir = cronometrar(GrafoCSR.desde_networkx, grafo)
+
+    tiempos = {}
+    costos = {}
+    variantes = [("anterior", lambda o, d: dijkstra_anterior(grafo, o, d)[1]),
+                 ("dijkstra (DiGraph)", lambda o, d: dijkstra(grafo, o, d)[1]),
+                 ("dijkstra (CSR)", lambda o, d: dijkstra(csr, o, d)[1]),
+                 ("networkx", lambda o, d: nx.dijkstra_path_length(grafo, o, d))]
+    for nombre, funcion in variantes:
+        inicio = time.perf_counter()
+        costos[nombre] = [funcion(o, d) for o, d in pares]
+        tiempos[nombre] = time.perf_counter() - inicio
+    for nombre in costos:
+        assert all(abs(a - b) < 1e-6 for a, b in zip(costos[nombre], costos["networkx"])), nombre
+
+    arboles = {}
+    tiempos_k = {}
+    arboles["anterior"], tiempos_k["anterior"] = cronometrar(kruskal_anterior, grafo)
+    arboles["kruskal"], tiempos_k["kruskal"] = cronometrar(kruskal, grafo)
+    aristas, tiempos_k["kruskal_csr"] = cronometrar(kruskal_csr, csr)
+    arboles["networkx"], tiempos_k["networkx"] = cronometrar(
+        lambda: nx.minimum_spanning_tree(grafo.to_undirected(), algorithm='kruskal'))
+    pesos = {nombre: peso_total(a) for nombre, a in arboles.items()}
+    pesos["kruskal_csr"] = sum(w for _, _, w in aristas)
+    for nombre, peso in pesos.items():
+        assert abs(peso - pesos["networkx"]) < 1e-6 * pesos["networkx"], nombre
+
+    print()
+    print(f"{args.nodos} nodos, {grafo.number_of_edges()} aristas; conversión a CSR: {t_convertir * 1000:.0f} ms")
+    print(f"Dijkstra, {args.consultas} consultas (ms por consulta)")
+    for nombre, t in tiempos.items():
+        print(f"  {nombre:<22}{t * 1000 / args.consultas:>10.2f}")
+    print(f"Kruskal (ms), peso total {pesos['networkx']:.1f}")
+    for nombre in ("anterior", "kruskal", "kruskal_csr", "networkx"):
+        print(f"  {nombre:<22}{tiempos_k[nombre] * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Lote de transferencias: cada una por su ruta de Dijkstra frente al reparto de planificador_lotes.
+
+  python benchmarks/bench_lotes.py --nodos 30 --trabajos 200
+
+Genera un overlay con enlaces de ida y vuelta de 10 a 1000 Mbps y --trabajos envíos
+desde un mismo origen a destinos al azar, con tamaños de 1 MB a 1 GB (log-uniforme).
+Compara el tiempo en que termina el lote según la carga de cada enlace (bytes /
+capacidad del enlace más cargado) cuando:
+- cada trabajo va entero por dijkstra sobre weight = 1/ancho_banda (lo que hace hoy
+  cada envío por su cuenta),
+- cada trabajo va entero por su camino más ancho (planificador.camino_mas_ancho),
+- el lote se planifica junto con planificador_lotes.planificar_lote.
+Junto a cada tiempo se muestra la cota por flujo máximo, que ningún reparto puede bajar.
+No hay envíos reales: es el modelo de carga que usa el planificador.
+"""
+import argparse
+import random
+import time
+
+import networkx as nx
+
+import comun  # añade la raíz del repo al path
+from dijkstra import dijkstra
+from planificador import camino_mas_ancho, enlaces
+from planificador_lotes import capacidades_de, cota_flujo, planificar_lote
+
+
+def overlay(nodos, grado, semilla):
+    azar = random.Random(semilla)
+    grafo = nx.DiGraph()
+    nombres = [f"10.0.{i // 256}.{i % 256}" for i in range(nodos)]
+    grafo.add_nodes_from(nombres)
+    for i, u in enumerate(nombres):
+        for v in [nombres[(i + 1) % nodos]] + azar.sample(nombres, grado - 1):
+            if u != v:
+                mbps = azar.choice([10, 20, 50, 100, 200, 500, 1000])
+                grafo.add_edge(u, v, weight=1 / mbps, ancho_banda_real=mbps)
+                grafo.add_edge(v, u, weight=1 / mbps, ancho_banda_real=mbps)
+    return grafo
+
+
+def terminar(capacidades, asignacion):
+    carga = dict.fromkeys(capacidades, 0)
+    for camino, tamano in asignacion:
+        for e in zip(camino, camino[1:]):
+            carga[e] += tamano
+    return max(b / capacidades[e] for e, b in carga.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del planificador de lotes")
+    parser.add_argument("--nodos", type=int, default=30)
+    parser.add_argument("--grado", type=int, default=3, help="Enlaces que abre cada nodo")
+    parser.add_argument("--trabajos", type=int, default=200)
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    grafo = overlay(args.nodos, args.grado, args.semilla)
+    azar = random.Random(args.semilla)
+    nombres = list(grafo.nodes)
+    origen = nombres[0]
+    trabajos = [(origen, azar.choice(nombres[1:]), int(10 ** azar.uniform(6, 9))) for _ in range(args.trabajos)]
+    capacidades = capacidades_de(grafo)
+    cota = cota_flujo(capacidades, trabajos)
+
+    latencias = nx.DiGraph()
+    latencias.add_edges_from(grafo.edges, weight=1)
+    adyacencia = enlaces(latencias, grafo)
+    filas = []
+    inicio = time.perf_counter()
+    asignacion = [(dijkstra(grafo, o, d)[0], t) for o, d, t in trabajos]
+    filas.append(("dijkstra por trabajo", terminar(capacidades, asignacion), time.perf_counter() - inicio))
+    inicio = time.perf_counter()
+    asignacion = [(camino_mas_ancho(adyacencia, o, d)[0], t) for o, d, t in trabajos]
+    filas.append(("más ancho por trabajo", terminar(capacidades, asignacion), time.perf_counter() - inicio))
+    inicio = time.perf_counter()
+    plan = planificar_lote(grafo, trabajos)
+    filas.append(("planificar_lote", plan.segundos, time.perf_counter() - inicio))
+    repartidos = sum(len(r) > 1 for r in plan.rutas)
+
+    print()
+    print(f"{args.trabajos} trabajos, {sum(t for *_, t in trabajos) / 1e9:.1f} GB desde {origen}; "
+          f"{grafo.number_of_edges()} enlaces; cota por flujo máximo {cota:.1f} s")
+    print(f"{'reparto':<24}{'termina (s)':>12}{'x cota':>8}{'cálculo ms':>12}")
+    for nombre, segundos, calculo in filas:
+        print(f"{nombre:<24}{segundos:>12.1f}{segundos / cota:>8.2f}{calculo * 1000:>12.1f}")
+    print(f"planificar_lote repartió {repartidos} trabajos entre varias rutas")
+
+
+if __name__ == '__main__':
+    main()
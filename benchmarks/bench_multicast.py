@@ -0,0 +1,118 @@
+"""
+Distribución de un archivo a todos los nodos: estrella contra árbol MST en loopback.
+
+  python benchmarks/bench_multicast.py --nodos 6 --tamano 16777216 --subida 100
+
+A es el emisor y N1..Nn son servidores locales. Cada par de nodos tiene un enlace
+con un ancho de banda aleatorio (semilla fija) y, además, cada nodo tiene un enlace
+de subida de --subida Mbps compartido por todas sus conexiones salientes
+(CubetaTokens). En estrella A manda una copia a cada nodo con enviar_archivo, así que
+su subida transporta n copias. En árbol se usa el MST de Kruskal con raíz en A y cada
+nodo reenvía a sus hijos mientras recibe (OP_MULTICAST).
+"""
+import argparse
+import filecmp
+import os
+import random
+import tempfile
+import threading
+import time
+
+import networkx as nx
+
+from comun import CubetaTokens, ProxyLimitado, crear_archivo, detener, lanzar_servidor, puerto_libre
+
+import cliente
+from cliente import enviar_archivo, enviar_multicast
+from kruskal import arbol_enraizado, kruskal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de multicast por árbol MST")
+    parser.add_argument("--nodos", type=int, default=6, help="Servidores receptores")
+    parser.add_argument("--tamano", type=int, default=16 * 1024 * 1024, help="Bytes del archivo")
+    parser.add_argument("--subida", type=float, default=100, help="Mbps de subida de cada nodo")
+    parser.add_argument("--semilla", type=int, default=1, help="Semilla de los anchos de banda")
+    args = parser.parse_args()
+
+    azar = random.Random(args.semilla)
+    receptores = [f"N{i}" for i in range(1, args.nodos + 1)]
+    nodos = ["A"] + receptores
+
+    grafo = nx.DiGraph()
+    for u in nodos:
+        for v in nodos:
+            if u < v:
+                mbps = azar.uniform(args.subida / 2, args.subida * 2)
+                grafo.add_edge(u, v, weight=1 / mbps, ancho_banda_real=mbps)
+    arbol = arbol_enraizado(kruskal(grafo), "A")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dirs = {n: os.path.join(tmp, n) for n in receptores}
+        puertos = {n: puerto_libre() for n in receptores}
+        procesos = []
+        for n in receptores:
+            os.mkdir(dirs[n])
+            procesos.append(lanzar_servidor(puertos[n], dirs[n]))
+
+        subidas = {n: CubetaTokens(args.subida) for n in nodos}
+        proxies = {}
+
+        def enlace(u, v):
+            # Un proxy por sentido: limitado por el enlace u-v y por la subida de u
+            if (u, v) not in proxies:
+                datos = grafo.get_edge_data(u, v) or grafo.get_edge_data(v, u)
+                proxies[(u, v)] = ProxyLimitado(f"127.0.0.1:{puertos[v]}", datos['ancho_banda_real'],
+                                                cubeta=subidas[u])
+            return proxies[(u, v)].direccion
+
+        def a_direcciones(padre, hijos):
+            return [(enlace(padre, hijo), a_direcciones(hijo, nietos)) for hijo, nietos in hijos]
+
+        archivo = crear_archivo(os.path.join(tmp, "carga.bin"), args.tamano)
+
+        def comprobar_y_limpiar():
+            for n in receptores:
+                destino = os.path.join(dirs[n], "carga.bin")
+                assert filecmp.cmp(archivo, destino, shallow=False), f"{n} no recibió el archivo"
+                os.remove(destino)
+
+        # Estrella: una copia por nodo desde A, todas en paralelo
+        direcciones = [enlace("A", n) for n in receptores]
+        hilos = [threading.Thread(target=enviar_archivo, args=(d.split(':')[0], int(d.split(':')[1]), archivo))
+                 for d in direcciones]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        t_estrella = time.perf_counter() - inicio
+        comprobar_y_limpiar()
+        cliente.POOL.cerrar_todo()
+
+        # Árbol MST con reenvío encadenado
+        inicio = time.perf_counter()
+        resultados = enviar_multicast(archivo, a_direcciones("A", arbol))
+        t_arbol = time.perf_counter() - inicio
+        assert all(estado == 'OK' for estado in resultados.values()), resultados
+        comprobar_y_limpiar()
+
+        for p in proxies.values():
+            p.cerrar()
+        for proc in procesos:
+            detener(proc)
+
+    def describir(padre, hijos):
+        return [f"{padre}→{hijo}" for hijo, _ in hijos] + \
+               [arista for hijo, nietos in hijos for arista in describir(hijo, nietos)]
+
+    mb = args.tamano * 8 / 1e6
+    print()
+    print(f"Árbol MST: {', '.join(describir('A', arbol))}")
+    print(f"Estrella: {t_estrella:6.2f} s  ({mb * args.nodos / t_estrella:7.1f} Mbps entregados)")
+    print(f"Árbol:    {t_arbol:6.2f} s  ({mb * args.nodos / t_arbol:7.1f} Mbps entregados)"
+          f"  (x{t_estrella / t_arbol:.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Transferencia por una ruta contra transferencia multiruta en loopback.
+
+  python benchmarks/bench_multiruta.py --tamano 33554432 --mbps 80
+
+Topología (A es el cliente, B, C y D son servidores locales):
+
+    A --> B --> D
+    A --> C --> D
+    A ------> D   (enlace directo lento, --mbps-directo)
+
+Cada enlace es un ProxyLimitado con su tasa. Se envía el mismo archivo por la
+ruta Dijkstra (una sola) y repartido entre las rutas disjuntas.
+"""
+import argparse
+import filecmp
+import os
+import tempfile
+import time
+
+import networkx as nx
+
+from comun import ProxyLimitado, crear_archivo, detener, lanzar_servidor, puerto_libre
+
+from cliente import abrir_ruta, enviar_rango
+from multiruta import ancho_cuello, enviar_multiruta, rutas_disjuntas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de transferencia multiruta")
+    parser.add_argument("--tamano", type=int, default=32 * 1024 * 1024, help="Bytes del archivo")
+    parser.add_argument("--mbps", type=float, default=80, help="Tasa de los enlaces vía B y C")
+    parser.add_argument("--mbps-directo", type=float, default=40, help="Tasa del enlace A-D")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dirs = {n: os.path.join(tmp, n) for n in "BCD"}
+        puertos = {n: puerto_libre() for n in "BCD"}
+        procesos = []
+        for n in "BCD":
+            os.mkdir(dirs[n])
+            procesos.append(lanzar_servidor(puertos[n], dirs[n]))
+
+        enlaces = {("A", "B"): args.mbps, ("B", "D"): args.mbps,
+                   ("A", "C"): args.mbps, ("C", "D"): args.mbps,
+                   ("A", "D"): args.mbps_directo}
+        proxies = {(u, v): ProxyLimitado(f"127.0.0.1:{puertos[v]}", mbps)
+                   for (u, v), mbps in enlaces.items()}
+
+        grafo = nx.DiGraph()
+        for (u, v), mbps in enlaces.items():
+            grafo.add_edge(u, v, weight=1 / mbps, ancho_banda_real=mbps)
+
+        def a_direcciones(camino):
+            return [proxies[(u, v)].direccion for u, v in zip(camino, camino[1:])]
+
+        archivo = crear_archivo(os.path.join(tmp, "carga.bin"), args.tamano)
+        destino = os.path.join(dirs["D"], "carga.bin")
+        rutas = rutas_disjuntas(grafo, "A", "D")
+
+        # Una sola ruta (la que elegiría Dijkstra)
+        inicio = time.perf_counter()
+        with abrir_ruta(a_direcciones(rutas[0])) as sock:
+            enviar_rango(sock, archivo, 0, args.tamano)
+        t_una = time.perf_counter() - inicio
+        assert filecmp.cmp(archivo, destino, shallow=False)
+        os.remove(destino)
+
+        # Multiruta
+        pesos = [ancho_cuello(grafo, camino) for camino in rutas]
+        inicio = time.perf_counter()
+        enviar_multiruta(archivo, [a_direcciones(c) for c in rutas], pesos)
+        t_multi = time.perf_counter() - inicio
+        assert filecmp.cmp(archivo, destino, shallow=False)
+
+        for p in proxies.values():
+            p.cerrar()
+        for proc in procesos:
+            detener(proc)
+
+    mb = args.tamano * 8 / 1e6
+    print()
+    print(f"Rutas disjuntas: {[' → '.join(c) for c in rutas]} (cuellos {pesos} Mbps)")
+    print(f"Una ruta:  {t_una:6.2f} s  {mb / t_una:7.1f} Mbps")
+    print(f"Multiruta: {t_multi:6.2f} s  {mb / t_multi:7.1f} Mbps  (x{t_una / t_multi:.2f})")
+
+
+if __name__ == '__main__':
+    main()
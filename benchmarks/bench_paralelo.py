@@ -0,0 +1,79 @@
+"""
+Flujos TCP paralelos por salto contra un solo flujo, a través de un relay.
+
+  python benchmarks/bench_paralelo.py --tamano 67108864 --mbps-flujo 40 --mbps-enlace 200
+
+Topología: A --(enlace 1)--> R (relay) --(enlace 2)--> D. Cada enlace es un
+ProxyLimitado con dos límites. --mbps-flujo limita cada conexión y modela la ventana
+de TCP estancada a RTT alto (un flujo no pasa de ventana/RTT). --mbps-enlace es una
+CubetaTokens que comparten todas las conexiones del enlace y modela su capacidad real.
+Se compara enviar_por_ruta (un túnel) con enviar_paralelo con varios números de
+flujos, incluido el que elegiría flujos_para con --rtt-ms y --mbps-enlace.
+"""
+import argparse
+import filecmp
+import os
+import tempfile
+import time
+
+from comun import CubetaTokens, ProxyLimitado, crear_archivo, detener, lanzar_servidor, puerto_libre
+
+import cliente
+from cliente import enviar_por_ruta
+from paralelo import enviar_paralelo, flujos_para
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de flujos paralelos por salto")
+    parser.add_argument("--tamano", type=int, default=64 * 1024 * 1024, help="Bytes del archivo")
+    parser.add_argument("--mbps-flujo", type=float, default=40, help="Tope de cada conexión (ventana/RTT)")
+    parser.add_argument("--mbps-enlace", type=float, default=200, help="Capacidad de cada enlace")
+    parser.add_argument("--rtt-ms", type=float, default=60, help="RTT supuesto para elegir flujos automáticamente")
+    args = parser.parse_args()
+
+    automatico = flujos_para(args.rtt_ms, args.mbps_enlace)
+    casos = [("1 flujo (túnel)", None)] + [(f"{n} flujos", n) for n in sorted({2, 4, 8, automatico})]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dirs = {n: os.path.join(tmp, n) for n in "RD"}
+        puertos = {n: puerto_libre() for n in "RD"}
+        procesos = []
+        for n in "RD":
+            os.mkdir(dirs[n])
+            procesos.append(lanzar_servidor(puertos[n], dirs[n]))
+        enlace1 = ProxyLimitado(f"127.0.0.1:{puertos['R']}", args.mbps_flujo, cubeta=CubetaTokens(args.mbps_enlace))
+        enlace2 = ProxyLimitado(f"127.0.0.1:{puertos['D']}", args.mbps_flujo, cubeta=CubetaTokens(args.mbps_enlace))
+        host, puerto = enlace1.direccion.split(':')
+        ruta = [enlace2.direccion]
+        archivo = crear_archivo(os.path.join(tmp, "imagen.bin"), args.tamano)
+        copia = os.path.join(dirs["D"], "imagen.bin")
+
+        resultados = []
+        for nombre, flujos in casos:
+            cliente.POOL.cerrar_todo()
+            inicio = time.perf_counter()
+            if flujos is None:
+                assert enviar_por_ruta(host, int(puerto), archivo, ruta)
+            else:
+                assert enviar_paralelo(host, int(puerto), archivo, ruta, flujos=flujos)
+            duracion = time.perf_counter() - inicio
+            assert filecmp.cmp(archivo, copia, shallow=False)
+            os.remove(copia)
+            resultados.append((nombre, duracion))
+
+        enlace1.cerrar()
+        enlace2.cerrar()
+        for proc in procesos:
+            detener(proc)
+
+    print()
+    print(f"Archivo de {args.tamano} bytes por A -> R -> D; {args.mbps_flujo} Mbps por flujo, "
+          f"{args.mbps_enlace} Mbps por enlace")
+    print(f"flujos_para({args.rtt_ms} ms, {args.mbps_enlace} Mbps) = {automatico}")
+    base = resultados[0][1]
+    for nombre, duracion in resultados:
+        print(f"{nombre:<18}{duracion:>8.2f} s{args.tamano * 8 / duracion / 1e6:>9.1f} Mbps  (x{base / duracion:.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Muchos archivos pequeños seguidos con y sin pool de conexiones.
+
+  python benchmarks/bench_pool.py --archivos 200 --retardo-ms 60
+
+El enlace es un ProxyLimitado que añade `--retardo-ms` al primer paquete de cada
+conexión, como el coste de abrir una conexión nueva sobre la VPN.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from comun import ProxyLimitado, crear_archivo, detener, lanzar_servidor, puerto_libre
+
+import cliente
+from transporte import PoolConexiones
+
+
+def enviar_lote(proxy, archivos):
+    host, puerto = proxy.direccion.split(':')
+    inicio = time.perf_counter()
+    for archivo in archivos:
+        cliente.enviar_archivo(host, int(puerto), archivo)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pool de conexiones")
+    parser.add_argument("--archivos", type=int, default=200)
+    parser.add_argument("--tamano", type=int, default=4096, help="Bytes por archivo")
+    parser.add_argument("--retardo-ms", type=float, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        destino = os.path.join(tmp, "destino")
+        os.mkdir(destino)
+        puerto = puerto_libre()
+        proc = lanzar_servidor(puerto, destino)
+        proxy = ProxyLimitado(f"127.0.0.1:{puerto}", retardo_ms=args.retardo_ms)
+        archivos = [crear_archivo(os.path.join(tmp, f"f{i}.bin"), args.tamano) for i in range(args.archivos)]
+
+        cliente.POOL = PoolConexiones(max_por_clave=0)
+        sin_pool = enviar_lote(proxy, archivos)
+        cliente.POOL = PoolConexiones()
+        con_pool = enviar_lote(proxy, archivos)
+
+        proxy.cerrar()
+        detener(proc)
+
+    print()
+    print(f"Sin pool: {sin_pool:6.2f} s ({args.archivos / sin_pool:7.1f} archivos/s)")
+    print(f"Con pool: {con_pool:6.2f} s ({args.archivos / con_pool:7.1f} archivos/s)")
+
+
+if __name__ == '__main__':
+    main()
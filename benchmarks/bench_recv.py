@@ -0,0 +1,130 @@
+"""
+Microbenchmark de la capa de recepción: recv_all con `data += more` y bucle
+de OP_SEND con recv(4096) (anterior) contra recv_into sobre el pool de buffers.
+
+  python benchmarks/bench_recv.py --tamano 67108864 --chunk 1048576
+
+Para cada variante se reporta el throughput, cuántos objetos bytes nuevos
+devolvió recv() (recv_into no crea ninguno) y el pico de memoria medido con
+tracemalloc.
+"""
+import argparse
+import os
+import socket
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from comun import crear_archivo
+
+import transporte
+
+
+class SocketContador:
+    """Envuelve un socket contando cuántos buffers nuevos devuelve recv()"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffers_nuevos = 0
+
+    def recv(self, n):
+        self.buffers_nuevos += 1
+        return self.sock.recv(n)
+
+    def recv_into(self, vista, n=0):
+        return self.sock.recv_into(vista, n)
+
+
+def recv_all_anterior(sock, length):
+    data = b''
+    while len(data) < length:
+        more = sock.recv(length - len(data))
+        if not more:
+            raise EOFError('Socket closed prematurely')
+        data += more
+    return data
+
+
+def recibir_anterior(sock, f, filesize):
+    received = 0
+    while received < filesize:
+        chunk = sock.recv(min(4096, filesize - received))
+        if not chunk:
+            break
+        f.write(chunk)
+        received += len(chunk)
+
+
+def par_tcp():
+    with socket.socket() as escucha:
+        escucha.bind(('127.0.0.1', 0))
+        escucha.listen(1)
+        a = socket.create_connection(escucha.getsockname())
+        b, _ = escucha.accept()
+    return a, b
+
+
+def correr(ruta, tamano, receptor, contar):
+    a, b = par_tcp()
+
+    def emitir():
+        with open(ruta, 'rb') as f:
+            a.sendfile(f, 0, tamano)
+
+    sock = SocketContador(b) if contar else b
+    emisor = threading.Thread(target=emitir)
+    if contar:
+        tracemalloc.start()
+    emisor.start()
+    inicio = time.perf_counter()
+    receptor(sock, tamano)
+    duracion = time.perf_counter() - inicio
+    emisor.join()
+    pico = 0
+    if contar:
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    a.close()
+    b.close()
+    return duracion, sock.buffers_nuevos if contar else 0, pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark de recv_all y recepción a archivo")
+    parser.add_argument("--tamano", type=int, default=64 * 1024 * 1024, help="Bytes a recibir")
+    parser.add_argument("--chunk", type=int, default=transporte.TAM_CHUNK, help="Chunk del pool")
+    args = parser.parse_args()
+    transporte.configurar_chunk(args.chunk)
+
+    # recv_all de un bloque grande: cuadrático con `data += more`
+    grande = min(args.tamano, 16 * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = crear_archivo(os.path.join(tmp, 'origen.bin'), args.tamano)
+        destino = os.path.join(tmp, 'destino.bin')
+
+        def a_archivo(funcion):
+            def receptor(sock, tamano):
+                with open(destino, 'wb') as f:
+                    funcion(sock, f, tamano)
+            return receptor
+
+        variantes = [
+            ("recv_all anterior", grande, lambda s, n: recv_all_anterior(s, n)),
+            ("recv_all recv_into", grande, lambda s, n: transporte.recv_all(s, n)),
+            ("OP_SEND recv(4096)", args.tamano, a_archivo(recibir_anterior)),
+            ("OP_SEND pool recv_into", args.tamano, a_archivo(transporte.recibir_a_archivo)),
+        ]
+
+        print(f"{'variante':<26}{'bytes':>12}{'MB/s':>10}{'buffers nuevos':>16}{'pico MiB':>10}")
+        for nombre, tamano, receptor in variantes:
+            duracion, _, _ = correr(ruta, tamano, receptor, contar=False)
+            _, nuevos, pico = correr(ruta, tamano, receptor, contar=True)
+            print(f"{nombre:<26}{tamano:>12}{tamano / duracion / 1e6:>10.1f}"
+                  f"{nuevos:>16}{pico / 2**20:>10.1f}")
+        print(f"\nBuffers creados por el pool: {transporte.POOL.creados}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Rutas a todos los destinos: Dijkstra por consulta contra la tabla precalculada.
+
+  python benchmarks/bench_rutas.py --nodos 60 --densidad 0.3
+
+Genera un grafo dirigido aleatorio con latencias como pesos y pide la ruta de cada
+origen a cada destino (lo que haría un lote que envía a todos los nodos). Se compara
+dijkstra por consulta con tabla_rutas: construcción de la tabla y consultas por separado,
+y una segunda ronda con las mismas métricas, que ya no recalcula la tabla.
+"""
+import argparse
+import random
+import time
+
+import networkx as nx
+
+import comun  # añade la raíz del repo al path
+from dijkstra import dijkstra
+from tabla_rutas import tabla_de
+
+
+def grafo_aleatorio(nodos, densidad, semilla):
+    azar = random.Random(semilla)
+    grafo = nx.DiGraph()
+    nombres = [f"10.0.0.{i}" for i in range(nodos)]
+    grafo.add_nodes_from(nombres)
+    for u in nombres:
+        for v in nombres:
+            if u != v and azar.random() < densidad:
+                grafo.add_edge(u, v, weight=azar.uniform(5, 200))
+    return grafo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la tabla de rutas")
+    parser.add_argument("--nodos", type=int, default=60)
+    parser.add_argument("--densidad", type=float, default=0.3, help="Probabilidad de cada arista")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    grafo = grafo_aleatorio(args.nodos, args.densidad, args.semilla)
+    pares = [(u, v) for u in grafo.nodes for v in grafo.nodes if u != v]
+
+    inicio = time.perf_counter()
+    esperado = {par: dijkstra(grafo, *par)[1] for par in pares}
+    t_dijkstra = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    tabla = tabla_de(grafo)
+    t_construir = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    obtenido = {par: tabla.camino(*par)[1] for par in pares}
+    t_consultas = time.perf_counter() - inicio
+
+    # Misma firma: la tabla se reutiliza
+    inicio = time.perf_counter()
+    tabla = tabla_de(grafo)
+    for par in pares:
+        tabla.camino(*par)
+    t_segunda = time.perf_counter() - inicio
+
+    for par in pares:
+        assert abs(esperado[par] - obtenido[par]) < 1e-6 or esperado[par] == obtenido[par], par
+
+    print()
+    print(f"{args.nodos} nodos, {grafo.number_of_edges()} aristas, {len(pares)} consultas")
+    print(f"{'dijkstra por consulta':<28}{t_dijkstra * 1000:>10.1f} ms")
+    print(f"{'tabla: construcción':<28}{t_construir * 1000:>10.1f} ms")
+    print(f"{'tabla: consultas':<28}{t_consultas * 1000:>10.1f} ms")
+    print(f"{'tabla: segunda ronda':<28}{t_segunda * 1000:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Compara el servidor con un hilo por conexión contra el servidor asyncio.
+
+  python benchmarks/bench_servidor.py --conexiones 500 --tamano 1048576
+
+Primero se abren a la vez min(--conexiones, --simultaneas) conexiones y se mantienen
+abiertas sin enviar nada. Mientras tanto se muestrean los hilos y los sockets del
+proceso servidor, así el costo por conexión se ve con todas ellas vivas. Después cada
+conexión envía un OP_SEND de `--tamano` bytes y espera el OP_RESPONSE. Se reporta
+cuántas transferencias terminaron, el throughput agregado y, con las conexiones
+retenidas, el máximo de hilos y de sockets del servidor.
+"""
+import argparse
+import asyncio
+import struct
+import tempfile
+import time
+
+from comun import lanzar_servidor, detener, puerto_libre, hilos_de, sockets_de
+
+from server import OP_SEND, OP_RESPONSE
+
+# Tiempo que se retienen las conexiones abiertas mientras se muestrea el servidor (s)
+MUESTREO = 1.0
+
+
+class Retencion:
+    """Mantiene las primeras `objetivo` conexiones abiertas hasta que se liberen"""
+
+    def __init__(self, objetivo):
+        self.objetivo = objetivo
+        self.abiertas = 0
+        self.todas = asyncio.Event()
+        self.liberar = asyncio.Event()
+
+    def abierta(self):
+        self.abiertas += 1
+        if self.abiertas >= self.objetivo:
+            self.todas.set()
+
+
+async def un_envio(puerto, indice, payload, semaforo, retencion):
+    async with semaforo:
+        reader, writer = await asyncio.open_connection('127.0.0.1', puerto)
+        retencion.abierta()
+        await retencion.liberar.wait()
+        nombre = f"bench_{indice}.bin".encode()
+        writer.write(struct.pack('>BI', OP_SEND, len(nombre)) + nombre + struct.pack('>Q', len(payload)))
+        writer.write(payload)
+        await writer.drain()
+        op = await reader.readexactly(1)
+        cod = await reader.readexactly(1)
+        largo = struct.unpack('>I', await reader.readexactly(4))[0]
+        await reader.readexactly(largo)
+        writer.close()
+        return op[0] == OP_RESPONSE and cod[0] == 0x00
+
+
+async def lanzar_envios(pid, puerto, conexiones, payload, simultaneas):
+    semaforo = asyncio.Semaphore(simultaneas)
+    retencion = Retencion(min(conexiones, simultaneas))
+    tareas = [asyncio.ensure_future(un_envio(puerto, i, payload, semaforo, retencion)) for i in range(conexiones)]
+    try:
+        await asyncio.wait_for(retencion.todas.wait(), 30)
+    except asyncio.TimeoutError:
+        print(f"[!] Solo se abrieron {retencion.abiertas} de {retencion.objetivo} conexiones")
+    pico_hilos = pico_sockets = 0
+    limite = time.perf_counter() + MUESTREO
+    while time.perf_counter() < limite:
+        pico_hilos = max(pico_hilos, hilos_de(pid) or 0)
+        pico_sockets = max(pico_sockets, sockets_de(pid) or 0)
+        await asyncio.sleep(0.05)
+    retencion.liberar.set()
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*tareas, return_exceptions=True)
+    return resultados, time.perf_counter() - inicio, retencion.abiertas, pico_hilos, pico_sockets
+
+
+def medir(modo, conexiones, tamano, simultaneas):
+    puerto = puerto_libre()
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = lanzar_servidor(puerto, tmp, modo)
+        payload = b'x' * tamano
+        resultados, duracion, abiertas, hilos, sockets = asyncio.run(
+            lanzar_envios(proc.pid, puerto, conexiones, payload, simultaneas))
+        detener(proc)
+
+    ok = sum(1 for r in resultados if r is True)
+    mbps = ok * tamano * 8 / duracion / 1e6
+    return ok, duracion, mbps, abiertas, hilos, sockets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark servidor por hilos vs asyncio")
+    parser.add_argument("--conexiones", type=int, default=500, help="Transferencias totales")
+    parser.add_argument("--simultaneas", type=int, default=500, help="Conexiones abiertas a la vez")
+    parser.add_argument("--tamano", type=int, default=1024 * 1024, help="Bytes por transferencia")
+    args = parser.parse_args()
+
+    print(f"{'modo':<8}{'ok':>8}{'tiempo (s)':>12}{'Mbps':>10}{'abiertas':>10}{'hilos máx':>12}{'sockets máx':>13}")
+    for modo in ("hilos", "async"):
+        ok, duracion, mbps, abiertas, hilos, sockets = medir(modo, args.conexiones, args.tamano, args.simultaneas)
+        print(f"{modo:<8}{ok:>8}{duracion:>12.2f}{mbps:>10.1f}{abiertas:>10}{hilos:>12}{sockets:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+k caminos sin ciclos (Yen) en un overlay grande: busqueda.yen_csr frente a networkx.
+
+  python benchmarks/bench_yen.py --nodos 5000 --consultas 10 --k 4
+
+Usa el mismo overlay geográfico que bench_busqueda.py. Para cada par al azar mide
+dijkstra.k_caminos sobre el CSR (un Dijkstra inverso y luego búsquedas de desvío A*
+guiadas por él) y los k primeros de nx.shortest_simple_paths, y comprueba que los
+costos coincidan. También mide k_caminos en un grafo pequeño de networkx, donde el
+camino mínimo y las distancias al destino salen de la tabla de rutas ya calculada.
+"""
+import argparse
+import itertools
+import random
+import statistics
+import time
+
+import networkx as nx
+
+import comun  # añade la raíz del repo al path
+from bench_busqueda import overlay
+from dijkstra import k_caminos
+from grafo_csr import GrafoCSR
+from tabla_rutas import tabla_de
+
+
+def costo(grafo, camino):
+    return sum(grafo[u][v]['weight'] for u, v in zip(camino, camino[1:]))
+
+
+def medir(funcion, pares):
+    tiempos, resultados = [], []
+    for o, d in pares:
+        inicio = time.perf_counter()
+        resultados.append(funcion(o, d))
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000, resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de k caminos más cortos (Yen)")
+    parser.add_argument("--nodos", type=int, default=5000)
+    parser.add_argument("--vecinos", type=int, default=4)
+    parser.add_argument("--consultas", type=int, default=10)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--pequeno", type=int, default=60, help="Nodos del grafo pequeño (tabla de rutas)")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    azar = random.Random(args.semilla)
+    filas = []
+    for nodos in (args.nodos, args.pequeno):
+        grafo = overlay(nodos, args.vecinos, 1, args.semilla)
+        nombres = list(grafo.nodes)
+        pares = [tuple(azar.sample(nombres, 2)) for _ in range(args.consultas)]
+        if nodos == args.pequeno:
+            tabla_de(grafo)
+            fuente, nombre = grafo, f"k_caminos (DiGraph {nodos}, tabla)"
+        else:
+            fuente, nombre = GrafoCSR.desde_networkx(grafo), f"k_caminos (CSR {nodos})"
+        t_yen, propios = medir(lambda o, d: k_caminos(fuente, o, d, args.k), pares)
+        t_nx, ajenos = medir(lambda o, d: list(itertools.islice(nx.shortest_simple_paths(grafo, o, d, 'weight'),
+                                                                args.k)), pares)
+        for nuestros, suyos in zip(propios, ajenos):
+            assert len(nuestros) == len(suyos)
+            for (camino, c), otro in zip(nuestros, suyos):
+                assert abs(c - costo(grafo, otro)) < 1e-6 and abs(c - costo(grafo, camino)) < 1e-6
+        filas.append((nombre, t_yen))
+        filas.append((f"networkx ({nodos})", t_nx))
+
+    print()
+    print(f"{args.consultas} consultas, k = {args.k} (mediana ms por consulta)")
+    for nombre, t in filas:
+        print(f"  {nombre:<34}{t:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
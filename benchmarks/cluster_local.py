@@ -0,0 +1,225 @@
+"""
+Clúster local de N servidores para medir relays sin máquinas reales.
+
+  python benchmarks/cluster_local.py --nodos 4 --tamanos 8388608,67108864 --chunks 262144,1048576 \
+      --mbps 400 --retardo-ms 10 --salida resultados.json
+
+Arranca N instancias de server.py en puertos de loopback encadenadas (nodo0 -> nodo1 ->
+... -> nodoN-1). Con --mbps/--retardo-ms cada enlace de la cadena (también el del cliente
+al nodo0) pasa por un ProxyLimitado con esa tasa y ese retardo. Se escriben metricas_*.csv
+sintéticos con esos enlaces en el directorio de cada nodo (y en --metricas si se indica)
+y se envía cada tamaño a 1..N saltos con enviar_archivo / enviar_por_ruta, con los
+servidores arrancados con cada --chunk.
+
+Por cada combinación se guarda la mediana de --repeticiones envíos: Mbps de extremo a
+extremo y, por salto, Mbps de la operación en ese nodo (OP_STATS), latencia hasta la
+primera respuesta por un túnel hasta él y CPU del proceso. El JSON (en --salida o por
+la salida estándar) lleva fecha y commit para seguir regresiones entre versiones.
+"""
+import argparse
+import csv
+import filecmp
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+
+from comun import RAIZ, ProxyLimitado, cpu_de, crear_archivo, detener, lanzar_servidor, puerto_libre
+
+import cliente
+from cliente import OpcodeNoSoportado, abrir_ruta, enviar_archivo, enviar_por_ruta, negociar
+from estadisticas import consultar
+
+# Respuestas OP_HOLA que se cronometran por túnel después de la primera
+PINGS = 5
+
+
+class Cluster:
+    """N servidores encadenados, con un proxy limitado delante de cada uno si hay tasa o retardo"""
+
+    def __init__(self, nodos, directorio, chunk=None, mbps=None, retardo_ms=0, modo='hilos'):
+        self.dirs = [os.path.join(directorio, f"nodo{i}") for i in range(nodos)]
+        self.puertos = [puerto_libre() for _ in range(nodos)]
+        # Dirección real de cada nodo (para OP_STATS) y la que usan el cliente y el nodo anterior
+        self.directas = [f"127.0.0.1:{p}" for p in self.puertos]
+        self.procesos = []
+        self.proxies = []
+        extra = ('--chunk', str(chunk)) if chunk else ()
+        for d, puerto in zip(self.dirs, self.puertos):
+            os.makedirs(d, exist_ok=True)
+            self.procesos.append(lanzar_servidor(puerto, d, modo, extra))
+        if mbps or retardo_ms:
+            self.proxies = [ProxyLimitado(direccion, mbps, retardo_ms) for direccion in self.directas]
+            self.entradas = [p.direccion for p in self.proxies]
+        else:
+            self.entradas = list(self.directas)
+
+    def escribir_metricas(self, mbps, retardo_ms, otros=()):
+        """metricas_*.csv sintéticos de la cadena (cliente -> nodo0 -> ... ) con los enlaces simulados"""
+        nombres = ['cliente'] + self.directas
+        latencia = max(2 * retardo_ms, 0.05)
+        for origen, destino in zip(nombres, nombres[1:]):
+            for d in list(self.dirs) + list(otros):
+                with open(os.path.join(d, f"metricas_{origen.replace(':', '_')}.csv"), 'w', newline='') as f:
+                    escritor = csv.writer(f)
+                    escritor.writerow(['origen', 'destino', 'latencia_ms', 'ancho_banda_mbps'])
+                    escritor.writerow([origen, destino, latencia, mbps if mbps else 'nan'])
+
+    def detener(self):
+        for proxy in self.proxies:
+            proxy.cerrar()
+        for proc in self.procesos:
+            detener(proc)
+
+
+def latencias(cluster, saltos):
+    """Milisegundos hasta la primera respuesta y RTT medio por un túnel hasta cada nodo"""
+    filas = []
+    for k in range(1, saltos + 1):
+        try:
+            inicio = time.perf_counter()
+            with abrir_ruta(cluster.entradas[:k]) as sock:
+                negociar(sock)
+                primera = (time.perf_counter() - inicio) * 1000
+                rtts = []
+                for _ in range(PINGS):
+                    inicio = time.perf_counter()
+                    negociar(sock)
+                    rtts.append((time.perf_counter() - inicio) * 1000)
+            filas.append((primera, statistics.median(rtts)))
+        except (OpcodeNoSoportado, OSError, EOFError):
+            filas.append((None, None))
+    return filas
+
+
+def medir(cluster, archivo, saltos):
+    """Un envío a `saltos` saltos: (segundos, [segundos de la operación en cada nodo], [CPU de cada nodo])"""
+    tamano = os.path.getsize(archivo)
+    procesos = cluster.procesos[:saltos]
+    cpu_antes = [cpu_de(p.pid) for p in procesos]
+    desde = time.time()
+    inicio = time.perf_counter()
+    if saltos == 1:
+        host, puerto = cluster.entradas[0].split(':')
+        assert enviar_archivo(host, int(puerto), archivo)
+    else:
+        host, puerto = cluster.entradas[0].split(':')
+        assert enviar_por_ruta(host, int(puerto), archivo, cluster.entradas[1:saltos])
+    segundos = time.perf_counter() - inicio
+    # Cerrar las conexiones del pool termina los túneles y los nodos registran la operación
+    cliente.POOL.cerrar_todo()
+    time.sleep(0.2)
+    cpu = [None if a is None else cpu_de(p.pid) - a for p, a in zip(procesos, cpu_antes)]
+
+    copia = os.path.join(cluster.dirs[saltos - 1], os.path.basename(archivo))
+    assert filecmp.cmp(archivo, copia, shallow=False)
+    os.remove(copia)
+
+    por_nodo = []
+    for direccion in cluster.directas[:saltos]:
+        try:
+            recientes = [r for r in consultar(direccion)['recientes'] if r['fin'] >= desde and r['bytes'] >= tamano]
+        except Exception:
+            recientes = []
+        por_nodo.append(max(recientes, key=lambda r: r['bytes'])['segundos'] if recientes else None)
+    return segundos, por_nodo, cpu
+
+
+def mediana(valores):
+    valores = [v for v in valores if v is not None]
+    return statistics.median(valores) if valores else None
+
+
+def _redondear(x, digitos=2):
+    return None if x is None else round(x, digitos)
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clúster local para medir el rendimiento de los relays")
+    parser.add_argument("--nodos", type=int, default=4, help="Servidores en la cadena")
+    parser.add_argument("--saltos", default=None, help="Saltos a probar separados por comas (1..nodos por defecto)")
+    parser.add_argument("--tamanos", default="8388608,33554432", help="Bytes de los archivos, separados por comas")
+    parser.add_argument("--chunks", default="262144", help="--chunk de los servidores, separados por comas")
+    parser.add_argument("--mbps", type=float, default=None, help="Tasa de cada enlace (sin límite si se omite)")
+    parser.add_argument("--retardo-ms", type=float, default=0, help="Retardo de cada enlace")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--modo", choices=["hilos", "async"], default="hilos")
+    parser.add_argument("--metricas", default=None, help="Directorio donde copiar también los CSV sintéticos")
+    parser.add_argument("--salida", default=None, help="Archivo JSON de resultados (salida estándar si se omite)")
+    args = parser.parse_args()
+
+    tamanos = [int(t) for t in args.tamanos.split(',')]
+    chunks = [int(c) for c in args.chunks.split(',')]
+    saltos = [int(s) for s in args.saltos.split(',')] if args.saltos else list(range(1, args.nodos + 1))
+    if max(saltos) > args.nodos:
+        parser.error("--saltos no puede pasar de --nodos")
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as tmp:
+        origen = os.path.join(tmp, "origen")
+        os.mkdir(origen)
+        archivos = {t: crear_archivo(os.path.join(origen, f"archivo_{t}.bin"), t) for t in tamanos}
+        for chunk in chunks:
+            cluster = Cluster(args.nodos, os.path.join(tmp, f"chunk{chunk}"), chunk, args.mbps, args.retardo_ms,
+                              args.modo)
+            try:
+                cluster.escribir_metricas(args.mbps, args.retardo_ms, [args.metricas] if args.metricas else ())
+                lat = latencias(cluster, max(saltos))
+                for tamano in tamanos:
+                    for n in saltos:
+                        medidas = [medir(cluster, archivos[tamano], n) for _ in range(args.repeticiones)]
+                        segundos = mediana(m[0] for m in medidas)
+                        por_salto = []
+                        for i in range(n):
+                            seg_nodo = mediana(m[1][i] for m in medidas)
+                            cpu = mediana(m[2][i] for m in medidas)
+                            previa = lat[i - 1][0] if i else 0
+                            por_salto.append({
+                                'nodo': cluster.directas[i],
+                                'mbps': _redondear(tamano * 8 / seg_nodo / 1e6 if seg_nodo else None, 1),
+                                'latencia_ms': _redondear(lat[i][0] - previa
+                                                          if lat[i][0] is not None and previa is not None else None),
+                                'rtt_ms': _redondear(lat[i][1]),
+                                'cpu_s': _redondear(cpu, 3),
+                                'cpu_pct': _redondear(100 * cpu / segundos if cpu is not None else None, 1),
+                            })
+                        resultados.append({'chunk': chunk, 'tamano': tamano, 'saltos': n,
+                                           'segundos': round(segundos, 4),
+                                           'mbps': round(tamano * 8 / segundos / 1e6, 1),
+                                           'por_salto': por_salto})
+                        print(f"[*] chunk {chunk} tamaño {tamano} saltos {n}: {resultados[-1]['mbps']} Mbps")
+            finally:
+                cliente.POOL.cerrar_todo()
+                cluster.detener()
+
+    informe = {'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit_actual(),
+               'parametros': {'nodos': args.nodos, 'mbps': args.mbps, 'retardo_ms': args.retardo_ms,
+                              'repeticiones': args.repeticiones, 'modo': args.modo},
+               'resultados': resultados}
+
+    print()
+    print(f"{'chunk':>9}{'tamaño':>11}{'saltos':>8}{'Mbps':>9}   por salto (Mbps / CPU %)")
+    for r in resultados:
+        saltos_txt = "  ".join(f"{s['mbps'] if s['mbps'] is not None else '-'}/"
+                               f"{s['cpu_pct'] if s['cpu_pct'] is not None else '-'}" for s in r['por_salto'])
+        print(f"{r['chunk']:>9}{r['tamano']:>11}{r['saltos']:>8}{r['mbps']:>9.1f}   {saltos_txt}")
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(informe, f, indent=2)
+        print(f"[OK] Resultados en {args.salida}")
+    else:
+        print(json.dumps(informe, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Utilidades compartidas por los benchmarks (servidores locales en subprocesos)."""
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+
+def puerto_libre():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def esperar_puerto(puerto, timeout=10):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            with socket.create_connection(('127.0.0.1', puerto), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"El servidor no abrió el puerto {puerto}")
+
+
+def lanzar_servidor(puerto, directorio, modo='hilos', extra=()):
+    """Arranca server.py en un subproceso escuchando en 127.0.0.1:puerto con cwd=directorio"""
+    proc = subprocess.Popen([sys.executable, os.path.join(RAIZ, 'server.py'),
+                             '--host', '127.0.0.1', '--puerto', str(puerto), '--modo', modo, *extra],
+                            cwd=directorio, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    esperar_puerto(puerto)
+    return proc
+
+
+def detener(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def hilos_de(pid):
+    """Número de hilos del proceso (solo Linux, None en otros sistemas)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for linea in f:
+                if linea.startswith('Threads:'):
+                    return int(linea.split()[1])
+    except OSError:
+        return None
+
+
+def sockets_de(pid):
+    """Sockets abiertos por el proceso (solo Linux, None en otros sistemas)"""
+    try:
+        directorio = f'/proc/{pid}/fd'
+        return sum(1 for fd in os.listdir(directorio)
+                   if os.readlink(os.path.join(directorio, fd)).startswith('socket:'))
+    except OSError:
+        return None
+
+
+def cpu_de(pid):
+    """Segundos de CPU (usuario + sistema) consumidos por el proceso (solo Linux, None en otros)"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # El nombre del proceso va entre paréntesis y puede tener espacios
+            campos = f.read().rsplit(')', 1)[1].split()
+        return (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def crear_archivo(ruta, tamano):
+    bloque = os.urandom(min(tamano, 1024 * 1024)) or b''
+    with open(ruta, 'wb') as f:
+        escritos = 0
+        while escritos < tamano:
+            parte = bloque[:tamano - escritos]
+            f.write(parte)
+            escritos += len(parte)
+    return ruta
+
+
+class CubetaTokens:
+    """Tasa compartida por varias conexiones (p. ej. el enlace de subida de un nodo)"""
+
+    def __init__(self, mbps):
+        self.bytes_por_s = mbps * 1e6 / 8
+        self._lock = threading.Lock()
+        self._libre_desde = time.perf_counter()
+
+    def consumir(self, nbytes):
+        with self._lock:
+            ahora = time.perf_counter()
+            self._libre_desde = max(self._libre_desde, ahora) + nbytes / self.bytes_por_s
+            espera = self._libre_desde - ahora
+        if espera > 0:
+            time.sleep(espera)
+
+
+class ProxyLimitado:
+    """Proxy TCP local que simula un enlace con tasa `mbps` y latencia `retardo_ms`.
+
+    Escucha en 127.0.0.1:<puerto> y reenvía a `destino` ('ip:puerto'). Solo el sentido
+    de ida está limitado en tasa; el retardo se aplica al primer paquete de cada sentido.
+    `cubeta` (CubetaTokens) limita además la suma de varios proxies que la comparten.
+    """
+
+    def __init__(self, destino, mbps=None, retardo_ms=0, cubeta=None):
+        host, puerto = destino.split(':')
+        self.destino = (host, int(puerto))
+        self.bytes_por_s = mbps * 1e6 / 8 if mbps else None
+        self.retardo = retardo_ms / 1000
+        self.cubeta = cubeta
+        # Bytes reenviados en cada sentido (lo que viaja por el "cable")
+        self.bytes_ida = 0
+        self.bytes_vuelta = 0
+        self.escucha = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.escucha.bind(('127.0.0.1', 0))
+        self.escucha.listen(128)
+        self.puerto = self.escucha.getsockname()[1]
+        self.direccion = f"127.0.0.1:{self.puerto}"
+        threading.Thread(target=self._aceptar, daemon=True).start()
+
+    def _aceptar(self):
+        while True:
+            try:
+                cliente, _ = self.escucha.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._conectar, args=(cliente,), daemon=True).start()
+
+    def _conectar(self, cliente):
+        try:
+            servidor = socket.create_connection(self.destino)
+        except OSError:
+            cliente.close()
+            return
+        ida = threading.Thread(target=self._copiar, args=(cliente, servidor, True), daemon=True)
+        ida.start()
+        self._copiar(servidor, cliente, False)
+        ida.join()
+        cliente.close()
+        servidor.close()
+
+    def _copiar(self, origen, destino, ida):
+        inicio = time.perf_counter()
+        enviados = 0
+        primero = True
+        try:
+            while True:
+                datos = origen.recv(64 * 1024)
+                if not datos:
+                    break
+                if primero and self.retardo:
+                    time.sleep(self.retardo)
+                primero = False
+                if ida and self.bytes_por_s:
+                    # Cubeta de tokens: no adelantarse al ritmo del enlace
+                    enviados += len(datos)
+                    espera = enviados / self.bytes_por_s - (time.perf_counter() - inicio)
+                    if espera > 0:
+                        time.sleep(espera)
+                if ida and self.cubeta:
+                    self.cubeta.consumir(len(datos))
+                if ida:
+                    self.bytes_ida += len(datos)
+                else:
+                    self.bytes_vuelta += len(datos)
+                destino.sendall(datos)
+        except OSError:
+            pass
+        finally:
+            try:
+                destino.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    def cerrar(self):
+        self.escucha.close()
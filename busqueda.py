@@ -0,0 +1,260 @@
+"""Búsquedas punto a punto sobre GrafoCSR: Dijkstra bidireccional, ALT (A* con puntos de referencia) y k caminos (Yen)."""
+import heapq
+import weakref
+
+import numpy as np
+
+from grafo_csr import GrafoCSR, distancias_desde, reconstruir
+from tabla_rutas import version
+
+# Puntos de referencia por grafo: más cotas más ajustadas, pero más memoria y precálculo
+REFERENCIAS = 8
+
+# Grafos de networkx ya convertidos: {grafo: (versión, GrafoCSR)}
+_convertidos = weakref.WeakKeyDictionary()
+_referencias = weakref.WeakKeyDictionary()
+
+
+def dijkstra_bidireccional_csr(g, origen, destino, estadisticas=None):
+    """Dijkstra desde el origen y, sobre el grafo invertido, desde el destino a la vez.
+
+    Cada paso avanza el frente con la menor distancia pendiente. Se para cuando la suma
+    de los dos mínimos pendientes ya no mejora el mejor camino visto (mu), así cada
+    frente cubre más o menos la mitad del radio en vez de uno solo todo el radio.
+    Devuelve (lista de índices, distancia) o (None, inf).
+    """
+    infinito = float('inf')
+    if origen == destino:
+        if estadisticas is not None:
+            estadisticas['asentados'] = 1
+        return [origen], 0.0
+    lados = []
+    for grafo, inicio in ((g, origen), (g.invertido(), destino)):
+        distancias = [infinito] * g.n
+        distancias[inicio] = 0.0
+        lados.append((grafo.listas(), distancias, [-1] * g.n, [(0.0, inicio)]))
+    mu = infinito
+    encuentro = -1
+    asentados = 0
+    heap_ida, heap_vuelta = lados[0][3], lados[1][3]
+    while heap_ida and heap_vuelta:
+        if heap_ida[0][0] + heap_vuelta[0][0] >= mu:
+            break
+        lado = 0 if heap_ida[0][0] <= heap_vuelta[0][0] else 1
+        (desplazamientos, destinos, pesos), distancias, previos, heap = lados[lado]
+        otras = lados[1 - lado][1]
+        distancia, u = heapq.heappop(heap)
+        if distancia > distancias[u]:
+            continue
+        asentados += 1
+        for i in range(desplazamientos[u], desplazamientos[u + 1]):
+            v = destinos[i]
+            nueva = distancia + pesos[i]
+            if nueva < distancias[v]:
+                distancias[v] = nueva
+                previos[v] = u
+                heapq.heappush(heap, (nueva, v))
+            if distancias[v] + otras[v] < mu:
+                mu = distancias[v] + otras[v]
+                encuentro = v
+
+    if estadisticas is not None:
+        estadisticas['asentados'] = asentados
+    if encuentro < 0:
+        return None, infinito
+    camino = reconstruir(lados[0][2], origen, encuentro)
+    # En el grafo invertido, previos apunta al siguiente nodo hacia el destino
+    previos_vuelta = lados[1][2]
+    while camino[-1] != destino:
+        camino.append(previos_vuelta[camino[-1]])
+    return camino, mu
+
+
+class Referencias:
+    """Distancias desde y hacia unos pocos nodos de referencia, para acotar por abajo.
+
+    Por la desigualdad triangular, para cualquier referencia L:
+        d(v, t) >= d(L, t) - d(L, v)   y   d(v, t) >= d(v, L) - d(t, L)
+    La cota de v es el máximo sobre todas las referencias. Se eligen lejos unas de otras
+    (la primera, la más lejana de un nodo cualquiera; cada siguiente, la más lejana de
+    las ya elegidas), que es donde las cotas salen más ajustadas.
+    """
+
+    def __init__(self, g, cantidad=REFERENCIAS):
+        invertido = g.invertido()
+        self.indices = []
+        desde, hacia = [], []
+        cercania = np.full(g.n, np.inf)
+        candidata = int(np.argmax(_finitas(np.array(distancias_desde(g, 0)))))
+        for _ in range(min(cantidad, g.n)):
+            self.indices.append(candidata)
+            desde.append(np.array(distancias_desde(g, candidata)))
+            hacia.append(np.array(distancias_desde(invertido, candidata)))
+            cercania = np.minimum(cercania, desde[-1] + hacia[-1])
+            puntaje = _finitas(cercania)
+            puntaje[self.indices] = -1
+            candidata = int(np.argmax(puntaje))
+            if puntaje[candidata] <= 0:
+                break
+        # desde[l][v] = d(L, v); hacia[l][v] = d(v, L)
+        self.desde = np.array(desde)
+        self.hacia = np.array(hacia)
+
+    def cotas(self, destino):
+        """Cota inferior de d(v, destino) para todos los nodos v, como lista"""
+        with np.errstate(invalid='ignore'):
+            adelante = self.desde[:, destino, None] - self.desde
+            atras = self.hacia - self.hacia[:, destino, None]
+        # +inf: el destino no es alcanzable desde v (se conserva). -inf e inf - inf no
+        # dicen nada (cota 0)
+        adelante = np.nan_to_num(adelante, nan=0.0, posinf=np.inf, neginf=0.0)
+        atras = np.nan_to_num(atras, nan=0.0, posinf=np.inf, neginf=0.0)
+        return np.maximum(np.maximum(adelante, atras).max(axis=0), 0.0).tolist()
+
+
+def _finitas(distancias):
+    return np.where(np.isfinite(distancias), distancias, -1.0)
+
+
+def referencias_de(g, cantidad=REFERENCIAS):
+    """Referencias del grafo, calculadas la primera vez que se piden"""
+    referencias = _referencias.get(g)
+    if referencias is None:
+        referencias = _referencias[g] = Referencias(g, cantidad)
+    return referencias
+
+
+def alt_csr(g, referencias, origen, destino, estadisticas=None):
+    """A* con las cotas de `referencias` como heurística.
+
+    Las cotas de la desigualdad triangular son consistentes, así que cada nodo se cierra
+    una sola vez como en Dijkstra, pero la búsqueda avanza hacia el destino en vez de
+    en círculo. Devuelve (lista de índices, distancia) o (None, inf).
+    """
+    desplazamientos, destinos, pesos = g.listas()
+    cotas = referencias.cotas(destino)
+    infinito = float('inf')
+    distancias = [infinito] * g.n
+    previos = [-1] * g.n
+    distancias[origen] = 0.0
+    heap = [(cotas[origen], 0.0, origen)]
+    asentados = 0
+    while heap:
+        _, distancia, u = heapq.heappop(heap)
+        if distancia > distancias[u]:
+            continue
+        asentados += 1
+        if u == destino:
+            break
+        for i in range(desplazamientos[u], desplazamientos[u + 1]):
+            v = destinos[i]
+            nueva = distancia + pesos[i]
+            # Cota infinita: desde v no se llega al destino
+            if nueva < distancias[v] and cotas[v] != infinito:
+                distancias[v] = nueva
+                previos[v] = u
+                heapq.heappush(heap, (nueva + cotas[v], nueva, v))
+
+    if estadisticas is not None:
+        estadisticas['asentados'] = asentados
+    if distancias[destino] == infinito:
+        return None, infinito
+    return reconstruir(previos, origen, destino), distancias[destino]
+
+
+def como_csr(grafo):
+    """GrafoCSR de un grafo de networkx, convertido una vez por instantánea de métricas"""
+    if isinstance(grafo, GrafoCSR):
+        return grafo
+    guardado = _convertidos.get(grafo)
+    if guardado is None or guardado[0] != version(grafo):
+        guardado = _convertidos[grafo] = (version(grafo), GrafoCSR.desde_networkx(grafo))
+    return guardado[1]
+
+
+def _peso(listas, u, v):
+    desplazamientos, destinos, pesos = listas
+    return min(pesos[i] for i in range(desplazamientos[u], desplazamientos[u + 1]) if destinos[i] == v)
+
+
+def _camino_restringido(listas, origen, destino, hacia, prohibidos, aristas_prohibidas):
+    """A* de origen a destino sin pasar por `prohibidos` ni por `aristas_prohibidas`.
+
+    `hacia` son las distancias exactas al destino en el grafo completo: quitar nodos o
+    aristas solo alarga caminos, así que siguen siendo una cota consistente.
+    """
+    desplazamientos, destinos, pesos = listas
+    infinito = float('inf')
+    distancias = {origen: 0.0}
+    previos = {origen: -1}
+    heap = [(hacia[origen], 0.0, origen)]
+    while heap:
+        _, distancia, u = heapq.heappop(heap)
+        if distancia > distancias[u]:
+            continue
+        if u == destino:
+            camino = [u]
+            while previos[camino[-1]] >= 0:
+                camino.append(previos[camino[-1]])
+            camino.reverse()
+            return camino, distancia
+        for i in range(desplazamientos[u], desplazamientos[u + 1]):
+            v = destinos[i]
+            if v in prohibidos or hacia[v] == infinito or (u, v) in aristas_prohibidas:
+                continue
+            nueva = distancia + pesos[i]
+            if nueva < distancias.get(v, infinito):
+                distancias[v] = nueva
+                previos[v] = u
+                heapq.heappush(heap, (nueva + hacia[v], nueva, v))
+    return None, infinito
+
+
+def yen_csr(g, origen, destino, k, hacia_destino=None, primero=None):
+    """Hasta k caminos sin ciclos de origen a destino, de menor a mayor costo (Yen).
+
+    Devuelve [(lista de índices, costo), ...]. Cada camino nuevo sale de desviar el
+    anterior en uno de sus nodos (spur) evitando la raíz común y las aristas que ya
+    usaron los caminos aceptados con esa raíz. El árbol de caminos mínimos hacia el
+    destino (`hacia_destino`, d(v, destino) para cada v) se calcula una vez y guía con
+    A* todas las búsquedas de desvío. Como en Lawler, un camino solo se desvía desde el
+    punto donde se separó de su padre: los desvíos anteriores ya se probaron.
+    `primero` permite pasar el camino mínimo si ya se conoce.
+    """
+    listas = g.listas()
+    if hacia_destino is None:
+        hacia_destino = distancias_desde(g.invertido(), destino)
+    if hacia_destino[origen] == float('inf'):
+        return []
+    if primero is None:
+        primero, _ = _camino_restringido(listas, origen, destino, hacia_destino, set(), set())
+
+    def costo_de(camino):
+        return sum(_peso(listas, u, v) for u, v in zip(camino, camino[1:]))
+
+    caminos = [(primero, costo_de(primero))]
+    desvios = [0]
+    candidatos = []
+    vistos = {tuple(primero)}
+    while len(caminos) < k:
+        previo = caminos[-1][0]
+        acumulado = [0.0]
+        for u, v in zip(previo, previo[1:]):
+            acumulado.append(acumulado[-1] + _peso(listas, u, v))
+        for i in range(desvios[-1], len(previo) - 1):
+            raiz = previo[:i + 1]
+            aristas_prohibidas = {(c[i], c[i + 1]) for c, _ in caminos if len(c) > i + 1 and c[:i + 1] == raiz}
+            tramo, costo = _camino_restringido(listas, previo[i], destino, hacia_destino, set(raiz[:-1]),
+                                               aristas_prohibidas)
+            if tramo is None:
+                continue
+            nuevo = raiz[:-1] + tramo
+            if tuple(nuevo) not in vistos:
+                vistos.add(tuple(nuevo))
+                heapq.heappush(candidatos, (acumulado[i] + costo, len(nuevo), nuevo, i))
+        if not candidatos:
+            break
+        costo, _, camino, i = heapq.heappop(candidatos)
+        caminos.append((camino, costo))
+        desvios.append(i)
+    return caminos
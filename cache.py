@@ -0,0 +1,188 @@
+"""Caché en disco direccionada por contenido para los relays del servidor."""
+import argparse
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DIRECTORIO = '.cache_relay'
+INDICE = 'indice.json'
+CAPACIDAD = 1024 ** 3
+# Segundos entre escrituras del índice cuando solo cambiaron el orden de uso y los contadores
+GUARDAR_CADA = 30
+
+
+class CacheContenido:
+    """Archivos guardados por su clave de contenido (hex) con tope de bytes y desalojo LRU.
+
+    El índice (orden de uso, tamaños y contadores) se guarda en disco, así la caché y
+    sus estadísticas sobreviven a reinicios del servidor. Al entrar o desalojar una
+    entrada se escribe enseguida; lo que cambian las búsquedas (orden LRU y contadores)
+    queda en memoria y se escribe cada GUARDAR_CADA segundos y al salir. capacidad=None
+    toma la del índice guardado (o CAPACIDAD si la caché es nueva).
+    """
+
+    def __init__(self, directorio=DIRECTORIO, capacidad=None):
+        self.directorio = directorio
+        self.capacidad = capacidad
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # clave -> tamaño, de menos a más reciente
+        self.ocupado = 0
+        self.contadores = {'aciertos': 0, 'fallos': 0, 'desalojos': 0, 'bytes_servidos': 0}
+        self._sucio = False
+        os.makedirs(directorio, exist_ok=True)
+        self._cargar()
+        threading.Thread(target=self._guardar_periodico, daemon=True).start()
+        atexit.register(self.guardar)
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave)
+
+    def _cargar(self):
+        try:
+            with open(os.path.join(self.directorio, INDICE)) as f:
+                indice = json.load(f)
+        except (OSError, ValueError):
+            indice = {}
+        self.contadores.update(indice.get('contadores', {}))
+        if self.capacidad is None:
+            self.capacidad = indice.get('capacidad', CAPACIDAD)
+        for clave, tamano in indice.get('entradas', []):
+            if os.path.exists(self._ruta(clave)):
+                self._entradas[clave] = tamano
+        # Archivos que quedaron fuera del índice (p. ej. tras un corte) se adoptan como los más viejos
+        for nombre in os.listdir(self.directorio):
+            if nombre != INDICE and not nombre.endswith('.tmp') and nombre not in self._entradas:
+                self._entradas[nombre] = os.path.getsize(self._ruta(nombre))
+                self._entradas.move_to_end(nombre, last=False)
+        self.ocupado = sum(self._entradas.values())
+        self._desalojar(0)
+        if self._sucio:
+            self._guardar_indice()
+
+    def _guardar_indice(self):
+        ruta = os.path.join(self.directorio, INDICE)
+        with open(ruta + '.tmp', 'w') as f:
+            json.dump({'capacidad': self.capacidad, 'entradas': list(self._entradas.items()),
+                       'contadores': self.contadores}, f)
+        os.replace(ruta + '.tmp', ruta)
+        self._sucio = False
+
+    def guardar(self):
+        """Escribe el índice si las búsquedas lo cambiaron desde la última escritura"""
+        with self._lock:
+            if self._sucio:
+                self._guardar_indice()
+
+    def _guardar_periodico(self):
+        while True:
+            time.sleep(GUARDAR_CADA)
+            try:
+                self.guardar()
+            except OSError as e:
+                print(f"[!] Caché: no se pudo guardar el índice: {e}")
+
+    def _desalojar(self, necesario):
+        while self._entradas and self.ocupado + necesario > self.capacidad:
+            clave, tamano = self._entradas.popitem(last=False)
+            try:
+                os.remove(self._ruta(clave))
+            except OSError:
+                pass
+            self.ocupado -= tamano
+            self.contadores['desalojos'] += 1
+            self._sucio = True
+            print(f"[*] Caché: desalojado {clave[:12]}… ({tamano} bytes)")
+
+    def abrir(self, clave):
+        """Archivo abierto ('rb') del contenido si está en caché (y lo marca como usado), o None.
+
+        Se abre con el lock tomado, así ningún desalojo concurrente lo borra entre la
+        búsqueda y la apertura; una vez abierto, la lectura sigue aunque se desaloje.
+        Cuenta acierto/fallo.
+        """
+        with self._lock:
+            f = None
+            if clave in self._entradas:
+                try:
+                    f = open(self._ruta(clave), 'rb')
+                except OSError:
+                    # Borrado por fuera de la caché: se olvida la entrada
+                    self.ocupado -= self._entradas.pop(clave)
+            if f is not None:
+                self._entradas.move_to_end(clave)
+                self.contadores['aciertos'] += 1
+                self.contadores['bytes_servidos'] += self._entradas[clave]
+            else:
+                self.contadores['fallos'] += 1
+            self._sucio = True
+        return f
+
+    @contextmanager
+    def guardando(self, tamano):
+        """Archivo temporal donde escribir un contenido que luego se confirma con confirmar().
+
+        Uso: with cache.guardando(tamano) as entrada: entrada.write(...); entrada.confirmar(clave)
+        Si no se confirma (hash incorrecto, error a mitad) el temporal se borra.
+        """
+        entrada = _Entrada(self, tamano)
+        try:
+            yield entrada
+        finally:
+            entrada.cerrar()
+
+    def _confirmar(self, temporal, clave, tamano):
+        if tamano > self.capacidad:
+            return False
+        with self._lock:
+            if clave in self._entradas:
+                return False
+            self._desalojar(tamano)
+            os.replace(temporal, self._ruta(clave))
+            self._entradas[clave] = tamano
+            self.ocupado += tamano
+            self._guardar_indice()
+        return True
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.contadores['aciertos'] + self.contadores['fallos']
+            return dict(self.contadores, entradas=len(self._entradas), ocupado=self.ocupado,
+                        capacidad=self.capacidad,
+                        tasa_aciertos=self.contadores['aciertos'] / total if total else 0.0)
+
+
+class _Entrada:
+    def __init__(self, cache, tamano):
+        self.cache = cache
+        self.tamano = tamano
+        self.temporal = os.path.join(cache.directorio, f"{threading.get_ident()}-{time.monotonic_ns()}.tmp")
+        self.f = open(self.temporal, 'wb')
+        self.confirmada = False
+
+    def write(self, datos):
+        self.f.write(datos)
+
+    def confirmar(self, clave):
+        self.f.close()
+        self.confirmada = self.cache._confirmar(self.temporal, clave, self.tamano)
+
+    def cerrar(self):
+        self.f.close()
+        if not self.confirmada:
+            try:
+                os.remove(self.temporal)
+            except OSError:
+                pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Estadísticas de la caché de relays")
+    parser.add_argument("--directorio", default=DIRECTORIO, help="Directorio de la caché")
+    args = parser.parse_args()
+    cache = CacheContenido(args.directorio)
+    for nombre, valor in cache.estadisticas().items():
+        print(f"{nombre:>15}: {valor}")
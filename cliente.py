@@ -1,72 +1,600 @@
-import socket
 import struct
 import os
+import random
+import threading
+import time
+
+from admision import CODIGO_OCUPADO, OP_ADMISION, PRIORIDAD_NORMAL
+from ajuste import conectar_ajustado, registrar_envio
+from compresion import NOMBRES, SIN_COMPRESION, disponibles, elegir_codec
+from delta import calcular_delta, enviar_delta, leer_firmas
+from manifiesto import (TAM_BLOQUE, BloqueCorrupto, bloques_verificados, clave_contenido, empaquetar_manifiesto,
+                        enviar_comprimido, leer_manifiesto, manifiesto_de, recibir_verificando)
+from metricas import ancho_banda_ruta
+import transporte
+from transporte import PoolConexiones, enviar_desde_archivo, recv_all
 
 OP_SEND = 0x02
 OP_RELAY = 0x03
 OP_RESPONSE = 0x04
+OP_SEND_RANGO = 0x05
+OP_TUNEL = 0x06
+OP_SEND_REANUDABLE = 0x07
+OP_OFFSET = 0x08
+OP_MANIFIESTO = 0x09
+OP_REQUEST_RANGO = 0x0A
+OP_HOLA = 0x0B
+OP_LOTE = 0x0C
+OP_MULTICAST = 0x0D
+OP_FIRMAS = 0x0E
+OP_DELTA = 0x0F
+OP_RELAY_CACHE = 0x10
+
+ENTRADA_FIN = 0x00
+ENTRADA_ARCHIVO = 0x01
+ENTRADA_DIRECTORIO = 0x02
+
+# Archivos menores que esto se juntan con sus cabeceras en un solo sendall
+TAM_ARCHIVO_PEQUENO = 64 * 1024
+
+# Veces que se vuelve a pedir turno a un servidor ocupado, y espera base entre intentos (s)
+REINTENTOS_OCUPADO = 8
+ESPERA_OCUPADO = 0.5
+
+# Rutas alternativas que se precalculan por envío (la primera es la óptima)
+RUTAS_RESPALDO = 3
 
-def recv_all(sock, length):
-    data = b''
-    while len(data) < length:
-        more = sock.recv(length - len(data))
-        if not more:
-            raise EOFError("Socket cerrado antes de tiempo")
-        data += more
-    return data
+# Conexiones abiertas por destino (o por ruta de túnel) que se reutilizan entre envíos
+POOL = PoolConexiones()
+
+class OpcodeNoSoportado(Exception):
+    """El servidor (p. ej. en modo async) respondió con el código 0x02"""
+
+class ServidorOcupado(Exception):
+    """El servidor siguió respondiendo ocupado tras REINTENTOS_OCUPADO intentos"""
 
 def leer_confirmacion(sock):
     opcode = ord(recv_all(sock, 1))
     if opcode != OP_RESPONSE:
         print(f"[ERROR] Respuesta inesperada del servidor: opcode {opcode}")
-        return
+        return False
 
-    codigo = ord(recv_all(sock, 1))
-    largo_msg = struct.unpack('>I', recv_all(sock, 4))[0]
-    mensaje = recv_all(sock, largo_msg).decode()
+    codigo, mensaje = leer_cuerpo_respuesta(sock)
 
     if codigo == 0x00:
         print(f"[OK] Confirmación del servidor: {mensaje}")
     else:
         print(f"[ERROR] Servidor reportó error: {mensaje}")
+    return codigo == 0x00
 
-def enviar_archivo(host, puerto, archivo):
-    nombre = os.path.basename(archivo)
-    tamano = os.path.getsize(archivo)
-    datos = open(archivo, 'rb').read()
+def enviar_archivo(host, puerto, archivo, reintentos=3, prioridad=PRIORIDAD_NORMAL, progreso=None):
+    """Envía archivo a host:puerto; si la conexión se corta, reanuda desde el último bloque verificado.
 
-    with socket.create_connection((host, puerto)) as sock:
+    La conexión vuelve al pool al terminar, así varios archivos seguidos al mismo
+    destino comparten un único handshake TCP. `prioridad` (0-255, menor = antes) ordena
+    la cola del servidor si tiene control de admisión. El archivo sale del disco por
+    tramos (sendfile), sin cargarlo en memoria; progreso(enviados, total) se llama a
+    medida que los bytes salen por el socket.
+    """
+    def conectar():
+        sock = conectar_ajustado((host, puerto))
         print(f"[INFO] Conectado a {host}:{puerto}")
-        header = struct.pack("!B I {}s Q".format(len(nombre)),
-                             OP_SEND,
-                             len(nombre),
-                             nombre.encode(),
-                             tamano)
-        sock.sendall(header + datos)
-        leer_confirmacion(sock)
-
-def enviar_por_ruta(host, puerto, archivo, ruta):
-    nombre = os.path.basename(archivo)
-    nombre_bytes = nombre.encode()
-    num_nodos = len(ruta)
-    tamano = os.path.getsize(archivo)
+        return sock
+
+    try:
+        return enviar_con_reintentos((host, puerto), conectar, archivo, reintentos, [host], prioridad, progreso)
+    except OpcodeNoSoportado:
+        return enviar_archivo_simple(host, puerto, archivo, progreso)
+
+def enviar_por_ruta(host, puerto, archivo, ruta, reintentos=3, prioridad=PRIORIDAD_NORMAL, progreso=None):
+    """Envía archivo al último nodo de `ruta` pasando por host:puerto y el resto de saltos.
+
+    Usa un túnel hasta el destino, así la reanudación funciona igual que en envío directo.
+    El túnel completo se guarda en el pool para los siguientes envíos por la misma ruta.
+    Memoria y progreso como en enviar_archivo.
+    """
+    saltos = [f"{host}:{puerto}"] + list(ruta)
+
+    def conectar():
+        sock = abrir_ruta(saltos)
+        print(f"[INFO] Conectado a {host}:{puerto} para retransmisión")
+        return sock
+
+    try:
+        return enviar_con_reintentos(tuple(saltos), conectar, archivo, reintentos,
+                                     [nodo.split(':')[0] for nodo in saltos], prioridad, progreso)
+    except OpcodeNoSoportado:
+        return enviar_por_relay(host, puerto, archivo, ruta, progreso)
+
+def enviar_con_reintentos(clave, conectar, archivo, reintentos, saltos, prioridad=PRIORIDAD_NORMAL,
+                          progreso=None):
+    """Repite enviar_reanudable hasta completar o agotar los reintentos.
 
+    clave: clave del pool de conexiones. saltos: IPs de la ruta hasta el destino, para
+    buscar el ancho de banda en las métricas y decidir si compensa comprimir.
+    """
+    hashes = manifiesto_de(archivo)
+    # elegir_codec prueba varios codecs sobre una muestra: se elige una vez por archivo y
+    # la elección sirve para los reintentos y para la sesión del pool
+    firma = (archivo, os.path.getmtime(archivo), os.path.getsize(archivo))
+    compresion = None
+    intento = 0
+    while intento <= reintentos:
+        sock, sesion, reusada = POOL.obtener(clave, conectar)
+        try:
+            if 'codecs' not in sesion:
+                sesion['codecs'] = negociar(sock)
+                sesion['mbps'] = ancho_banda_ruta([sock.getsockname()[0]] + saltos)
+            if compresion is None:
+                elegida = sesion.get('compresion')
+                if elegida and elegida[0] == firma:
+                    compresion = elegida[1]
+                else:
+                    compresion = elegir_codec(archivo, sesion['mbps'], sesion['codecs'])
+            sesion['compresion'] = (firma, compresion)
+            if compresion[0] != SIN_COMPRESION:
+                print(f"[INFO] Compresión {NOMBRES[compresion[0]]} nivel {compresion[1]} "
+                      f"(enlace {sesion['mbps']:.1f} Mbps)")
+            pedir_turno(sock, os.path.getsize(archivo), prioridad)
+            if enviar_reanudable(sock, archivo, hashes, *compresion, progreso=progreso, medir=len(saltos) == 1):
+                POOL.devolver(clave, sock, sesion)
+                return True
+            sock.close()
+        except (OpcodeNoSoportado, ServidorOcupado):
+            sock.close()
+            raise
+        except (OSError, EOFError) as e:
+            sock.close()
+            if reusada:
+                # La conexión del pool murió mientras estaba ociosa: no cuenta como intento
+                continue
+            print(f"[ERROR] Conexión interrumpida: {e}")
+        intento += 1
+        if intento <= reintentos:
+            espera = min(2 ** intento, 30)
+            print(f"[INFO] Reintento {intento}/{reintentos} en {espera} s")
+            time.sleep(espera)
+    raise Exception(f"No se pudo completar el envío de {archivo} tras {reintentos + 1} intentos")
+
+def enviar_con_respaldo(rutas, enviar, reintentos=3):
+    """Prueba las rutas precalculadas en orden hasta que una complete el envío.
+
+    rutas: listas de 'ip:puerto' del primer salto al destino (como en enviar_por_ruta).
+    enviar(ruta, reintentos) hace el envío y devuelve True si el destino lo confirmó.
+    Todas menos la última se intentan sin reintentos: si una falla se pasa en el acto
+    a la siguiente, sin esperar ni volver a calcular rutas. Devuelve la ruta usada.
+    Un servidor ocupado no se salta, porque el destino es el mismo en todas las rutas.
+    """
+    for i, ruta in enumerate(rutas):
+        ultima = i == len(rutas) - 1
+        try:
+            if enviar(ruta, reintentos if ultima else 0):
+                return ruta
+            error = Exception("El destino no confirmó el envío")
+        except ServidorOcupado:
+            raise
+        except Exception as e:
+            error = e
+        if ultima:
+            raise error
+        print(f"[!] Falló la ruta {' -> '.join(ruta)} ({error}); probando la siguiente")
+
+def enviar_por_rutas(archivo, rutas, prioridad=PRIORIDAD_NORMAL, progreso=None):
+    """enviar_archivo / enviar_por_ruta con respaldo en las rutas alternativas dadas"""
+    def enviar(ruta, reintentos):
+        host, puerto = ruta[0].split(':')
+        if len(ruta) == 1:
+            return enviar_archivo(host, int(puerto), archivo, reintentos, prioridad, progreso)
+        return enviar_por_ruta(host, int(puerto), archivo, ruta[1:], reintentos, prioridad, progreso)
+
+    return enviar_con_respaldo(rutas, enviar)
+
+def sincronizar_archivo(host, puerto, archivo, ruta=()):
+    """Envía solo lo que cambió respecto a la copia que ya tiene el destino (estilo rsync).
+
+    El destino responde con las firmas de los bloques de su copia; aquí se buscan esos
+    bloques en el archivo local y solo viajan los literales y las referencias a bloques.
+    Funciona igual en directo que por túnel. Si el destino no tiene copia, no soporta
+    delta o la reconstrucción no coincide, se envía el archivo completo.
+    """
+    saltos = [f"{host}:{puerto}"] + list(ruta)
+    clave = tuple(saltos) if ruta else (host, puerto)
+    nombre_bytes = os.path.basename(archivo).encode()
+    sock, sesion, _ = POOL.obtener(clave, lambda: abrir_ruta(saltos))
+    try:
+        sock.sendall(struct.pack(">BI", OP_FIRMAS, len(nombre_bytes)) + nombre_bytes)
+        opcode = ord(recv_all(sock, 1))
+        if opcode == OP_RESPONSE:
+            codigo, mensaje = leer_cuerpo_respuesta(sock)
+            if codigo != 0x02:
+                raise Exception(mensaje)
+            sock.close()
+            print("[INFO] El destino no soporta envío delta")
+        else:
+            firmas = leer_firmas(sock)
+            if not firmas[2]:
+                POOL.devolver(clave, sock, sesion)
+                print(f"[INFO] El destino no tiene copia de {os.path.basename(archivo)}")
+            else:
+                pedir_turno(sock, os.path.getsize(archivo))
+                if enviar_por_delta(sock, archivo, firmas):
+                    POOL.devolver(clave, sock, sesion)
+                    return True
+                sock.close()
+    except (OSError, EOFError) as e:
+        sock.close()
+        print(f"[ERROR] Envío delta interrumpido: {e}")
+    except Exception:
+        sock.close()
+        raise
+
+    print(f"[INFO] Enviando {archivo} completo")
+    if ruta:
+        return enviar_por_ruta(host, puerto, archivo, ruta)
+    return enviar_archivo(host, puerto, archivo)
+
+def enviar_por_delta(sock, archivo, firmas):
+    """OP_DELTA con las instrucciones calculadas contra `firmas`; devuelve la confirmación"""
+    nombre_bytes = os.path.basename(archivo).encode()
+    instrucciones, digest = calcular_delta(archivo, firmas)
+    tamano = os.path.getsize(archivo)
+    sock.sendall(struct.pack(">BI", OP_DELTA, len(nombre_bytes)) + nombre_bytes +
+                 struct.pack(">QI", tamano, firmas[1]))
     with open(archivo, 'rb') as f:
-        datos = f.read()
+        literales = enviar_delta(sock, f, instrucciones, digest)
+    copiados = tamano - literales
+    print(f"[INFO] Delta: {literales} bytes literales y {copiados} reutilizados del destino "
+          f"({100 * copiados / max(tamano, 1):.1f}% sin transmitir)")
+    return leer_confirmacion(sock)
+
+def enviar_directorio(host, puerto, directorio, ruta=()):
+    """Envía un directorio completo en un único flujo OP_LOTE (directo o por túnel).
+
+    Se espera una sola confirmación al final, no una por archivo.
+    """
+    saltos = [f"{host}:{puerto}"] + list(ruta)
+    clave = tuple(saltos) if ruta else (host, puerto)
+    tamano = sum(os.path.getsize(os.path.join(raiz, n)) for raiz, _, nombres in os.walk(directorio) for n in nombres)
+    sock, sesion, _ = POOL.obtener(clave, lambda: abrir_ruta(saltos))
+    try:
+        pedir_turno(sock, tamano)
+        archivos, total = enviar_lote(sock, directorio)
+        print(f"[INFO] Lote enviado: {archivos} archivos, {total} bytes")
+        ok = leer_confirmacion(sock)
+    except Exception:
+        sock.close()
+        raise
+    if ok:
+        POOL.devolver(clave, sock, sesion)
+    else:
+        sock.close()
+    return ok
+
+def enviar_lote(sock, directorio):
+    """Escribe en sock el flujo OP_LOTE de `directorio`; devuelve (archivos, bytes)"""
+    directorio = os.path.abspath(directorio)
+    base = os.path.basename(directorio).encode()
+    pendiente = bytearray(struct.pack(">BI", OP_LOTE, len(base)) + base)
+    archivos = total = 0
+
+    def entrada(tipo, relativa, modo, tamano):
+        nombre = relativa.replace(os.sep, '/').encode()
+        return struct.pack(">BI", tipo, len(nombre)) + nombre + struct.pack(">IQ", modo, tamano)
+
+    for raiz, dirs, nombres in os.walk(directorio):
+        dirs.sort()
+        relativa_raiz = os.path.relpath(raiz, directorio)
+        if relativa_raiz != '.':
+            pendiente += entrada(ENTRADA_DIRECTORIO, relativa_raiz, os.stat(raiz).st_mode, 0)
+        for nombre in sorted(nombres):
+            ruta = os.path.join(raiz, nombre)
+            with open(ruta, 'rb') as f:
+                st = os.fstat(f.fileno())
+                pendiente += entrada(ENTRADA_ARCHIVO, os.path.relpath(ruta, directorio), st.st_mode, st.st_size)
+                if st.st_size < TAM_ARCHIVO_PEQUENO:
+                    datos = f.read(st.st_size)
+                    enviados = len(datos)
+                    pendiente += datos
+                else:
+                    sock.sendall(pendiente)
+                    pendiente.clear()
+                    enviados = enviar_desde_archivo(sock, f, 0, st.st_size)
+                if enviados != st.st_size:
+                    # El flujo ya anunció st_size bytes: no se puede seguir sin desincronizarlo
+                    raise Exception(f"{ruta} cambió de tamaño durante el envío")
+            archivos += 1
+            total += st.st_size
+            if len(pendiente) >= transporte.TAM_CHUNK:
+                sock.sendall(pendiente)
+                pendiente.clear()
+
+    pendiente += struct.pack("B", ENTRADA_FIN)
+    sock.sendall(pendiente)
+    return archivos, total
+
+def enviar_multicast(archivo, arbol):
+    """Distribuye archivo por un árbol con raíz en este equipo (p. ej. el MST de Kruskal).
+
+    arbol: [('ip:puerto', subarbol), ...] con los hijos directos de la raíz. Cada hijo
+    guarda el archivo y lo reenvía a sus propios hijos mientras lo recibe, así el enlace
+    de subida local solo lo transmite una vez por hijo directo. Devuelve {nodo: 'OK' o
+    motivo del fallo} con el resultado agregado de todo el árbol.
+    """
+    nombre_bytes = os.path.basename(archivo).encode()
+    tamano = os.path.getsize(archivo)
+    resultados = {}
+    lock = threading.Lock()
 
-    with socket.create_connection((host, puerto)) as sock:
+    def empaquetar_arbol(hijos):
+        return struct.pack("B", len(hijos)) + b''.join(
+            nodo.encode().ljust(22, b' ') + empaquetar_arbol(subarbol) for nodo, subarbol in hijos)
+
+    def enviar(nodo, subarbol):
+        host, puerto = nodo.split(':')
+        clave = (host, int(puerto))
+        try:
+            sock, sesion, _ = POOL.obtener(clave, lambda: conectar_ajustado(clave))
+            try:
+                pedir_turno(sock, tamano)
+                sock.sendall(struct.pack(">BI", OP_MULTICAST, len(nombre_bytes)) + nombre_bytes +
+                             struct.pack(">Q", tamano) + nodo.encode().ljust(22, b' ') +
+                             empaquetar_arbol(subarbol))
+                with open(archivo, 'rb') as f:
+                    enviar_desde_archivo(sock, f, 0, tamano)
+                if ord(recv_all(sock, 1)) != OP_RESPONSE:
+                    raise Exception("Respuesta inesperada del servidor")
+                codigo, mensaje = leer_cuerpo_respuesta(sock)
+            except Exception:
+                sock.close()
+                raise
+            if codigo == 0x02:
+                sock.close()
+                raise OpcodeNoSoportado(mensaje)
+            POOL.devolver(clave, sock, sesion)
+            parciales = {}
+            for linea in mensaje.splitlines():
+                n, _, estado = linea.partition(' ')
+                parciales[n] = 'OK' if estado == 'OK' else estado.replace('ERROR: ', '', 1)
+        except Exception as e:
+            parciales = {n: f"{e}" for n in _nodos_arbol(nodo, subarbol)}
+        with lock:
+            resultados.update(parciales)
+
+    hilos = [threading.Thread(target=enviar, args=hijo) for hijo in arbol]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    fallidos = {n: e for n, e in resultados.items() if e != 'OK'}
+    if fallidos:
+        for n, e in fallidos.items():
+            print(f"[ERROR] Multicast a {n}: {e}")
+    else:
+        print(f"[OK] Multicast completado en {len(resultados)} nodos")
+    return resultados
+
+def _nodos_arbol(nodo, subarbol):
+    nodos = [nodo]
+    for hijo, nietos in subarbol:
+        nodos.extend(_nodos_arbol(hijo, nietos))
+    return nodos
+
+def pedir_turno(sock, tamano, prioridad=PRIORIDAD_NORMAL):
+    """OP_ADMISION: reserva turno en el servidor para la siguiente transferencia.
+
+    Si el servidor limita las transferencias simultáneas, la respuesta llega cuando
+    hay hueco. Si responde ocupado (cola llena) se vuelve a pedir por la misma conexión
+    con espera exponencial y aleatoria, para que los clientes rechazados no vuelvan
+    todos a la vez. Lanza ServidorOcupado si sigue ocupado tras REINTENTOS_OCUPADO intentos.
+    """
+    for intento in range(REINTENTOS_OCUPADO + 1):
+        sock.sendall(struct.pack(">BBQ", OP_ADMISION, prioridad, tamano))
+        if ord(recv_all(sock, 1)) != OP_RESPONSE:
+            raise Exception("Respuesta inesperada del servidor")
+        codigo, mensaje = leer_cuerpo_respuesta(sock)
+        if codigo == 0x00:
+            return
+        if codigo == 0x02:
+            raise OpcodeNoSoportado(mensaje)
+        if codigo != CODIGO_OCUPADO:
+            raise Exception(mensaje)
+        if intento < REINTENTOS_OCUPADO:
+            espera = min(ESPERA_OCUPADO * 2 ** intento, 30) * random.uniform(0.5, 1.5)
+            print(f"[INFO] {mensaje} (reintento {intento + 1}/{REINTENTOS_OCUPADO} en {espera:.1f} s)")
+            time.sleep(espera)
+    raise ServidorOcupado(mensaje)
+
+def negociar(sock):
+    """OP_HOLA: ofrece los codecs locales y devuelve los que también soporta el servidor"""
+    ofrecidos = disponibles()
+    sock.sendall(struct.pack("BB", OP_HOLA, len(ofrecidos)) + bytes(ofrecidos))
+    opcode = ord(recv_all(sock, 1))
+    if opcode == OP_RESPONSE:
+        codigo, mensaje = leer_cuerpo_respuesta(sock)
+        if codigo == 0x02:
+            raise OpcodeNoSoportado(mensaje)
+        raise Exception(mensaje)
+    return list(recv_all(sock, ord(recv_all(sock, 1))))
+
+def enviar_reanudable(sock, archivo, hashes, codec=SIN_COMPRESION, nivel=None, progreso=None, medir=False):
+    """Envía el manifiesto, espera el offset verificado por el receptor y manda el resto.
+
+    medir: el socket va directo al destino, así la tasa lograda (sin compresión) se
+    registra en las métricas como ancho de banda de ese enlace.
+    """
+    nombre_bytes = os.path.basename(archivo).encode()
+    tamano = os.path.getsize(archivo)
+
+    sock.sendall(struct.pack(">BI", OP_SEND_REANUDABLE, len(nombre_bytes)) + nombre_bytes +
+                 struct.pack(">QB", tamano, codec) + empaquetar_manifiesto(hashes))
+    offset = leer_offset(sock)
+    if offset:
+        print(f"[INFO] Reanudando desde el byte {offset} de {tamano}")
+    avanzar = contador_progreso(progreso, offset, tamano)
+    inicio = time.perf_counter()
+    if offset < tamano:
+        with open(archivo, 'rb') as f:
+            if codec == SIN_COMPRESION:
+                enviar_desde_archivo(sock, f, offset, tamano - offset, avanzar)
+            else:
+                enviar_comprimido(sock, f, offset, tamano, TAM_BLOQUE, codec, nivel, avanzar)
+    ok = leer_confirmacion(sock)
+    if ok and medir and codec == SIN_COMPRESION:
+        registrar_envio(sock, tamano - offset, time.perf_counter() - inicio)
+    return ok
+
+def contador_progreso(progreso, inicial, total):
+    """Convierte los incrementos de bytes en llamadas progreso(enviados, total); None si no hay callback"""
+    if progreso is None:
+        return None
+    enviados = inicial
+    progreso(enviados, total)
+
+    def avanzar(n):
+        nonlocal enviados
+        enviados += n
+        progreso(enviados, total)
+    return avanzar
+
+def leer_offset(sock):
+    opcode = ord(recv_all(sock, 1))
+    if opcode == OP_OFFSET:
+        return struct.unpack(">Q", recv_all(sock, 8))[0]
+    if opcode != OP_RESPONSE:
+        raise Exception(f"Respuesta inesperada del servidor: opcode {opcode}")
+    codigo, mensaje = leer_cuerpo_respuesta(sock)
+    if codigo == 0x02:
+        raise OpcodeNoSoportado(mensaje)
+    raise Exception(mensaje)
+
+def leer_cuerpo_respuesta(sock):
+    codigo = ord(recv_all(sock, 1))
+    largo_msg = struct.unpack('>I', recv_all(sock, 4))[0]
+    return codigo, recv_all(sock, largo_msg).decode()
+
+def descargar_archivo(host, puerto, nombre, destino=None, ruta=(), reintentos=3):
+    """Trae `nombre` del servidor (opcionalmente por una ruta de relays) reanudando desde
+    el último bloque verificado de `destino`.part si existe"""
+    destino = destino or os.path.basename(nombre)
+    parcial = destino + '.part'
+    nombre_bytes = nombre.encode()
+
+    for intento in range(reintentos + 1):
+        if intento:
+            time.sleep(min(2 ** intento, 30))
+        try:
+            with abrir_ruta([f"{host}:{puerto}"] + list(ruta)) as sock:
+                sock.sendall(struct.pack(">BI", OP_MANIFIESTO, len(nombre_bytes)) + nombre_bytes)
+                opcode = ord(recv_all(sock, 1))
+                if opcode == OP_RESPONSE:
+                    codigo, mensaje = leer_cuerpo_respuesta(sock)
+                    raise Exception(mensaje)
+                total = struct.unpack(">Q", recv_all(sock, 8))[0]
+                tam_bloque, hashes = leer_manifiesto(sock)
+
+                offset = min(bloques_verificados(parcial, hashes, tam_bloque, total) * tam_bloque, total)
+                if offset:
+                    print(f"[INFO] Reanudando descarga desde el byte {offset} de {total}")
+                pedir_turno(sock, total - offset)
+                sock.sendall(struct.pack(">BI", OP_REQUEST_RANGO, len(nombre_bytes)) + nombre_bytes +
+                             struct.pack(">QQ", offset, total - offset))
+
+                opcode = ord(recv_all(sock, 1))
+                if opcode != OP_SEND_RANGO:
+                    codigo, mensaje = leer_cuerpo_respuesta(sock)
+                    raise Exception(mensaje)
+                recv_all(sock, struct.unpack(">I", recv_all(sock, 4))[0])
+                recv_all(sock, 24)  # total, offset, largo: ya conocidos
+
+                fd = os.open(parcial, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+                with os.fdopen(fd, 'r+b') as f:
+                    f.truncate(offset)
+                    recibir_verificando(sock, f, offset, total, hashes, tam_bloque)
+            os.replace(parcial, destino)
+            print(f"[OK] Descargado {nombre} ({total} bytes, {total - offset} transferidos)")
+            return True
+        except (OSError, EOFError, BloqueCorrupto) as e:
+            print(f"[ERROR] Descarga interrumpida: {e}")
+    raise Exception(f"No se pudo descargar {nombre} tras {reintentos + 1} intentos")
+
+def enviar_archivo_simple(host, puerto, archivo, progreso=None):
+    """OP_SEND de una sola vez, para servidores que no soportan reanudación"""
+    nombre = os.path.basename(archivo).encode()
+
+    with conectar_ajustado((host, puerto)) as sock, open(archivo, 'rb') as f:
+        print(f"[INFO] Conectado a {host}:{puerto}")
+        tamano = os.fstat(f.fileno()).st_size
+        inicio = time.perf_counter()
+        sock.sendall(struct.pack(">BI", OP_SEND, len(nombre)) + nombre + struct.pack(">Q", tamano))
+        enviar_desde_archivo(sock, f, 0, tamano, contador_progreso(progreso, 0, tamano))
+        ok = leer_confirmacion(sock)
+        if ok:
+            registrar_envio(sock, tamano, time.perf_counter() - inicio)
+        return ok
+
+def enviar_por_relay(host, puerto, archivo, ruta, progreso=None):
+    """OP_RELAY salto a salto, para servidores que no soportan túneles ni reanudación"""
+    nombre_bytes = os.path.basename(archivo).encode()
+
+    with conectar_ajustado((host, puerto)) as sock, open(archivo, 'rb') as f:
         print(f"[INFO] Conectado a {host}:{puerto} para retransmisión")
+        tamano = os.fstat(f.fileno()).st_size
+        sock.sendall(struct.pack(">BI", OP_RELAY, len(nombre_bytes)) + nombre_bytes +
+                     struct.pack("B", len(ruta)) + b''.join(nodo.encode().ljust(22, b' ') for nodo in ruta) +
+                     struct.pack(">Q", tamano))
+        enviar_desde_archivo(sock, f, 0, tamano, contador_progreso(progreso, 0, tamano))
+        return leer_confirmacion(sock)
 
-        sock.sendall(struct.pack("!B", OP_RELAY))
-        sock.sendall(struct.pack(">I", len(nombre_bytes)))
-        sock.sendall(nombre_bytes)
-        sock.sendall(struct.pack("B", num_nodos))
+def enviar_por_relay_cache(host, puerto, archivo, ruta):
+    """OP_RELAY anunciando la clave de contenido del archivo.
 
-        for nodo in ruta:
-            nodo_bytes = nodo.encode().ljust(22, b' ')
-            sock.sendall(nodo_bytes)
+    Si algún relay de la ruta ya lo tiene en su caché, responde que no hace falta
+    mandar los bytes y lo reenvía él desde disco. Con servidores sin este opcode se
+    usa enviar_por_relay.
+    """
+    nombre_bytes = os.path.basename(archivo).encode()
+    tamano = os.path.getsize(archivo)
+    clave = clave_contenido(manifiesto_de(archivo))
 
-        sock.sendall(struct.pack(">Q", tamano))
-        sock.sendall(datos)
+    with conectar_ajustado((host, puerto)) as sock:
+        print(f"[INFO] Conectado a {host}:{puerto} para retransmisión")
+        try:
+            pedir_turno(sock, tamano)
+            sock.sendall(struct.pack(">BI", OP_RELAY_CACHE, len(nombre_bytes)) + nombre_bytes +
+                         struct.pack("B", len(ruta)) + b''.join(nodo.encode().ljust(22, b' ') for nodo in ruta) +
+                         struct.pack(">Q32s", tamano, clave))
+            offset = leer_offset(sock)
+        except OpcodeNoSoportado:
+            return enviar_por_relay(host, puerto, archivo, ruta)
+        if offset >= tamano:
+            print(f"[INFO] {os.path.basename(archivo)} ya está en la caché de la ruta, no se envían datos")
+        else:
+            with open(archivo, 'rb') as f:
+                enviar_desde_archivo(sock, f, offset, tamano - offset)
+        return leer_confirmacion(sock)
+
+def abrir_ruta(ruta):
+    """Conecta con ruta[0] ('ip:puerto') y abre un túnel por el resto de saltos.
+
+    El socket devuelto habla directamente con el último nodo de la ruta.
+    """
+    host, puerto = ruta[0].split(':')
+    sock = conectar_ajustado((host, int(puerto)))
+    if len(ruta) > 1:
+        sock.sendall(struct.pack("BB", OP_TUNEL, len(ruta) - 1))
+        for nodo in ruta[1:]:
+            sock.sendall(nodo.encode().ljust(22, b' '))
+    return sock
+
+def enviar_rango(sock, archivo, offset, largo):
+    """Envía los bytes [offset, offset+largo) de archivo como OP_SEND_RANGO"""
+    nombre_bytes = os.path.basename(archivo).encode()
+    tamano = os.path.getsize(archivo)
 
-        leer_confirmacion(sock)
\ No newline at end of file
+    sock.sendall(struct.pack(">BI", OP_SEND_RANGO, len(nombre_bytes)) + nombre_bytes +
+                 struct.pack(">QQQ", tamano, offset, largo))
+    if largo:
+        with open(archivo, 'rb') as f:
+            enviar_desde_archivo(sock, f, offset, largo)
+    return leer_confirmacion(sock)
@@ -0,0 +1,123 @@
+import bz2
+import lzma
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # opcional: pip install zstandard
+    zstandard = None
+
+# Identificadores de codec en el protocolo (0 = sin comprimir)
+SIN_COMPRESION = 0
+ZLIB = 1
+BZ2 = 2
+LZMA = 3
+ZSTD = 4
+
+NOMBRES = {SIN_COMPRESION: 'ninguno', ZLIB: 'zlib', BZ2: 'bz2', LZMA: 'lzma', ZSTD: 'zstd'}
+
+# (codec, nivel) que se prueban al elegir; de más rápido a más compacto
+CANDIDATOS = [(ZSTD, 3), (ZLIB, 1), (ZLIB, 6), (ZSTD, 12), (BZ2, 9), (LZMA, 1)]
+
+# Bytes de la muestra con la que se mide ratio y velocidad
+TAM_MUESTRA = 1024 * 1024
+# Solo se comprime si el tiempo estimado mejora al menos este factor
+MEJORA_MINIMA = 0.9
+
+
+def disponibles():
+    codecs = [ZLIB, BZ2, LZMA]
+    if zstandard is not None:
+        codecs.append(ZSTD)
+    return codecs
+
+
+def comprimir(codec, datos, nivel=None):
+    if codec == ZLIB:
+        return zlib.compress(datos, 6 if nivel is None else nivel)
+    if codec == BZ2:
+        return bz2.compress(datos, 9 if nivel is None else nivel)
+    if codec == LZMA:
+        return lzma.compress(datos, preset=1 if nivel is None else nivel)
+    if codec == ZSTD and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3 if nivel is None else nivel).compress(datos)
+    raise ValueError(f"Codec no soportado: {codec}")
+
+
+def descomprimir(codec, datos, maximo=None):
+    """Datos descomprimidos; con `maximo` se para al llegar a esos bytes.
+
+    Con datos de otro equipo conviene pasar maximo: unos cientos de bytes de bz2 pueden
+    expandirse a gigas, y así nunca se reserva más de lo que se espera recibir.
+    """
+    if maximo is None:
+        if codec == ZLIB:
+            return zlib.decompress(datos)
+        if codec == BZ2:
+            return bz2.decompress(datos)
+        if codec == LZMA:
+            return lzma.decompress(datos)
+        if codec == ZSTD and zstandard is not None:
+            return zstandard.ZstdDecompressor().decompress(datos)
+    elif codec == ZLIB:
+        return zlib.decompressobj().decompress(datos, maximo)
+    elif codec == BZ2:
+        return bz2.BZ2Decompressor().decompress(datos, max_length=maximo)
+    elif codec == LZMA:
+        return lzma.LZMADecompressor().decompress(datos, max_length=maximo)
+    elif codec == ZSTD and zstandard is not None:
+        salida = b''
+        with zstandard.ZstdDecompressor().stream_reader(datos) as lector:
+            while len(salida) < maximo:
+                trozo = lector.read(maximo - len(salida))
+                if not trozo:
+                    break
+                salida += trozo
+        return salida
+    raise ValueError(f"Codec no soportado: {codec}")
+
+
+def leer_muestra(archivo, tamano=TAM_MUESTRA):
+    """Toma la muestra de tres zonas del archivo (inicio, mitad y final)"""
+    with open(archivo, 'rb') as f:
+        f.seek(0, 2)
+        total = f.tell()
+        if total <= tamano:
+            f.seek(0)
+            return f.read()
+        parte = tamano // 3
+        muestra = b''
+        for pos in (0, total // 2, total - parte):
+            f.seek(pos)
+            muestra += f.read(parte)
+        return muestra
+
+
+def elegir_codec(archivo, mbps, soportados):
+    """Devuelve (codec, nivel) que minimiza el tiempo estimado de envío, o (SIN_COMPRESION, None).
+
+    Tiempo estimado por byte sin comprimir: 1/enlace. Comprimido: 1/velocidad_compresión +
+    ratio/enlace (se comprime y luego se envía cada bloque). Sin dato de ancho de banda
+    en las métricas no se comprime.
+    """
+    if not mbps or not soportados:
+        return SIN_COMPRESION, None
+    muestra = leer_muestra(archivo)
+    if not muestra:
+        return SIN_COMPRESION, None
+
+    enlace = mbps * 1e6 / 8  # bytes/s
+    mejor = (SIN_COMPRESION, None)
+    mejor_tiempo = MEJORA_MINIMA / enlace
+    for codec, nivel in CANDIDATOS:
+        if codec not in soportados or codec not in disponibles():
+            continue
+        inicio = time.perf_counter()
+        comprimido = comprimir(codec, muestra, nivel)
+        velocidad = len(muestra) / max(time.perf_counter() - inicio, 1e-9)
+        ratio = len(comprimido) / len(muestra)
+        tiempo = 1 / velocidad + ratio / enlace
+        if tiempo < mejor_tiempo:
+            mejor, mejor_tiempo = (codec, nivel), tiempo
+    return mejor
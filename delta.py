@@ -0,0 +1,278 @@
+import hashlib
+import math
+import os
+import struct
+import time
+
+import numpy as np
+
+from estadisticas import actual
+from transporte import POOL, enviar_desde_archivo, recv_all, recv_exacto
+
+# Instrucciones del flujo OP_DELTA
+DELTA_FIN = 0x00
+DELTA_LITERAL = 0x01
+DELTA_COPIA = 0x02
+
+LARGO_FUERTE = 16
+# Bytes del archivo nuevo que se analizan de una vez al buscar coincidencias
+TAM_SEGMENTO = 1024 * 1024
+# Literales menores que esto viajan en el mismo sendall que las instrucciones
+TAM_LITERAL_PEQUENO = 64 * 1024
+# Directorio (junto a cada archivo) donde se guardan sus firmas
+DIR_FIRMAS = '.firmas'
+
+
+def tam_bloque_para(tamano):
+    """Bloque ~ raíz cuadrada del tamaño, múltiplo de 1 KiB, entre 2 KiB y 128 KiB"""
+    bloque = math.isqrt(max(tamano, 1))
+    return min(max((bloque + 1023) // 1024 * 1024, 2 * 1024), 128 * 1024)
+
+
+def suma_debil(datos):
+    """Checksum rodante de rsync (a + b·2^16) de un bloque"""
+    d = np.frombuffer(datos, dtype=np.uint8).astype(np.int64)
+    a = int(d.sum())
+    b = int(np.dot(np.arange(len(d), 0, -1, dtype=np.int64), d))
+    return (a & 0xFFFF) | ((b & 0xFFFF) << 16)
+
+
+def sumas_debiles(datos, n):
+    """suma_debil de cada ventana de n bytes de `datos`, calculadas todas a la vez.
+
+    Con sumas prefijas S1 (bytes) y S2 (bytes·posición), la ventana que empieza en i da
+    a = S1[i+n] - S1[i] y b = (i+n)·a - (S2[i+n] - S2[i]), igual que al rodar byte a byte.
+    """
+    d = np.frombuffer(datos, dtype=np.uint8).astype(np.int64)
+    s1 = np.zeros(len(d) + 1, dtype=np.int64)
+    s2 = np.zeros(len(d) + 1, dtype=np.int64)
+    np.cumsum(d, out=s1[1:])
+    np.cumsum(d * np.arange(len(d), dtype=np.int64), out=s2[1:])
+    i = np.arange(len(d) - n + 1, dtype=np.int64)
+    a = s1[i + n] - s1[i]
+    b = (i + n) * a - (s2[i + n] - s2[i])
+    return ((a & 0xFFFF) | ((b & 0xFFFF) << 16)).astype(np.uint32)
+
+
+def suma_fuerte(datos):
+    return hashlib.blake2b(datos, digest_size=LARGO_FUERTE).digest()
+
+
+def calcular_firmas(ruta, tam_bloque=None):
+    """(tamaño, tam_bloque, [(débil, fuerte), ...]) de cada bloque del archivo"""
+    tamano = os.path.getsize(ruta)
+    tam_bloque = tam_bloque or tam_bloque_para(tamano)
+    firmas = []
+    c = actual()
+    with open(ruta, 'rb') as f:
+        while True:
+            inicio = time.perf_counter()
+            bloque = f.read(tam_bloque)
+            c.disco_lectura += time.perf_counter() - inicio
+            if not bloque:
+                break
+            firmas.append((suma_debil(bloque), suma_fuerte(bloque)))
+    return tamano, tam_bloque, firmas
+
+
+def ruta_cache_firmas(ruta):
+    return os.path.join(os.path.dirname(ruta), DIR_FIRMAS, os.path.basename(ruta) + '.firmas')
+
+
+def firmas_de(ruta):
+    """calcular_firmas con caché en disco; se invalida si cambian tamaño o mtime"""
+    st = os.stat(ruta)
+    cache = ruta_cache_firmas(ruta)
+    try:
+        with open(cache, 'rb') as f:
+            tamano, mtime, tam_bloque, cantidad = struct.unpack('>QqII', f.read(24))
+            if (tamano, mtime) == (st.st_size, st.st_mtime_ns):
+                return tamano, tam_bloque, _desempaquetar(f.read(cantidad * (4 + LARGO_FUERTE)))
+    except (OSError, struct.error):
+        pass
+
+    firmas = calcular_firmas(ruta)
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        with open(cache + '.tmp', 'wb') as f:
+            f.write(struct.pack('>Qq', st.st_size, st.st_mtime_ns) + empaquetar_firmas(*firmas)[8:])
+        os.replace(cache + '.tmp', cache)
+    except OSError as e:
+        print(f"[!] No se pudo guardar la caché de firmas de {ruta}: {e}")
+    return firmas
+
+
+def empaquetar_firmas(tamano, tam_bloque, firmas):
+    return (struct.pack('>QII', tamano, tam_bloque, len(firmas)) +
+            b''.join(struct.pack('>I', debil) + fuerte for debil, fuerte in firmas))
+
+
+def _desempaquetar(datos):
+    paso = 4 + LARGO_FUERTE
+    return [(struct.unpack_from('>I', datos, i)[0], bytes(datos[i + 4:i + paso]))
+            for i in range(0, len(datos), paso)]
+
+
+def leer_firmas(sock):
+    tamano, tam_bloque, cantidad = struct.unpack('>QII', recv_all(sock, 16))
+    return tamano, tam_bloque, _desempaquetar(recv_all(sock, cantidad * (4 + LARGO_FUERTE)))
+
+
+def calcular_delta(ruta, firmas):
+    """Compara el archivo local con las firmas de la copia remota.
+
+    Devuelve (instrucciones, sha256 del archivo local). Cada instrucción es
+    (DELTA_LITERAL, offset, largo) con bytes a leer del archivo local o
+    (DELTA_COPIA, indice, cantidad) con bloques consecutivos de la copia remota.
+    Las coincidencias se buscan en todas las posiciones, no solo en las alineadas,
+    así una inserción o un borrado solo cuesta los bloques que toca.
+    """
+    tamano_base, n, lista = firmas
+    # El último bloque remoto puede ser más corto: solo se prueba al final del archivo
+    cola = None
+    if lista and tamano_base % n:
+        cola = (len(lista) - 1, tamano_base % n, lista[-1])
+        lista = lista[:-1]
+    tabla = {}
+    por_fuerte = {}
+    for indice, (debil, fuerte) in enumerate(lista):
+        tabla.setdefault(debil, {}).setdefault(fuerte, indice)
+        por_fuerte.setdefault(fuerte, indice)
+    debiles = np.array(sorted(tabla), dtype=np.uint32)
+
+    instrucciones = []
+    sha = hashlib.sha256()
+    literal = 0  # inicio del literal pendiente
+
+    def copiar(indice, inicio):
+        if inicio > literal:
+            instrucciones.append((DELTA_LITERAL, literal, inicio - literal))
+        ultima = instrucciones[-1] if instrucciones else None
+        if inicio == literal and ultima and ultima[0] == DELTA_COPIA and ultima[1] + ultima[2] == indice:
+            instrucciones[-1] = (DELTA_COPIA, ultima[1], ultima[2] + 1)
+        else:
+            instrucciones.append((DELTA_COPIA, indice, 1))
+
+    with open(ruta, 'rb') as f:
+        pos = 0
+        while lista:
+            f.seek(pos)
+            bloque = f.read(n)
+            if len(bloque) < n:
+                break
+            # Caso habitual: el bloque sigue alineado con uno de la copia remota
+            fuerte = suma_fuerte(bloque)
+            ultima = instrucciones[-1] if instrucciones else None
+            esperado = ultima[1] + ultima[2] if ultima and ultima[0] == DELTA_COPIA else 0
+            if esperado < len(lista) and lista[esperado][1] == fuerte:
+                indice = esperado
+            else:
+                indice = por_fuerte.get(fuerte)
+            if indice is not None:
+                copiar(indice, pos)
+                sha.update(bloque)
+                pos += n
+                literal = pos
+                continue
+
+            # Desalineado: se prueban todas las posiciones del segmento a la vez con la
+            # suma débil y solo las candidatas con la fuerte
+            datos = bloque + f.read(TAM_SEGMENTO - 1)
+            pesos = sumas_debiles(datos, n)
+            posiciones = np.minimum(np.searchsorted(debiles, pesos), len(debiles) - 1)
+            avance = len(pesos)
+            for c in np.flatnonzero(debiles[posiciones] == pesos):
+                c = int(c)
+                indice = tabla[int(pesos[c])].get(suma_fuerte(datos[c:c + n]))
+                if indice is not None:
+                    copiar(indice, pos + c)
+                    avance = c + n
+                    literal = pos + avance
+                    break
+            sha.update(datos[:avance])
+            pos += avance
+        # Resto sin bloques completos (o todo el archivo si la copia remota es más corta que un bloque)
+        f.seek(pos)
+        tamano = pos
+        for parte in iter(lambda: f.read(TAM_SEGMENTO), b''):
+            sha.update(parte)
+            tamano += len(parte)
+
+        if cola and tamano - literal >= cola[1]:
+            indice, largo, (debil, fuerte) = cola
+            f.seek(tamano - largo)
+            bloque = f.read(largo)
+            if suma_debil(bloque) == debil and suma_fuerte(bloque) == fuerte:
+                copiar(indice, tamano - largo)
+                literal = tamano
+    if tamano > literal:
+        instrucciones.append((DELTA_LITERAL, literal, tamano - literal))
+    return instrucciones, sha.digest()
+
+
+def enviar_delta(sock, f, instrucciones, digest):
+    """Escribe el flujo de instrucciones; los literales salen del archivo con sendfile.
+
+    Devuelve los bytes de literales enviados.
+    """
+    pendiente = bytearray()
+    literales = 0
+    for tipo, a, b in instrucciones:
+        if tipo == DELTA_COPIA:
+            pendiente += struct.pack('>BII', DELTA_COPIA, a, b)
+            continue
+        pendiente += struct.pack('>BQ', DELTA_LITERAL, b)
+        if b < TAM_LITERAL_PEQUENO:
+            f.seek(a)
+            pendiente += f.read(b)
+        else:
+            sock.sendall(pendiente)
+            pendiente.clear()
+            enviar_desde_archivo(sock, f, a, b)
+        literales += b
+    sock.sendall(pendiente + struct.pack('B', DELTA_FIN) + digest)
+    return literales
+
+
+def recibir_delta(sock, base, f, tam_bloque):
+    """Reconstruye en f el archivo nuevo a partir de la copia `base` (abierta o None).
+
+    Devuelve (sha256 calculado, sha256 anunciado por el emisor). Lanza ValueError si
+    el flujo referencia bloques que la copia local no tiene.
+    """
+    sha = hashlib.sha256()
+    c = actual()
+    with POOL.prestado() as vista:
+        while True:
+            tipo = ord(recv_all(sock, 1))
+            if tipo == DELTA_FIN:
+                return sha.digest(), bytes(recv_all(sock, 32))
+            if tipo == DELTA_LITERAL:
+                restante = struct.unpack('>Q', recv_all(sock, 8))[0]
+                while restante > 0:
+                    parte = vista[:min(len(vista), restante)]
+                    recv_exacto(sock, parte)
+                    sha.update(parte)
+                    inicio = time.perf_counter()
+                    f.write(parte)
+                    c.disco_escritura += time.perf_counter() - inicio
+                    restante -= len(parte)
+            elif tipo == DELTA_COPIA:
+                indice, cantidad = struct.unpack('>II', recv_all(sock, 8))
+                if base is None:
+                    raise ValueError("Copia de bloques sin archivo base")
+                base.seek(indice * tam_bloque)
+                restante = cantidad * tam_bloque
+                while restante > 0:
+                    inicio = time.perf_counter()
+                    n = base.readinto(vista[:min(len(vista), restante)])
+                    c.disco_lectura += time.perf_counter() - inicio
+                    if not n:
+                        break
+                    sha.update(vista[:n])
+                    inicio = time.perf_counter()
+                    f.write(vista[:n])
+                    c.disco_escritura += time.perf_counter() - inicio
+                    restante -= n
+            else:
+                raise ValueError(f"Instrucción de delta desconocida: {tipo}")
@@ -1,14 +1,31 @@
-import networkx as nx
 import heapq
 
+from busqueda import alt_csr, como_csr, dijkstra_bidireccional_csr, referencias_de, yen_csr
+from grafo_csr import GrafoCSR, dijkstra_csr
+from tabla_rutas import MAX_NODOS, tabla_de
+
+
 def dijkstra(grafo, origen, destino):
-    distancias = {nodo: float('inf') for nodo in grafo.nodes}
-    previos = {nodo: None for nodo in grafo.nodes}
-    distancias[origen] = 0
+    """Camino de menor peso ('weight', 1 si falta) de origen a destino: (camino, costo).
+
+    Acepta un grafo de networkx o un GrafoCSR; con topologías grandes conviene convertir
+    una vez con GrafoCSR.desde_networkx y consultar sobre los arrays.
+    """
+    if isinstance(grafo, GrafoCSR):
+        par = _indices(grafo, origen, destino)
+        if par is None:
+            return None, float('inf')
+        camino, costo = dijkstra_csr(grafo, *par)
+        return ([grafo.nodos[i] for i in camino] if camino else None), costo
+
+    # Solo se guardan los nodos alcanzados, no un dict con todo el grafo por llamada
+    distancias = {origen: 0}
+    previos = {origen: None}
 
     # Cola de prioridad con heapq
     heap = [(0, origen)]
     visitados = set()
+    adyacencia = grafo.adj
 
     while heap:
         distancia_actual, nodo_actual = heapq.heappop(heap)
@@ -20,22 +37,73 @@ def dijkstra(grafo, origen, destino):
         if nodo_actual == destino:
             break
 
-        for vecino in grafo[nodo_actual]:
-            peso = grafo[nodo_actual][vecino].get('weight', 1)
-            nueva_dist = distancia_actual + peso
-            if nueva_dist < distancias[vecino]:
+        for vecino, datos in adyacencia[nodo_actual].items():
+            nueva_dist = distancia_actual + datos.get('weight', 1)
+            if nueva_dist < distancias.get(vecino, float('inf')):
                 distancias[vecino] = nueva_dist
                 previos[vecino] = nodo_actual
                 heapq.heappush(heap, (nueva_dist, vecino))
 
     # Reconstrucción del camino
-    if distancias[destino] == float('inf'):
+    if destino not in distancias:
         return None, float('inf')
 
-    camino = []
-    nodo = destino
-    while nodo:
-        camino.insert(0, nodo)
-        nodo = previos[nodo]
+    camino = [destino]
+    while previos[camino[-1]] is not None:
+        camino.append(previos[camino[-1]])
+    camino.reverse()
 
     return camino, distancias[destino]
+
+
+def _indices(g, origen, destino):
+    if origen not in g.indice or destino not in g.indice:
+        return None
+    return g.indice[origen], g.indice[destino]
+
+
+def dijkstra_bidireccional(grafo, origen, destino):
+    """Como dijkstra pero buscando a la vez desde el origen y desde el destino"""
+    g = como_csr(grafo)
+    par = _indices(g, origen, destino)
+    if par is None:
+        return None, float('inf')
+    camino, costo = dijkstra_bidireccional_csr(g, *par)
+    return ([g.nodos[i] for i in camino] if camino else None), costo
+
+
+def dijkstra_alt(grafo, origen, destino):
+    """Como dijkstra pero con A* y cotas de puntos de referencia (ALT).
+
+    Las distancias a las referencias se calculan la primera vez para cada instantánea
+    de métricas (mismo grafo, mismos pesos) y se reutilizan en las consultas siguientes.
+    """
+    g = como_csr(grafo)
+    par = _indices(g, origen, destino)
+    if par is None:
+        return None, float('inf')
+    camino, costo = alt_csr(g, referencias_de(g), *par)
+    return ([g.nodos[i] for i in camino] if camino else None), costo
+
+
+def k_caminos(grafo, origen, destino, k=3):
+    """Hasta k caminos sin ciclos de menor a mayor costo: [(camino, costo), ...] (Yen).
+
+    El primero es el de dijkstra. El costo es el 'weight' del grafo que se pase, así que
+    con el grafo de latencia se ordenan por latencia y con el de ancho de banda por
+    1/Mbps. En grafos pequeños de networkx el camino mínimo y las distancias al destino
+    salen de la tabla de rutas (ya calculada para la instantánea de métricas).
+    """
+    g = como_csr(grafo)
+    par = _indices(g, origen, destino)
+    if par is None:
+        return []
+    hacia = primero = None
+    if not isinstance(grafo, GrafoCSR) and g.n <= MAX_NODOS:
+        tabla = tabla_de(grafo)
+        hacia = tabla.distancias[:, par[1]].tolist()
+        camino, _ = tabla.camino(origen, destino)
+        if camino is None:
+            return []
+        primero = [g.indice[nodo] for nodo in camino]
+    return [([g.nodos[i] for i in camino], costo) for camino, costo in yen_csr(g, *par, k, hacia, primero)]
@@ -0,0 +1,194 @@
+"""Contadores del servidor que devuelve OP_STATS, y una CLI para consultarlos.
+
+Cada conexión tiene su objeto Conexion, que solo escribe el hilo que la atiende (no hay
+locks en el camino de los datos). El lock global solo se toma al abrir o cerrar una
+conexión y al pedir una instantánea.
+"""
+import argparse
+import json
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+OP_STATS = 0x11
+# Transferencias terminadas que se conservan para el informe
+MAX_RECIENTES = 50
+
+_lock = threading.Lock()
+_local = threading.local()
+_activas = {}
+_recientes = deque(maxlen=MAX_RECIENTES)
+_inicio = time.time()
+
+CAMPOS = ('bytes_entrada', 'bytes_salida', 'espera_ack', 'disco_lectura', 'disco_escritura', 'errores')
+_totales = dict.fromkeys(CAMPOS, 0)
+_totales['conexiones'] = 0
+
+
+class Conexion:
+    """Contadores de una conexión (bytes de datos, segundos de espera y de disco, errores)"""
+
+    __slots__ = ('direccion', 'inicio', 'operacion', 'inicio_operacion', 'bytes_operacion') + CAMPOS
+
+    def __init__(self, direccion=None):
+        self.direccion = direccion
+        self.inicio = time.time()
+        self.operacion = None
+        self.inicio_operacion = 0.0
+        self.bytes_operacion = 0
+        for campo in CAMPOS:
+            setattr(self, campo, 0)
+
+    def movidos(self):
+        return self.bytes_entrada + self.bytes_salida
+
+
+# Destino de los contadores fuera de una conexión del servidor (p. ej. en el cliente)
+_SIN_CONEXION = Conexion()
+
+
+def actual():
+    """Conexion del hilo actual; los hilos sin conexión escriben en un objeto que no se informa"""
+    return getattr(_local, 'conexion', _SIN_CONEXION)
+
+
+def registrar_conexion(direccion):
+    c = Conexion(direccion)
+    _local.conexion = c
+    with _lock:
+        _activas[id(c)] = c
+        _totales['conexiones'] += 1
+    return c
+
+
+def cerrar_conexion(c):
+    _local.conexion = _SIN_CONEXION
+    with _lock:
+        _activas.pop(id(c), None)
+        for campo in CAMPOS:
+            _totales[campo] += getattr(c, campo)
+
+
+def iniciar_operacion(c, nombre):
+    c.operacion = nombre
+    c.inicio_operacion = time.perf_counter()
+    c.bytes_operacion = c.movidos()
+
+
+def terminar_operacion(c, registrar=True):
+    if registrar and c.operacion:
+        segundos = time.perf_counter() - c.inicio_operacion
+        nbytes = c.movidos() - c.bytes_operacion
+        _recientes.append({'direccion': c.direccion, 'operacion': c.operacion, 'bytes': nbytes,
+                           'segundos': round(segundos, 4), 'mbps': _mbps(nbytes, segundos),
+                           'fin': time.time()})
+    c.operacion = None
+
+
+@contextmanager
+def esperando_ack():
+    """Suma a la conexión actual el tiempo esperando la confirmación del siguiente salto"""
+    c = actual()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        c.espera_ack += time.perf_counter() - inicio
+
+
+def contar_error():
+    actual().errores += 1
+
+
+def _mbps(nbytes, segundos):
+    return round(nbytes * 8 / segundos / 1e6, 2) if segundos > 0 else 0.0
+
+
+def instantanea():
+    """Estado actual como dict serializable a JSON"""
+    ahora = time.perf_counter()
+    with _lock:
+        activas = list(_activas.values())
+        totales = dict(_totales)
+    conexiones = []
+    for c in activas:
+        for campo in CAMPOS:
+            totales[campo] += getattr(c, campo)
+        fila = {'direccion': c.direccion, 'segundos': round(time.time() - c.inicio, 1),
+                'operacion': c.operacion}
+        fila.update((campo, getattr(c, campo)) for campo in CAMPOS)
+        if c.operacion:
+            segundos = ahora - c.inicio_operacion
+            nbytes = c.movidos() - c.bytes_operacion
+            fila.update(bytes_operacion=nbytes, mbps=_mbps(nbytes, segundos))
+        conexiones.append(fila)
+    return {'activo_desde': _inicio, 'conexiones_activas': len(conexiones), 'totales': totales,
+            'conexiones': conexiones, 'recientes': list(_recientes)}
+
+
+def consultar(direccion, timeout=5):
+    """Pide OP_STATS a 'ip:puerto' y devuelve el dict, o lanza una excepción"""
+    from transporte import recv_all
+
+    host, puerto = direccion.split(':')
+    with socket.create_connection((host, int(puerto)), timeout=timeout) as sock:
+        sock.sendall(struct.pack('B', OP_STATS))
+        opcode = ord(recv_all(sock, 1))
+        if opcode != OP_STATS:
+            codigo = ord(recv_all(sock, 1))
+            mensaje = recv_all(sock, struct.unpack('>I', recv_all(sock, 4))[0]).decode()
+            raise Exception(f"código {codigo}: {mensaje}")
+        return json.loads(recv_all(sock, struct.unpack('>I', recv_all(sock, 4))[0]))
+
+
+def _mostrar(direccion, datos):
+    t = datos['totales']
+    print(f"== {direccion} (activo {time.time() - datos['activo_desde']:.0f} s, "
+          f"{t['conexiones']} conexiones atendidas) ==")
+    print(f"conexiones activas: {datos['conexiones_activas']}   entrada: {t['bytes_entrada'] / 1e6:.1f} MB"
+          f"   salida: {t['bytes_salida'] / 1e6:.1f} MB   errores: {t['errores']}")
+    print(f"espera de acks: {t['espera_ack']:.2f} s   disco lectura: {t['disco_lectura']:.2f} s"
+          f"   disco escritura: {t['disco_escritura']:.2f} s")
+    for c in datos['conexiones']:
+        if c['operacion']:
+            print(f"  {c['direccion']:<22}{c['operacion']:<20}{c['bytes_operacion'] / 1e6:>10.1f} MB"
+                  f"{c['mbps']:>10.1f} Mbps   ack {c['espera_ack']:.2f} s")
+        else:
+            print(f"  {c['direccion']:<22}{'(inactiva)':<20}")
+    if datos.get('cache'):
+        cache = datos['cache']
+        print(f"caché: {cache['aciertos']} aciertos, {cache['fallos']} fallos, {cache['desalojos']} desalojos"
+              f" ({cache['ocupado'] / 1e6:.1f} de {cache['capacidad'] / 1e6:.0f} MB)")
+    if datos.get('admision'):
+        a = datos['admision']
+        print(f"admisión: {a['activas']}/{a['maximo']} en curso, {a['en_cola']}/{a['cola']} en cola, "
+              f"{a['admitidas']} admitidas, {a['rechazadas']} rechazadas, {a['abandonadas']} abandonadas")
+    for r in datos['recientes'][-5:]:
+        print(f"  reciente {r['operacion']:<20}{r['bytes'] / 1e6:>10.1f} MB en {r['segundos']:.2f} s"
+              f" ({r['mbps']:.1f} Mbps)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Consulta OP_STATS de uno o varios servidores")
+    parser.add_argument("servidores", nargs='+', help="Servidores como ip:puerto (p. ej. 10.0.0.2:3843)")
+    parser.add_argument("--cada", type=float, default=None, help="Repetir cada N segundos")
+    parser.add_argument("--json", action="store_true", help="Imprimir la respuesta JSON sin formato")
+    args = parser.parse_args()
+    while True:
+        for servidor in args.servidores:
+            try:
+                datos = consultar(servidor)
+            except Exception as e:
+                print(f"== {servidor}: sin respuesta ({e}) ==")
+                continue
+            if args.json:
+                print(json.dumps({servidor: datos}))
+            else:
+                _mostrar(servidor, datos)
+        if not args.cada:
+            break
+        time.sleep(args.cada)
+        print()
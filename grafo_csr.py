@@ -0,0 +1,157 @@
+"""Grafo compacto en arrays (CSR) para correr Dijkstra y Kruskal sobre topologías grandes."""
+import heapq
+
+import numpy as np
+
+
+class GrafoCSR:
+    """Grafo dirigido con nodos numerados 0..n-1 y aristas en formato CSR.
+
+    Las aristas que salen del nodo i son destinos[desplazamientos[i]:desplazamientos[i+1]]
+    con sus pesos en la misma posición. `nodos` guarda el nombre original de cada índice.
+    """
+
+    def __init__(self, nodos, desplazamientos, destinos, pesos):
+        self.nodos = list(nodos)
+        self.indice = {nodo: i for i, nodo in enumerate(self.nodos)}
+        self.desplazamientos = desplazamientos
+        self.destinos = destinos
+        self.pesos = pesos
+        self._listas = None
+        self._invertido = None
+
+    @classmethod
+    def desde_aristas(cls, nodos, origenes, destinos, pesos):
+        """Construye el CSR a partir de arrays paralelos de aristas (índices de nodo)"""
+        n = len(nodos)
+        origenes = np.asarray(origenes, dtype=np.int64)
+        orden = np.argsort(origenes, kind='stable')
+        desplazamientos = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origenes, minlength=n), out=desplazamientos[1:])
+        return cls(nodos, desplazamientos, np.asarray(destinos, dtype=np.int64)[orden],
+                   np.asarray(pesos, dtype=np.float64)[orden])
+
+    @classmethod
+    def desde_networkx(cls, grafo, peso='weight'):
+        """Convierte un Graph/DiGraph de networkx (las aristas sin `peso` valen 1)"""
+        nodos = list(grafo.nodes)
+        indice = {nodo: i for i, nodo in enumerate(nodos)}
+        origenes, destinos, pesos = [], [], []
+        for u, v, d in grafo.edges(data=True):
+            w = d.get(peso, 1)
+            origenes.append(indice[u])
+            destinos.append(indice[v])
+            pesos.append(w)
+            if not grafo.is_directed():
+                origenes.append(indice[v])
+                destinos.append(indice[u])
+                pesos.append(w)
+        return cls.desde_aristas(nodos, origenes, destinos, pesos)
+
+    @property
+    def n(self):
+        return len(self.nodos)
+
+    def invertido(self):
+        """El mismo grafo con las aristas al revés (para buscar hacia atrás desde un destino)"""
+        if self._invertido is None:
+            origenes = np.repeat(np.arange(self.n), np.diff(self.desplazamientos))
+            self._invertido = GrafoCSR.desde_aristas(self.nodos, self.destinos, origenes, self.pesos)
+            self._invertido._invertido = self
+        return self._invertido
+
+    def listas(self):
+        """Los arrays como listas de Python: en bucles escalares indexarlas es mucho más rápido"""
+        if self._listas is None:
+            self._listas = (self.desplazamientos.tolist(), self.destinos.tolist(), self.pesos.tolist())
+        return self._listas
+
+
+def dijkstra_csr(g, origen, destino, estadisticas=None):
+    """Dijkstra entre índices de nodo. Devuelve (lista de índices, distancia) o (None, inf).
+
+    Si se pasa `estadisticas` (dict), se deja en 'asentados' cuántos nodos se cerraron.
+    """
+    desplazamientos, destinos, pesos = g.listas()
+    infinito = float('inf')
+    distancias = [infinito] * g.n
+    previos = [-1] * g.n
+    distancias[origen] = 0.0
+    heap = [(0.0, origen)]
+    asentados = 0
+    while heap:
+        distancia, u = heapq.heappop(heap)
+        if distancia > distancias[u]:
+            continue  # Entrada vieja: el nodo ya salió con una distancia menor
+        asentados += 1
+        if u == destino:
+            break
+        for i in range(desplazamientos[u], desplazamientos[u + 1]):
+            v = destinos[i]
+            nueva = distancia + pesos[i]
+            if nueva < distancias[v]:
+                distancias[v] = nueva
+                previos[v] = u
+                heapq.heappush(heap, (nueva, v))
+
+    if estadisticas is not None:
+        estadisticas['asentados'] = asentados
+    if distancias[destino] == infinito:
+        return None, infinito
+    return reconstruir(previos, origen, destino), distancias[destino]
+
+
+def reconstruir(previos, origen, destino):
+    """Camino origen -> destino siguiendo `previos` hacia atrás"""
+    camino = [destino]
+    while camino[-1] != origen:
+        camino.append(previos[camino[-1]])
+    camino.reverse()
+    return camino
+
+
+def distancias_desde(g, origen):
+    """Distancia de origen a todos los nodos (inf si no se alcanza), como lista"""
+    desplazamientos, destinos, pesos = g.listas()
+    distancias = [float('inf')] * g.n
+    distancias[origen] = 0.0
+    heap = [(0.0, origen)]
+    while heap:
+        distancia, u = heapq.heappop(heap)
+        if distancia > distancias[u]:
+            continue
+        for i in range(desplazamientos[u], desplazamientos[u + 1]):
+            v = destinos[i]
+            nueva = distancia + pesos[i]
+            if nueva < distancias[v]:
+                distancias[v] = nueva
+                heapq.heappush(heap, (nueva, v))
+    return distancias
+
+
+def kruskal_csr(g):
+    """Bosque de expansión mínima del grafo tomado como no dirigido.
+
+    Devuelve una lista de (u, v, peso) con índices de nodo. Las aristas se ordenan por
+    peso con NumPy y cada par se une con union-find sobre una lista de enteros; de un
+    par con aristas en los dos sentidos queda la más ligera.
+    """
+    origenes = np.repeat(np.arange(g.n), np.diff(g.desplazamientos))
+    orden = np.argsort(g.pesos, kind='stable')
+    padre = list(range(g.n))
+
+    def raiz(x):
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    arbol = []
+    for u, v, w in zip(origenes[orden].tolist(), g.destinos[orden].tolist(), g.pesos[orden].tolist()):
+        ru, rv = raiz(u), raiz(v)
+        if ru != rv:
+            padre[rv] = ru
+            arbol.append((u, v, w))
+            if len(arbol) == g.n - 1:
+                break
+    return arbol
@@ -1,7 +1,6 @@
 import subprocess
 import sys
 import argparse
-import csv
 import networkx as nx
 import matplotlib.pyplot as plt
 import tkinter as tk
@@ -12,12 +11,18 @@ import time
 import socket
 import threading
 from datetime import datetime
-import glob
 
-from cliente import enviar_archivo, enviar_por_ruta
+from cliente import (RUTAS_RESPALDO, enviar_archivo, enviar_con_respaldo, enviar_directorio, enviar_multicast,
+                     enviar_por_relay_cache, enviar_por_ruta, sincronizar_archivo)
+from dijkstra import k_caminos
 from server import start_server
-from dijkstra import dijkstra
-from kruskal import kruskal
+from kruskal import arbol_enraizado, kruskal
+from metricas import leer_metricas
+from multiruta import ancho_cuello, enviar_multiruta, rutas_disjuntas
+from paralelo import enviar_paralelo
+from planificador import planificar, tiempo_estimado
+from rutas_dinamicas import RutasDinamicas
+from tabla_rutas import invalidar
 ## --- Configuración de Red --- ##
 
 def iniciar_servidor_iperf(puerto=5201):
@@ -28,6 +33,12 @@ def iniciar_servidor_iperf(puerto=5201):
         return True
     except:
         return False
+def tamano_en_disco(ruta):
+    """Tamaño de un archivo o suma de los archivos de una carpeta (bytes)"""
+    if not os.path.isdir(ruta):
+        return os.path.getsize(ruta)
+    return sum(os.path.getsize(os.path.join(raiz, nombre))
+               for raiz, _, nombres in os.walk(ruta) for nombre in nombres)
 ## --- Interfaz Gráfica --- ##
 
 class VPNTransferGUI:
@@ -42,6 +53,9 @@ class VPNTransferGUI:
         self.anchos_banda = anchos_banda
         self.grafo_latencia = nx.DiGraph()
         self.grafo_ancho_banda = nx.DiGraph()
+        # Caminos mínimos desde este nodo, reparados enlace a enlace al releer métricas
+        self.rutas_latencia = RutasDinamicas(self.grafo_latencia, ip_local)
+        self.rutas_ancho_banda = RutasDinamicas(self.grafo_ancho_banda, ip_local)
         self.archivo_seleccionado = None
         
         self.construir_interfaz()
@@ -70,17 +84,39 @@ class VPNTransferGUI:
         self.entry_archivo.pack(fill=tk.X, padx=5)
         ttk.Button(self.control_frame, text="Seleccionar", 
                   command=self.seleccionar_archivo).pack(pady=5)
+        ttk.Button(self.control_frame, text="Seleccionar carpeta",
+                  command=self.seleccionar_carpeta).pack(pady=5)
         
         ttk.Label(self.control_frame, text="Nodo destino:").pack()
         self.combo_destino = ttk.Combobox(self.control_frame, values=self.nodos)
         self.combo_destino.pack(fill=tk.X, padx=5)
         
-        self.var_optimizar = tk.IntVar(value=1)
-        ttk.Checkbutton(self.control_frame, text="Optimizar por latencia",
-                       variable=self.var_optimizar).pack(anchor=tk.W)
+        self.var_multiruta = tk.IntVar(value=0)
+        ttk.Checkbutton(self.control_frame, text="Multiruta (rutas disjuntas)",
+                       variable=self.var_multiruta).pack(anchor=tk.W)
+
+        self.var_paralelo = tk.IntVar(value=0)
+        ttk.Checkbutton(self.control_frame, text="Flujos paralelos por salto",
+                       variable=self.var_paralelo).pack(anchor=tk.W)
+
+        self.var_delta = tk.IntVar(value=0)
+        ttk.Checkbutton(self.control_frame, text="Enviar solo cambios (delta)",
+                       variable=self.var_delta).pack(anchor=tk.W)
+
+        self.var_cache = tk.IntVar(value=0)
+        ttk.Checkbutton(self.control_frame, text="Usar caché de los relays",
+                       variable=self.var_cache).pack(anchor=tk.W)
         
         ttk.Button(self.control_frame, text="Iniciar Transferencia", 
                   command=self.iniciar_transferencia).pack(pady=20)
+        ttk.Button(self.control_frame, text="Enviar a todos (MST)",
+                  command=self.iniciar_multicast).pack(pady=5)
+
+        self.barra_envio = ttk.Progressbar(self.control_frame, orient=tk.HORIZONTAL, length=200,
+                                           mode='determinate', maximum=100)
+        self.barra_envio.pack(pady=5)
+        self.etiqueta_progreso = ttk.Label(self.control_frame, text="")
+        self.etiqueta_progreso.pack()
         
         self.texto_resultados = tk.Text(self.control_frame, height=10, wrap=tk.WORD)
         self.texto_resultados.pack(fill=tk.BOTH, expand=True)
@@ -102,19 +138,49 @@ class VPNTransferGUI:
             getattr(self, f"canvas_{nombre}").pack(fill=tk.BOTH, expand=True)
     
     def procesar_metricas(self):
-        self.grafo_latencia.add_nodes_from(self.nodos)
-        self.grafo_ancho_banda.add_nodes_from(self.nodos)
-
+        for grafo in (self.grafo_latencia, self.grafo_ancho_banda):
+            antes = len(grafo)
+            grafo.add_nodes_from(self.nodos)
+            if len(grafo) != antes:
+                invalidar(grafo)
+
+        # Cada enlace pasa por los árboles dinámicos, que solo reparan lo que cambió
+        cambios = reparados = 0
         for (origen, destino), latencia in self.latencias.items():
             if not (latencia != latencia):  # Verifica que no sea NaN
-                self.grafo_latencia.add_edge(origen, destino, weight=latencia)
+                previo = self.grafo_latencia.get_edge_data(origen, destino)
+                if previo is None or previo['weight'] != latencia:
+                    self.rutas_latencia.actualizar(origen, destino, latencia)
+                    cambios += 1
+                    reparados += self.rutas_latencia.reparados
 
         for (origen, destino), ancho_banda in self.anchos_banda.items():
             if not (ancho_banda != ancho_banda) and ancho_banda > 0:  # No NaN y positivo
-                self.grafo_ancho_banda.add_edge(origen, destino,
-                                                weight=1/ancho_banda,
-                                                ancho_banda_real=ancho_banda)
-    
+                previo = self.grafo_ancho_banda.get_edge_data(origen, destino)
+                if previo is None or previo['ancho_banda_real'] != ancho_banda:
+                    self.rutas_ancho_banda.actualizar(origen, destino, 1/ancho_banda,
+                                                      ancho_banda_real=ancho_banda)
+                    cambios += 1
+                    reparados += self.rutas_ancho_banda.reparados
+
+        # Enlaces que ya no tienen una medición válida (NaN, sin ancho de banda o fuera de
+        # los CSV) se quitan: si no, las rutas seguirían pasando por un enlace caído
+        validos_latencia = {e for e, latencia in self.latencias.items() if not (latencia != latencia)}
+        validos_ancho_banda = {e for e, ancho_banda in self.anchos_banda.items()
+                               if not (ancho_banda != ancho_banda) and ancho_banda > 0}
+        for grafo, rutas, validos in ((self.grafo_latencia, self.rutas_latencia, validos_latencia),
+                                      (self.grafo_ancho_banda, self.rutas_ancho_banda, validos_ancho_banda)):
+            for origen, destino in [e for e in grafo.edges if e not in validos]:
+                rutas.actualizar(origen, destino, None)
+                cambios += 1
+                reparados += rutas.reparados
+        if cambios:
+            print(f"[INFO] Métricas: {cambios} enlaces cambiaron, {reparados} nodos de ruta reparados")
+
+    def recargar_metricas(self):
+        self.latencias, self.anchos_banda, _ = leer_metricas()
+        self.procesar_metricas()
+
     def actualizar_visualizacion(self):
         self.dibujar_grafo(self.grafo_latencia, "latencia", "Latencia (ms)")
         self.dibujar_grafo(self.grafo_ancho_banda, "ancho_banda", "Ancho de Banda (Mbps)", True)
@@ -187,6 +253,15 @@ class VPNTransferGUI:
             tamano = os.path.getsize(archivo) / (1024 * 1024)  # MB
             self.texto_resultados.insert(tk.END, f"Archivo: {archivo}\nTamaño: {tamano:.2f} MB\n")
     
+    def seleccionar_carpeta(self):
+        carpeta = filedialog.askdirectory()
+        if carpeta:
+            self.archivo_seleccionado = carpeta
+            self.entry_archivo.delete(0, tk.END)
+            self.entry_archivo.insert(0, carpeta)
+            tamano = tamano_en_disco(carpeta) / (1024 * 1024)  # MB
+            self.texto_resultados.insert(tk.END, f"Carpeta: {carpeta}\nTamaño: {tamano:.2f} MB\n")
+
     def iniciar_transferencia(self):
         if not self.archivo_seleccionado:
             messagebox.showerror("Error", "Seleccione un archivo")
@@ -197,57 +272,106 @@ class VPNTransferGUI:
             messagebox.showerror("Error", "Seleccione un destino válido")
             return
 
-        optimizar_por_latencia = self.var_optimizar.get()
-        grafo = self.grafo_latencia if optimizar_por_latencia else self.grafo_ancho_banda
+        # Las transferencias anteriores pudieron actualizar los CSV con mediciones pasivas
+        self.recargar_metricas()
 
-        camino, costo = dijkstra(grafo, self.ip_local, destino)
-        if not camino:
+        # Los árboles desde este nodo ya están al día: sin camino en ninguno no hay ruta
+        infinito = float('inf')
+        if self.rutas_latencia.distancia(destino) == infinito and self.rutas_ancho_banda.distancia(destino) == infinito:
             self.texto_resultados.insert(tk.END, f"No se pudo encontrar ruta hacia {destino}\n")
             return
 
-        self.texto_resultados.insert(tk.END, f"\nIniciando transferencia a {destino}...\n")
-        self.texto_resultados.insert(tk.END, f"Ruta calculada: {' → '.join(camino)}\n")
-        
-        ruta_ip = [f"{nodo}:3843" for nodo in camino[1:]]  # Asume puerto TCP 3843
+        # Rutas por tiempo estimado para este tamaño (latencia sumada + enlace más lento),
+        # calculadas una vez: si una falla se pasa a la siguiente
+        tamano = tamano_en_disco(self.archivo_seleccionado)
+        planes = planificar(self.grafo_latencia, self.grafo_ancho_banda, self.ip_local, destino, tamano,
+                            RUTAS_RESPALDO)
+        if planes:
+            alternativas = [plan.camino for plan in planes]
+        else:
+            # Sin ancho de banda medido en ninguna ruta: solo se puede ordenar por latencia
+            alternativas = [c for c, _ in k_caminos(self.grafo_latencia, self.ip_local, destino, RUTAS_RESPALDO)]
+        if not alternativas:
+            self.texto_resultados.insert(tk.END, f"No se pudo encontrar ruta hacia {destino}\n")
+            return
+        camino = alternativas[0]
 
-        # Elegir modo directo o relay
-        try:
+        self.texto_resultados.insert(tk.END, f"\nIniciando transferencia a {destino}...\n")
+        for i, alternativa in enumerate(alternativas):
+            texto = "Ruta calculada" if i == 0 else "Ruta de respaldo"
+            if planes:
+                texto += (f" (estimado {planes[i].segundos:.2f} s: {planes[i].latencia_ms:.1f} ms, "
+                          f"cuello {planes[i].cuello_mbps:.1f} Mbps)")
+            self.texto_resultados.insert(tk.END, f"{texto}: {' → '.join(alternativa)}\n")
+
+        rutas_ip = [[f"{nodo}:3843" for nodo in c[1:]] for c in alternativas]  # Asume puerto TCP 3843
+
+        def enviar(ruta_ip, reintentos):
+            host = ruta_ip[0].split(':')[0]
+            if es_carpeta:
+                # Carpeta completa en un solo flujo OP_LOTE (directo o por túnel)
+                return enviar_directorio(host, 3843, self.archivo_seleccionado, ruta_ip[1:])
+            if self.var_paralelo.get():
+                # Número de flujos según latencia y ancho de banda medidos de cada salto
+                return enviar_paralelo(host, 3843, self.archivo_seleccionado, ruta_ip[1:],
+                                       progreso=self.mostrar_progreso)
+            if self.var_delta.get():
+                return sincronizar_archivo(host, 3843, self.archivo_seleccionado, ruta_ip[1:])
+            if self.var_cache.get() and len(ruta_ip) > 1:
+                return enviar_por_relay_cache(host, 3843, self.archivo_seleccionado, ruta_ip[1:])
             if len(ruta_ip) == 1:
-                enviar_archivo(ruta_ip[0].split(':')[0], 3843, self.archivo_seleccionado)
+                return enviar_archivo(host, 3843, self.archivo_seleccionado, reintentos,
+                                      progreso=self.mostrar_progreso)
+            return enviar_por_ruta(host, 3843, self.archivo_seleccionado, ruta_ip[1:], reintentos,
+                                   progreso=self.mostrar_progreso)
+
+        # Elegir modo multiruta o una ruta (con las de respaldo)
+        clave_directa = (self.ip_local, destino)
+        inicio = time.time()
+        try:
+            rutas = []
+            es_carpeta = os.path.isdir(self.archivo_seleccionado)
+            if self.var_multiruta.get() and not es_carpeta:
+                rutas = rutas_disjuntas(self.grafo_ancho_banda, self.ip_local, destino)
+            if len(rutas) > 1:
+                pesos = [ancho_cuello(self.grafo_ancho_banda, r) for r in rutas]
+                for r, peso in zip(rutas, pesos):
+                    self.texto_resultados.insert(tk.END, f"Ruta paralela: {' → '.join(r)} ({peso:.1f} Mbps)\n")
+                enviar_multiruta(self.archivo_seleccionado,
+                                 [[f"{nodo}:3843" for nodo in r[1:]] for r in rutas], pesos)
             else:
-                enviar_por_ruta(ruta_ip[0].split(':')[0], 3843, self.archivo_seleccionado, ruta_ip[1:])
+                usada = enviar_con_respaldo(rutas_ip, enviar)
+                if usada is not rutas_ip[0]:
+                    camino = [self.ip_local] + [nodo.split(':')[0] for nodo in usada]
+                    self.texto_resultados.insert(tk.END, f"[!] Enviado por la ruta de respaldo: {' → '.join(camino)}\n")
         except Exception as e:
             self.texto_resultados.insert(tk.END, f"[ERROR] Transferencia falló: {e}\n")
         else:
+            real = time.time() - inicio
             self.texto_resultados.insert(tk.END, "[OK] Transferencia finalizada.\n")
 
-            # Simulación ruta óptima
-            tamano = os.path.getsize(self.archivo_seleccionado) / (1024 * 1024)  # MB
-            latencia_total = sum(self.latencias.get((camino[i], camino[i+1]), 0)
-                                 for i in range(len(camino)-1))
-            ancho_prom = sum(self.anchos_banda.get((camino[i], camino[i+1]), 0)
-                             for i in range(len(camino)-1)) / (len(camino)-1)
-
-            tiempo_optimo = (tamano * 8) / ancho_prom + (latencia_total / 1000)
-
-            self.texto_resultados.insert(tk.END, f"\n[Simulación ruta óptima]\n")
-            self.texto_resultados.insert(tk.END, f"- Latencia total: {latencia_total:.2f} ms\n")
-            self.texto_resultados.insert(tk.END, f"- Ancho de banda promedio: {ancho_prom:.2f} Mbps\n")
-            self.texto_resultados.insert(tk.END, f"- Tiempo estimado: {tiempo_optimo:.2f} segundos\n")
+            # Estimación del planificador frente a lo medido
+            plan = next((p for p in planes if p.camino == camino), None) if len(rutas) <= 1 else None
+            self.texto_resultados.insert(tk.END, f"\n[Estimado vs. real]\n")
+            if plan:
+                self.texto_resultados.insert(tk.END, f"- Latencia total: {plan.latencia_ms:.2f} ms\n")
+                self.texto_resultados.insert(tk.END, f"- Cuello de botella: {plan.cuello_mbps:.2f} Mbps\n")
+                self.texto_resultados.insert(tk.END, f"- Tiempo estimado: {plan.segundos:.2f} segundos\n")
+            self.texto_resultados.insert(tk.END, f"- Tiempo real: {real:.2f} segundos "
+                                                 f"({tamano * 8 / max(real, 1e-6) / 1e6:.2f} Mbps)\n")
 
             # Comparación con ruta directa (si existe)
-            clave_directa = (self.ip_local, destino)
-            if clave_directa in self.latencias and clave_directa in self.anchos_banda:
+            if plan and clave_directa in self.latencias and clave_directa in self.anchos_banda:
                 lat_directa = self.latencias[clave_directa]
                 ancho_directa = self.anchos_banda[clave_directa]
-                tiempo_directo = (tamano * 8) / ancho_directa + (lat_directa / 1000)
+                tiempo_directo = tiempo_estimado(lat_directa, ancho_directa, tamano)
 
                 self.texto_resultados.insert(tk.END, f"\n[Comparación con ruta directa]\n")
                 self.texto_resultados.insert(tk.END, f"- Latencia directa: {lat_directa:.2f} ms\n")
                 self.texto_resultados.insert(tk.END, f"- Ancho de banda directa: {ancho_directa:.2f} Mbps\n")
                 self.texto_resultados.insert(tk.END, f"- Tiempo estimado directo: {tiempo_directo:.2f} segundos\n")
 
-                diferencia = tiempo_directo - tiempo_optimo
+                diferencia = tiempo_directo - plan.segundos
                 if diferencia > 0:
                     self.texto_resultados.insert(tk.END, f"→ La ruta optimizada es más rápida por {diferencia:.2f} s\n")
                 else:
@@ -259,6 +383,31 @@ class VPNTransferGUI:
         self.dibujar_ruta(camino, "Rutas: Óptima vs. Directa", ruta_directa=ruta_directa)
 
 
+    def mostrar_progreso(self, enviados, total):
+        # Bytes que ya salieron por el socket (incluye lo que el destino tenía de un envío anterior)
+        self.barra_envio['value'] = 100 * enviados / total if total else 100
+        self.etiqueta_progreso['text'] = f"{enviados / (1024 * 1024):.1f} / {total / (1024 * 1024):.1f} MB"
+        self.root.update_idletasks()
+
+    def iniciar_multicast(self):
+        if not self.archivo_seleccionado or os.path.isdir(self.archivo_seleccionado):
+            messagebox.showerror("Error", "Seleccione un archivo")
+            return
+
+        def con_puerto(hijos):
+            return [(f"{nodo}:3843", con_puerto(nietos)) for nodo, nietos in hijos]
+
+        arbol = con_puerto(arbol_enraizado(kruskal(self.grafo_ancho_banda), self.ip_local))
+        if not arbol:
+            self.texto_resultados.insert(tk.END, "El MST no alcanza a ningún otro nodo\n")
+            return
+        self.texto_resultados.insert(tk.END, f"\nDistribuyendo por el MST desde {self.ip_local}...\n")
+        inicio = time.time()
+        resultados = enviar_multicast(self.archivo_seleccionado, arbol)
+        for nodo, estado in sorted(resultados.items()):
+            self.texto_resultados.insert(tk.END, f"- {nodo.split(':')[0]}: {estado}\n")
+        self.texto_resultados.insert(tk.END, f"[Multicast] {time.time() - inicio:.2f} s en total\n")
+
     def dibujar_ruta(self, ruta_optima, titulo, ruta_directa=None):
         frame = self.canvas_rutas
         for widget in frame.winfo_children():
@@ -349,37 +498,18 @@ class VPNTransferGUI:
         self.texto_resultados.insert(tk.END, "\n¡Transferencia completada!\n")
         self.texto_resultados.see(tk.END)
 
-def leer_metricas():
-    latencias = {}
-    anchos_banda = {}
-    nodos = set()  # Usamos un set para evitar duplicados
-
-    for archivo in glob.glob("metricas_*.csv"):
-        with open(archivo, newline='') as csvfile:
-            lector = csv.DictReader(csvfile)
-            for fila in lector:
-                origen = fila['origen']
-                destino = fila['destino']
-                clave = (origen, destino)
-
-                latencias[clave] = float(fila['latencia_ms'])
-                anchos_banda[clave] = float(fila['ancho_banda_mbps'])
-
-                nodos.add(origen)
-                nodos.add(destino)
-
-    return latencias, anchos_banda, sorted(nodos)
-
-
 ## --- Función Principal --- ##
 
 def main():
-    threading.Thread(target=start_server, daemon=True).start()
     # Configuración inicial
     parser = argparse.ArgumentParser(description="Medición de latencia y ancho de banda entre nodos")
     parser.add_argument("--local", required=True, help="IP Local")
+    parser.add_argument("--modo-servidor", choices=["hilos", "async"], default="hilos",
+                        help="Modelo de concurrencia del servidor de archivos")
     args = parser.parse_args()
 
+    threading.Thread(target=start_server, kwargs={"modo": args.modo_servidor}, daemon=True).start()
+
     metricas_latencia, metricas_ancho_banda, nodos = leer_metricas()
 
     ip_local = args.local
@@ -1,40 +1,38 @@
 import networkx as nx
 
+from grafo_csr import GrafoCSR, kruskal_csr
+
 def kruskal(grafo):
-    # Lista de aristas con sus pesos reales
-    edges = [(u, v, d['weight']) for u, v, d in grafo.to_undirected().edges(data=True)]
-    edges.sort(key=lambda x: x[2])  # Ordenar por peso
-
-    parent = {}
-    def find(n):
-        while parent[n] != n:
-            parent[n] = parent[parent[n]]
-            n = parent[n]
-        return n
-
-    def union(a, b):
-        ra, rb = find(a), find(b)
-        if ra != rb:
-            parent[rb] = ra
-            return True
-        return False
-
-    # Inicializar conjuntos
-    for nodo in grafo.nodes:
-        parent[nodo] = nodo
+    """Árbol de expansión mínima (como grafo no dirigido) según 'weight'.
 
-    mst_edges = []
-    for u, v, peso in edges:
-        if union(u, v):
-            mst_edges.append((u, v, peso))
+    Las aristas se pasan a un GrafoCSR y se ordenan y unen sobre arrays; solo las del
+    árbol vuelven a networkx, con los atributos de la arista original.
+    """
+    g = GrafoCSR.desde_networkx(grafo)
 
     # Construir nuevo grafo MST
     mst = nx.Graph()
     for nodo in grafo.nodes:
         mst.add_node(nodo)
 
-    for u, v, peso in mst_edges:
+    for u, v, _ in kruskal_csr(g):
+        u, v = g.nodos[u], g.nodos[v]
         datos_originales = grafo.get_edge_data(u, v) or grafo.get_edge_data(v, u)
         mst.add_edge(u, v, **datos_originales)
 
-    return mst
\ No newline at end of file
+    return mst
+
+
+def arbol_enraizado(mst, raiz):
+    """Recorre el árbol desde `raiz` y devuelve sus hijos como lista anidada
+    [(nodo, [(nieto, [...]), ...]), ...], el formato que usa enviar_multicast"""
+    hijos = {raiz: []}
+    pila = [raiz]
+    while pila:
+        nodo = pila.pop()
+        for vecino in mst[nodo]:
+            if vecino not in hijos:
+                hijos[vecino] = []
+                hijos[nodo].append((vecino, hijos[vecino]))
+                pila.append(vecino)
+    return hijos[raiz]
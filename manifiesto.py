@@ -0,0 +1,218 @@
+import hashlib
+import os
+import struct
+import threading
+import time
+
+from compresion import SIN_COMPRESION, comprimir, descomprimir
+from estadisticas import actual
+from transporte import POOL, recv_all
+
+# Granularidad de verificación/reanudación
+TAM_BLOQUE = 4 * 1024 * 1024
+# Bloque más grande que se acepta de un manifiesto ajeno (el tamaño lo elige el que envía)
+MAX_TAM_BLOQUE = 64 * 1024 * 1024
+LARGO_HASH = 32  # sha256
+
+_cache = {}
+_lock_cache = threading.Lock()
+
+
+class BloqueCorrupto(Exception):
+    def __init__(self, indice):
+        super().__init__(f"Checksum inválido en el bloque {indice}")
+        self.indice = indice
+
+
+def hash_bloque(datos):
+    return hashlib.sha256(datos).digest()
+
+
+def calcular_manifiesto(ruta, tam_bloque=TAM_BLOQUE):
+    """Lista con el sha256 de cada bloque de `tam_bloque` bytes del archivo"""
+    hashes = []
+    buffer = bytearray(tam_bloque)
+    vista = memoryview(buffer)
+    c = actual()
+    with open(ruta, 'rb') as f:
+        while True:
+            inicio = time.perf_counter()
+            n = f.readinto(buffer)
+            c.disco_lectura += time.perf_counter() - inicio
+            if not n:
+                break
+            hashes.append(hash_bloque(vista[:n]))
+    return hashes
+
+
+def manifiesto_de(ruta, tam_bloque=TAM_BLOQUE):
+    """calcular_manifiesto con caché en memoria; se invalida si cambian tamaño o mtime"""
+    st = os.stat(ruta)
+    clave = (os.path.abspath(ruta), tam_bloque)
+    with _lock_cache:
+        guardado = _cache.get(clave)
+    if guardado and guardado[0] == (st.st_size, st.st_mtime_ns):
+        return guardado[1]
+    hashes = calcular_manifiesto(ruta, tam_bloque)
+    with _lock_cache:
+        _cache[clave] = ((st.st_size, st.st_mtime_ns), hashes)
+    return hashes
+
+
+def clave_contenido(hashes):
+    """Identificador del contenido: sha256 de los hashes de sus bloques de TAM_BLOQUE.
+
+    Con manifiesto_de sale sin releer el archivo si el manifiesto ya estaba calculado.
+    """
+    return hashlib.sha256(b''.join(hashes)).digest()
+
+
+class HashContenido:
+    """clave_contenido calculada mientras los bytes pasan, bloque a bloque"""
+
+    def __init__(self, tam_bloque=TAM_BLOQUE):
+        self.tam_bloque = tam_bloque
+        self.hashes = []
+        self._actual = hashlib.sha256()
+        self._en_bloque = 0
+
+    def update(self, datos):
+        datos = memoryview(datos)
+        while datos:
+            parte = datos[:self.tam_bloque - self._en_bloque]
+            self._actual.update(parte)
+            self._en_bloque += len(parte)
+            datos = datos[len(parte):]
+            if self._en_bloque == self.tam_bloque:
+                self.hashes.append(self._actual.digest())
+                self._actual = hashlib.sha256()
+                self._en_bloque = 0
+
+    def digest(self):
+        hashes = self.hashes + ([self._actual.digest()] if self._en_bloque else [])
+        return clave_contenido(hashes)
+
+
+def empaquetar_manifiesto(hashes, tam_bloque=TAM_BLOQUE):
+    return struct.pack('>II', tam_bloque, len(hashes)) + b''.join(hashes)
+
+
+def leer_manifiesto(sock):
+    tam_bloque, cantidad = struct.unpack('>II', recv_all(sock, 8))
+    if not 0 < tam_bloque <= MAX_TAM_BLOQUE:
+        raise ValueError(f"Tamaño de bloque inválido en el manifiesto: {tam_bloque}")
+    datos = bytes(recv_all(sock, cantidad * LARGO_HASH))
+    return tam_bloque, [datos[i:i + LARGO_HASH] for i in range(0, len(datos), LARGO_HASH)]
+
+
+def bloques_verificados(ruta, hashes, tam_bloque, total):
+    """Cuántos bloques iniciales del archivo parcial `ruta` coinciden con el manifiesto"""
+    if not os.path.exists(ruta):
+        return 0
+    tam_parcial = os.path.getsize(ruta)
+    buffer = bytearray(tam_bloque)
+    vista = memoryview(buffer)
+    verificados = 0
+    c = actual()
+    with open(ruta, 'rb') as f:
+        for i, esperado in enumerate(hashes):
+            largo = min(tam_bloque, total - i * tam_bloque)
+            if tam_parcial < i * tam_bloque + largo:
+                break
+            inicio = time.perf_counter()
+            n = f.readinto(vista[:largo])
+            c.disco_lectura += time.perf_counter() - inicio
+            if n != largo or hash_bloque(vista[:n]) != esperado:
+                break
+            verificados += 1
+    return verificados
+
+
+def recibir_verificando(sock, f, offset, total, hashes, tam_bloque, codec=SIN_COMPRESION):
+    """Escribe en f los bytes [offset, total) comprobando el hash de cada bloque.
+
+    offset debe estar alineado a tam_bloque. Con codec != 0 cada bloque llega como una
+    trama (largo comprimido >I + datos) que se descomprime antes de verificarla.
+    Si un bloque no coincide, el archivo se recorta al inicio de ese bloque (lo anterior
+    queda verificado) y se lanza BloqueCorrupto.
+    """
+    f.seek(offset)
+    if codec != SIN_COMPRESION:
+        return _recibir_comprimido(sock, f, offset, total, hashes, tam_bloque, codec)
+    pos = offset
+    indice = offset // tam_bloque
+    c = actual()
+    with POOL.prestado() as vista:
+        while pos < total:
+            inicio = pos
+            fin = min(inicio + tam_bloque, total)
+            h = hashlib.sha256()
+            while pos < fin:
+                n = sock.recv_into(vista, min(len(vista), fin - pos))
+                if not n:
+                    raise EOFError('Socket closed prematurely')
+                c.bytes_entrada += n
+                h.update(vista[:n])
+                t = time.perf_counter()
+                f.write(vista[:n])
+                c.disco_escritura += time.perf_counter() - t
+                pos += n
+            if h.digest() != hashes[indice]:
+                f.truncate(inicio)
+                raise BloqueCorrupto(indice)
+            indice += 1
+
+
+def largo_maximo_comprimido(tam_bloque):
+    """Tope de la trama comprimida de un bloque: ningún codec expande tanto un bloque"""
+    return tam_bloque + tam_bloque // 8 + 1024
+
+
+def _recibir_comprimido(sock, f, offset, total, hashes, tam_bloque, codec):
+    pos = offset
+    indice = offset // tam_bloque
+    maximo = largo_maximo_comprimido(tam_bloque)
+    while pos < total:
+        largo = struct.unpack('>I', recv_all(sock, 4))[0]
+        # El largo viene del otro extremo: se rechaza antes de reservar memoria para leerlo
+        if largo > maximo:
+            f.truncate(pos)
+            raise ValueError(f"Trama comprimida de {largo} bytes para un bloque de {tam_bloque}")
+        esperado = min(tam_bloque, total - pos)
+        comprimido = recv_all(sock, largo)
+        try:
+            # Un byte más de lo esperado basta para saber que el bloque no es el anunciado
+            datos = descomprimir(codec, comprimido, esperado + 1)
+        except Exception:
+            datos = b''
+        if len(datos) != esperado or hash_bloque(datos) != hashes[indice]:
+            f.truncate(pos)
+            raise BloqueCorrupto(indice)
+        inicio = time.perf_counter()
+        f.write(datos)
+        actual().disco_escritura += time.perf_counter() - inicio
+        pos += len(datos)
+        indice += 1
+
+
+def enviar_comprimido(sock, f, offset, total, tam_bloque, codec, nivel=None, progreso=None):
+    """Contraparte de _recibir_comprimido: una trama comprimida por bloque desde offset.
+
+    progreso(n) recibe los bytes sin comprimir de cada bloque enviado.
+    """
+    f.seek(offset)
+    enviados = 0
+    c = actual()
+    while True:
+        inicio = time.perf_counter()
+        datos = f.read(min(tam_bloque, total - offset - enviados))
+        c.disco_lectura += time.perf_counter() - inicio
+        if not datos:
+            break
+        comprimido = comprimir(codec, datos, nivel)
+        sock.sendall(struct.pack('>I', len(comprimido)) + comprimido)
+        c.bytes_salida += 4 + len(comprimido)
+        enviados += len(datos)
+        if progreso is not None:
+            progreso(len(datos))
+    return enviados
@@ -0,0 +1,160 @@
+import atexit
+import csv
+import glob
+import ipaddress
+import os
+import socket
+import threading
+import time
+
+# Peso de cada medición pasiva en la media móvil exponencial de los CSV
+ALFA = 0.3
+# Transferencias más cortas no dan una tasa fiable (arranque lento de TCP, buffers)
+MIN_BYTES_MUESTRA = 8 * 1024 * 1024
+# Desactiva el registro de mediciones pasivas (p. ej. en pruebas)
+MUESTREO_PASIVO = True
+CAMPOS = ['origen', 'destino', 'latencia_ms', 'ancho_banda_mbps']
+# Segundos entre escrituras de las muestras pasivas acumuladas en memoria
+VOLCAR_CADA = 10
+
+_lock = threading.Lock()
+_lock_archivos = threading.Lock()
+# {(directorio, origen): [(destino, campo, valor), ...]} en orden de llegada
+_pendientes = {}
+_volcador = None
+
+
+def leer_metricas(directorio='.'):
+    latencias = {}
+    anchos_banda = {}
+    nodos = set()  # Usamos un set para evitar duplicados
+
+    for archivo in glob.glob(os.path.join(directorio, "metricas_*.csv")):
+        with open(archivo, newline='') as csvfile:
+            lector = csv.DictReader(csvfile)
+            for fila in lector:
+                origen = fila['origen']
+                destino = fila['destino']
+                clave = (origen, destino)
+
+                latencias[clave] = float(fila['latencia_ms'])
+                anchos_banda[clave] = float(fila['ancho_banda_mbps'])
+
+                nodos.add(origen)
+                nodos.add(destino)
+
+    return latencias, anchos_banda, sorted(nodos)
+
+
+def ancho_banda_ruta(nodos, directorio='.'):
+    """Mbps del enlace más lento entre nodos consecutivos según los CSV, o None si falta algún dato"""
+    _, anchos_banda, _ = leer_metricas(directorio)
+    valores = [anchos_banda.get((u, v)) for u, v in zip(nodos, nodos[1:])]
+    if not valores or any(v is None or v != v or v <= 0 for v in valores):
+        return None
+    return min(valores)
+
+
+def _es_loopback(ip):
+    try:
+        return ipaddress.ip_address(ip).is_loopback
+    except ValueError:
+        return False
+
+
+def registrar_muestra(origen, destino, latencia_ms=None, mbps=None, directorio='.'):
+    """Anota una medición pasiva del enlace origen -> destino para metricas_<origen>.csv.
+
+    La muestra queda en memoria y se escribe con las demás cada VOLCAR_CADA segundos
+    y al salir (ver volcar_muestras), así medir no cuesta reescribir el CSV en cada
+    conexión. Los enlaces de loopback no se registran.
+    """
+    global _volcador
+    if not MUESTREO_PASIVO or _es_loopback(origen) or _es_loopback(destino):
+        return
+    with _lock:
+        muestras = _pendientes.setdefault((directorio, origen), [])
+        for campo, valor in (('latencia_ms', latencia_ms), ('ancho_banda_mbps', mbps)):
+            if valor is not None:
+                muestras.append((destino, campo, valor))
+        if _volcador is None:
+            _volcador = threading.Thread(target=_volcar_periodico, daemon=True)
+            _volcador.start()
+            atexit.register(volcar_muestras)
+
+
+def _volcar_periodico():
+    while True:
+        time.sleep(VOLCAR_CADA)
+        try:
+            volcar_muestras()
+        except OSError as e:
+            print(f"[!] No se pudieron guardar las métricas pasivas: {e}")
+
+
+def volcar_muestras():
+    """Mezcla las muestras pendientes en los CSV, una escritura por archivo.
+
+    Cada valor nuevo entra con peso ALFA en una media móvil exponencial; si el CSV no
+    tenía dato (o era NaN) se toma tal cual.
+    """
+    with _lock:
+        pendientes = dict(_pendientes)
+        _pendientes.clear()
+    with _lock_archivos:
+        for (directorio, origen), muestras in pendientes.items():
+            _mezclar(os.path.join(directorio, f"metricas_{origen}.csv"), origen, muestras)
+
+
+def _mezclar(ruta, origen, muestras):
+    campos, filas = list(CAMPOS), []
+    try:
+        with open(ruta, newline='') as f:
+            lector = csv.DictReader(f)
+            campos = lector.fieldnames or campos
+            filas = list(lector)
+    except OSError:
+        pass
+    por_destino = {f['destino']: f for f in filas}
+    for destino, campo, valor in muestras:
+        fila = por_destino.get(destino)
+        if fila is None:
+            fila = {'origen': origen, 'destino': destino, 'latencia_ms': 'nan', 'ancho_banda_mbps': 'nan'}
+            por_destino[destino] = fila
+            filas.append(fila)
+        try:
+            previo = float(fila[campo])
+        except (TypeError, ValueError):
+            previo = float('nan')
+        fila[campo] = valor if previo != previo else (1 - ALFA) * previo + ALFA * valor
+    with open(ruta + '.tmp', 'w', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=campos, extrasaction='ignore')
+        escritor.writeheader()
+        escritor.writerows(filas)
+    os.replace(ruta + '.tmp', ruta)
+
+
+def conectar_midiendo(direccion, timeout=None):
+    """socket.create_connection que registra el tiempo de conexión como latencia del enlace.
+
+    Es el RTT del handshake TCP (SYN / SYN-ACK), no el tiempo hasta el primer byte:
+    no incluye lo que tarde el servidor en atender ni el envío de datos.
+    """
+    inicio = time.perf_counter()
+    sock = socket.create_connection(direccion, timeout)
+    try:
+        registrar_muestra(sock.getsockname()[0], direccion[0], latencia_ms=(time.perf_counter() - inicio) * 1000)
+    except OSError as e:
+        print(f"[!] No se pudo registrar la latencia hacia {direccion[0]}: {e}")
+    return sock
+
+
+def registrar_envio(sock, nbytes, segundos):
+    """Registra nbytes enviados por sock en `segundos` como ancho de banda del enlace hacia su extremo"""
+    if nbytes < MIN_BYTES_MUESTRA or segundos <= 0:
+        return
+    try:
+        origen, destino = sock.getsockname()[0], sock.getpeername()[0]
+        registrar_muestra(origen, destino, mbps=nbytes * 8 / segundos / 1e6)
+    except OSError as e:
+        print(f"[!] No se pudo registrar el ancho de banda: {e}")
@@ -0,0 +1,82 @@
+import os
+import threading
+
+from cliente import abrir_ruta, enviar_rango
+from dijkstra import dijkstra
+
+
+def ancho_cuello(grafo, camino):
+    """Ancho de banda (Mbps) del enlace más lento del camino"""
+    return min(grafo[u][v]['ancho_banda_real'] for u, v in zip(camino, camino[1:]))
+
+
+def rutas_disjuntas(grafo, origen, destino, k=3):
+    """Hasta k caminos sin aristas en común, del mejor al peor según `weight`.
+
+    Se busca el camino óptimo, se quitan sus aristas y se repite, así que
+    el primero coincide con el de una transferencia normal por Dijkstra.
+    """
+    restante = grafo.copy()
+    rutas = []
+    while len(rutas) < k:
+        camino, _ = dijkstra(restante, origen, destino)
+        if not camino:
+            break
+        rutas.append(camino)
+        restante.remove_edges_from(zip(camino, camino[1:]))
+    return rutas
+
+
+def repartir(tamano, pesos):
+    """Divide [0, tamano) en rangos contiguos proporcionales a `pesos`.
+
+    Devuelve una lista de (offset, largo) alineada con `pesos`; un rango puede
+    quedar vacío si su peso es despreciable.
+    """
+    total = sum(pesos)
+    rangos = []
+    offset = 0
+    for i, peso in enumerate(pesos):
+        if i == len(pesos) - 1:
+            largo = tamano - offset
+        else:
+            largo = int(tamano * peso / total)
+        rangos.append((offset, largo))
+        offset += largo
+    return rangos
+
+
+def enviar_multiruta(archivo, rutas_ip, pesos):
+    """Envía archivo repartido entre varias rutas a la vez.
+
+    rutas_ip: lista de rutas, cada una como lista de 'ip:puerto' desde el primer salto
+    hasta el destino. pesos: capacidad relativa de cada ruta (p. ej. su ancho de cuello).
+    Lanza una excepción si algún rango no llega confirmado.
+    """
+    tamano = os.path.getsize(archivo)
+    rangos = repartir(tamano, pesos)
+    resultados = [None] * len(rutas_ip)
+
+    def enviar(i, ruta, offset, largo):
+        try:
+            with abrir_ruta(ruta) as sock:
+                resultados[i] = enviar_rango(sock, archivo, offset, largo)
+        except Exception as e:
+            print(f"[ERROR] Ruta {' → '.join(ruta)} falló: {e}")
+            resultados[i] = False
+
+    hilos = []
+    for i, (ruta, (offset, largo)) in enumerate(zip(rutas_ip, rangos)):
+        if largo == 0 and i > 0:
+            resultados[i] = True
+            continue
+        print(f"[INFO] Rango [{offset}, {offset + largo}) por {' → '.join(ruta)}")
+        hilo = threading.Thread(target=enviar, args=(i, ruta, offset, largo))
+        hilo.start()
+        hilos.append(hilo)
+    for hilo in hilos:
+        hilo.join()
+
+    if not all(resultados):
+        raise Exception("Alguna ruta no completó su rango")
+    return rangos
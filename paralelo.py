@@ -0,0 +1,157 @@
+"""Envío por varios flujos TCP a la vez sobre la misma ruta (enlaces VPN con mucho BDP)."""
+import math
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+from cliente import (OP_RESPONSE, OP_SEND_RANGO, OpcodeNoSoportado, abrir_ruta, contador_progreso, enviar_archivo,
+                     enviar_por_ruta, leer_cuerpo_respuesta)
+from metricas import MIN_BYTES_MUESTRA, leer_metricas, registrar_muestra
+from transporte import enviar_desde_archivo, recv_all
+
+# Ventana con la que se estanca un flujo TCP sobre la VPN a RTT alto
+VENTANA_FLUJO = 256 * 1024
+MAX_FLUJOS = 8
+# Tramos que se reparten entre los flujos; cada uno viaja como un OP_SEND_RANGO
+TAM_TRAMO = 4 * 1024 * 1024
+# Tramos que un flujo manda sin leer sus confirmaciones
+MAX_SIN_CONFIRMAR = 32
+# Rondas de reconexión para los tramos de flujos que se cayeron
+RONDAS = 3
+
+
+def flujos_para(latencia_ms, mbps):
+    """Flujos necesarios para llenar un enlace: su BDP entre la ventana de un flujo (1..MAX_FLUJOS)"""
+    if not latencia_ms or not mbps or latencia_ms != latencia_ms or mbps != mbps:
+        return 1
+    bdp = mbps * 1e6 / 8 * latencia_ms / 1000
+    return max(1, min(MAX_FLUJOS, math.ceil(bdp / VENTANA_FLUJO)))
+
+
+def flujos_para_ruta(nodos, directorio='.'):
+    """Flujos para una ruta de IPs según las métricas.
+
+    Cada flujo es una conexión TCP distinta en cada salto (los relays terminan TCP),
+    así que manda el salto con más BDP.
+    """
+    latencias, anchos_banda, _ = leer_metricas(directorio)
+    return max((flujos_para(latencias.get((u, v)), anchos_banda.get((u, v)))
+                for u, v in zip(nodos, nodos[1:])), default=1)
+
+
+def _confirmar(sock):
+    if ord(recv_all(sock, 1)) != OP_RESPONSE:
+        raise Exception("Respuesta inesperada del servidor")
+    codigo, mensaje = leer_cuerpo_respuesta(sock)
+    if codigo == 0x02:
+        raise OpcodeNoSoportado(mensaje)
+    if codigo != 0x00:
+        raise Exception(mensaje)
+
+
+def enviar_paralelo(host, puerto, archivo, ruta=(), flujos=None, progreso=None):
+    """Envía archivo a host:puerto (o por `ruta`) repartido en tramos entre varios flujos.
+
+    Cada flujo es un túnel propio hasta el destino, así cada relay reenvía cada flujo
+    por separado. Los flujos toman el siguiente tramo libre en cuanto terminan el
+    anterior (intercalados, y el más rápido hace más), y el destino escribe cada
+    tramo en su posición. Los tramos de un flujo que se cae vuelven a la cola.
+    flujos=None lo decide flujos_para_ruta con la latencia y el ancho de banda medidos.
+    Con un solo flujo, o si el destino no soporta rangos, se usa el envío normal.
+    """
+    saltos = [f"{host}:{puerto}"] + list(ruta)
+    nombre_bytes = os.path.basename(archivo).encode()
+    tamano = os.path.getsize(archivo)
+    pendientes = deque(range(math.ceil(tamano / TAM_TRAMO)))
+    lock = threading.Lock()
+    no_soportado = []
+
+    def envio_normal():
+        if ruta:
+            return enviar_por_ruta(host, puerto, archivo, ruta, progreso=progreso)
+        return enviar_archivo(host, puerto, archivo, progreso=progreso)
+
+    primero = abrir_ruta(saltos)
+    local = primero.getsockname()[0]
+    if flujos is None:
+        flujos = flujos_para_ruta([local] + [nodo.split(':')[0] for nodo in saltos])
+    flujos = min(flujos, len(pendientes))
+    if flujos <= 1:
+        primero.close()
+        return envio_normal()
+    print(f"[INFO] Enviando {os.path.basename(archivo)} por {flujos} flujos paralelos")
+
+    avanzar = contador_progreso(progreso, 0, tamano)
+
+    def flujo(sock):
+        sin_confirmar = deque()
+        primer_tramo = True
+
+        def confirmar():
+            _confirmar(sock)
+            tramo = sin_confirmar.popleft()
+            if avanzar is not None:
+                with lock:
+                    avanzar(min(TAM_TRAMO, tamano - tramo * TAM_TRAMO))
+
+        try:
+            with sock, open(archivo, 'rb') as f:
+                while True:
+                    with lock:
+                        if not pendientes:
+                            break
+                        tramo = pendientes.popleft()
+                    sin_confirmar.append(tramo)
+                    offset = tramo * TAM_TRAMO
+                    largo = min(TAM_TRAMO, tamano - offset)
+                    sock.sendall(struct.pack(">BI", OP_SEND_RANGO, len(nombre_bytes)) + nombre_bytes +
+                                 struct.pack(">QQQ", tamano, offset, largo))
+                    enviar_desde_archivo(sock, f, offset, largo)
+                    # El primer tramo se confirma enseguida: si el destino no soporta
+                    # rangos se sabe antes de haber mandado más datos
+                    if len(sin_confirmar) >= MAX_SIN_CONFIRMAR or primer_tramo:
+                        confirmar()
+                    primer_tramo = False
+                while sin_confirmar:
+                    confirmar()
+        except Exception as e:
+            if isinstance(e, OpcodeNoSoportado):
+                no_soportado.append(e)
+            else:
+                print(f"[ERROR] Flujo paralelo interrumpido: {e}")
+            with lock:
+                pendientes.extendleft(reversed(sin_confirmar))
+
+    inicio = time.perf_counter()
+    for ronda in range(RONDAS):
+        socks = [primero] if ronda == 0 else []
+        try:
+            while len(socks) < min(flujos, len(pendientes)):
+                socks.append(abrir_ruta(saltos))
+        except OSError as e:
+            print(f"[ERROR] No se pudieron abrir más flujos: {e}")
+        if not socks:
+            break
+        hilos = [threading.Thread(target=flujo, args=(s,)) for s in socks]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        if no_soportado:
+            print("[INFO] El destino no soporta envío por rangos")
+            return envio_normal()
+        if not pendientes:
+            break
+        print(f"[INFO] Reenviando {len(pendientes)} tramos por flujos nuevos")
+    if pendientes:
+        raise Exception(f"Quedaron {len(pendientes)} tramos sin confirmar")
+
+    duracion = time.perf_counter() - inicio
+    print(f"[OK] {tamano} bytes en {duracion:.2f} s por {flujos} flujos "
+          f"({tamano * 8 / duracion / 1e6:.1f} Mbps)")
+    if not ruta and tamano >= MIN_BYTES_MUESTRA:
+        # Tasa agregada del enlace directo: mejor estimación de su capacidad que un solo flujo
+        registrar_muestra(local, host, mbps=tamano * 8 / duracion / 1e6)
+    return True
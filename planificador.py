@@ -0,0 +1,132 @@
+"""Elección de ruta por tiempo estimado de transferencia según el tamaño del archivo."""
+import heapq
+
+from dijkstra import k_caminos
+
+
+class Plan:
+    """Una ruta con su latencia total, su cuello de botella y el tiempo estimado.
+
+    Por los túneles los datos fluyen a la vez por todos los saltos, así que la ruta
+    rinde lo que su enlace más lento; la latencia sí se suma salto a salto:
+        segundos = latencia_ms / 1000 + bytes * 8 / (cuello_mbps * 10^6)
+    """
+
+    def __init__(self, camino, latencia_ms, cuello_mbps, tamano):
+        self.camino = camino
+        self.latencia_ms = latencia_ms
+        self.cuello_mbps = cuello_mbps
+        self.segundos = tiempo_estimado(latencia_ms, cuello_mbps, tamano)
+
+    def __repr__(self):
+        return (f"Plan({' -> '.join(self.camino)}, {self.latencia_ms:.1f} ms, "
+                f"{self.cuello_mbps:.1f} Mbps, {self.segundos:.2f} s)")
+
+
+def tiempo_estimado(latencia_ms, mbps, tamano):
+    return latencia_ms / 1000 + tamano * 8 / (mbps * 1e6)
+
+
+def enlaces(grafo_latencia, grafo_ancho_banda):
+    """{u: [(v, latencia_ms, mbps), ...]} con los enlaces que tienen las dos métricas"""
+    adyacencia = {}
+    for u, v, d in grafo_ancho_banda.edges(data=True):
+        if grafo_latencia.has_edge(u, v) and d.get('ancho_banda_real', 0) > 0:
+            adyacencia.setdefault(u, []).append((v, grafo_latencia[u][v]['weight'], d['ancho_banda_real']))
+    return adyacencia
+
+
+def camino_mas_ancho(adyacencia, origen, destino):
+    """Ruta con el mayor cuello de botella (widest path): (camino, Mbps) o (None, 0).
+
+    Es Dijkstra cambiando la suma por el mínimo y el heap de mínimos por uno de máximos.
+    """
+    cuellos = {origen: float('inf')}
+    previos = {origen: None}
+    heap = [(-float('inf'), origen)]
+    while heap:
+        cuello, u = heapq.heappop(heap)
+        cuello = -cuello
+        if cuello < cuellos[u]:
+            continue
+        if u == destino:
+            camino = [u]
+            while previos[camino[-1]] is not None:
+                camino.append(previos[camino[-1]])
+            camino.reverse()
+            return camino, cuello
+        for v, _, mbps in adyacencia.get(u, ()):
+            nuevo = min(cuello, mbps)
+            if nuevo > cuellos.get(v, 0):
+                cuellos[v] = nuevo
+                previos[v] = u
+                heapq.heappush(heap, (-nuevo, v))
+    return None, 0
+
+
+def _menor_latencia(adyacencia, origen, destino, minimo_mbps):
+    """Dijkstra por latencia usando solo enlaces de al menos `minimo_mbps`"""
+    distancias = {origen: 0.0}
+    previos = {origen: None}
+    heap = [(0.0, origen)]
+    while heap:
+        distancia, u = heapq.heappop(heap)
+        if distancia > distancias[u]:
+            continue
+        if u == destino:
+            camino = [u]
+            while previos[camino[-1]] is not None:
+                camino.append(previos[camino[-1]])
+            camino.reverse()
+            return camino
+        for v, latencia, mbps in adyacencia.get(u, ()):
+            nueva = distancia + latencia
+            if mbps >= minimo_mbps and nueva < distancias.get(v, float('inf')):
+                distancias[v] = nueva
+                previos[v] = u
+                heapq.heappush(heap, (nueva, v))
+    return None
+
+
+def _plan_de(adyacencia, camino, tamano):
+    latencia, cuello = 0.0, float('inf')
+    for u, v in zip(camino, camino[1:]):
+        medidas = [(l, m) for w, l, m in adyacencia.get(u, ()) if w == v]
+        if not medidas:
+            return None
+        latencia += medidas[0][0]
+        cuello = min(cuello, medidas[0][1])
+    return Plan(camino, latencia, cuello, tamano)
+
+
+def planificar(grafo_latencia, grafo_ancho_banda, origen, destino, tamano, k=1):
+    """Hasta k rutas de origen a destino ordenadas por tiempo estimado para `tamano` bytes.
+
+    Para cada umbral b (los anchos de banda medidos, de mayor a menor, empezando por el
+    cuello del camino más ancho) se busca la ruta de menor latencia que solo usa enlaces
+    de al menos b Mbps. Con archivos chicos gana la de menos latencia; con grandes, la de
+    mejor cuello. Los umbrales se dejan de probar cuando ni la latencia mínima posible
+    con ese ancho baja del k-ésimo mejor tiempo. Se suman como candidatas las k rutas de
+    menor latencia (Yen) para tener alternativas de respaldo. Devuelve una lista de Plan.
+    """
+    adyacencia = enlaces(grafo_latencia, grafo_ancho_banda)
+    _, mas_ancho = camino_mas_ancho(adyacencia, origen, destino)
+    if not mas_ancho:
+        return []
+    mas_rapido = _plan_de(adyacencia, _menor_latencia(adyacencia, origen, destino, 0), tamano)
+    planes = {tuple(mas_rapido.camino): mas_rapido}
+    umbrales = sorted({m for salientes in adyacencia.values() for _, _, m in salientes if m <= mas_ancho},
+                      reverse=True)
+    for umbral in umbrales:
+        tiempos = sorted(p.segundos for p in planes.values())
+        if len(tiempos) >= k and tiempo_estimado(mas_rapido.latencia_ms, umbral, tamano) >= tiempos[k - 1]:
+            break
+        camino = _menor_latencia(adyacencia, origen, destino, umbral)
+        if camino and tuple(camino) not in planes:
+            planes[tuple(camino)] = _plan_de(adyacencia, camino, tamano)
+    if k > 1:
+        for camino, _ in k_caminos(grafo_latencia, origen, destino, k):
+            plan = _plan_de(adyacencia, camino, tamano)
+            if plan and tuple(camino) not in planes:
+                planes[tuple(camino)] = plan
+    return sorted(planes.values(), key=lambda p: p.segundos)[:k]
@@ -0,0 +1,254 @@
+"""Reparto de un lote de transferencias entre las rutas según la capacidad de cada enlace."""
+import argparse
+import heapq
+import os
+import threading
+import time
+
+import networkx as nx
+
+from cliente import enviar_archivo, enviar_por_ruta
+from metricas import leer_metricas
+from multiruta import enviar_multiruta
+
+# Trozos en que se parte cada trabajo para repartirlo entre rutas, y tamaño mínimo de trozo
+TROZOS = 8
+TROZO_MIN = 8 * 1024 * 1024
+# Pasadas de quitar y volver a rutear cada trozo con la carga de todos los demás
+RONDAS = 3
+# Transferencias del lote en curso a la vez
+SIMULTANEOS = 16
+
+
+class PlanLote:
+    """Rutas de cada trabajo de un lote con los bytes que van por cada una.
+
+    rutas[i] es [(camino, bytes), ...] para trabajos[i]. `segundos` estima cuándo termina
+    todo el lote: el enlace más cargado tarda carga / capacidad y los demás acaban antes.
+    `cota` es un mínimo que ningún reparto puede mejorar, sacado de flujos máximos.
+    """
+
+    def __init__(self, trabajos, rutas, carga, capacidades, cota):
+        self.trabajos = trabajos
+        self.rutas = rutas
+        self.carga = carga
+        self.cota = cota
+        self.segundos = max((b / capacidades[e] for e, b in carga.items() if b), default=0.0)
+        self.cuello = max(carga, key=lambda e: carga[e] / capacidades[e]) if carga else None
+
+    def __repr__(self):
+        return (f"PlanLote({len(self.trabajos)} trabajos, {self.segundos:.2f} s estimados, "
+                f"cota {self.cota:.2f} s)")
+
+
+def capacidades_de(grafo_ancho_banda):
+    """{(u, v): bytes/s} de cada enlace con ancho de banda medido"""
+    return {(u, v): d['ancho_banda_real'] * 1e6 / 8
+            for u, v, d in grafo_ancho_banda.edges(data=True) if d.get('ancho_banda_real', 0) > 0}
+
+
+def cota_flujo(capacidades, trabajos):
+    """Segundos mínimos del lote según el flujo máximo de cada grupo de trabajos.
+
+    Lo que sale de un mismo origen no puede ir más rápido que el flujo máximo desde ese
+    origen hacia todos sus destinos juntos; igual con lo que llega a un mismo destino y con
+    cada par origen-destino. La cota es el peor de esos cocientes bytes / flujo máximo.
+    """
+    red = nx.DiGraph()
+    for (u, v), capacidad in capacidades.items():
+        red.add_edge(u, v, capacity=capacidad)
+    grupos = {}
+    for origen, destino, tamano in trabajos:
+        if origen not in red or destino not in red:
+            return float('inf')
+        for clave in (('par', origen, destino), ('origen', origen), ('destino', destino)):
+            grupo = grupos.setdefault(clave, [0, set()])
+            grupo[0] += tamano
+            grupo[1].add((origen, destino))
+    cota = 0.0
+    for bytes_, pares in grupos.values():
+        auxiliar = red.copy()
+        # Súper origen y súper destino sin límite de capacidad
+        for origen, destino in pares:
+            auxiliar.add_edge('_origen', origen)
+            auxiliar.add_edge(destino, '_destino')
+        flujo = nx.maximum_flow_value(auxiliar, '_origen', '_destino')
+        if flujo <= 0:
+            return float('inf')
+        cota = max(cota, bytes_ / flujo)
+    return cota
+
+
+def _ruta_menos_cargada(salientes, carga, capacidades, origen, destino, tamano):
+    """Ruta cuyo enlace más ocupado, sumando este trozo, termine antes (minimax).
+
+    Empates por la suma del tiempo de ocupación de sus enlaces, que evita rodeos.
+    """
+    mejores = {origen: (0.0, 0.0)}
+    previos = {origen: None}
+    heap = [(0.0, 0.0, origen)]
+    while heap:
+        maximo, suma, u = heapq.heappop(heap)
+        if (maximo, suma) > mejores[u]:
+            continue
+        if u == destino:
+            camino = [u]
+            while previos[camino[-1]] is not None:
+                camino.append(previos[camino[-1]])
+            camino.reverse()
+            return camino
+        for v in salientes.get(u, ()):
+            ocupado = (carga[(u, v)] + tamano) / capacidades[(u, v)]
+            clave = (max(maximo, ocupado), suma + ocupado)
+            if v not in mejores or clave < mejores[v]:
+                mejores[v] = clave
+                previos[v] = u
+                heapq.heappush(heap, (*clave, v))
+    return None
+
+
+def planificar_lote(grafo_ancho_banda, trabajos, trozos=TROZOS, rondas=RONDAS):
+    """Reparte trabajos [(origen, destino, bytes), ...] entre rutas para que el lote acabe antes.
+
+    Es una aproximación al flujo multiproducto de tiempo mínimo: cada trabajo se parte en
+    trozos y cada trozo, del trabajo más grande al más chico, va por la ruta cuyo enlace
+    más ocupado (con la carga que ya llevan los demás) termine antes. Así los trabajos no
+    se amontonan en el mismo enlace bueno y los grandes se reparten entre varias rutas.
+    Después, en `rondas` pasadas, se saca cada trozo y se vuelve a rutear con la carga
+    de todos los demás; se queda el mejor reparto visto. Lanza ValueError si algún
+    trabajo no tiene ruta con ancho de banda medido.
+    """
+    capacidades = capacidades_de(grafo_ancho_banda)
+    salientes = {}
+    for u, v in capacidades:
+        salientes.setdefault(u, []).append(v)
+    carga = dict.fromkeys(capacidades, 0)
+
+    def sumar(camino, tamano, signo):
+        for e in zip(camino, camino[1:]):
+            carga[e] += signo * tamano
+
+    piezas = []  # [trabajo, bytes, camino]
+    orden = sorted(range(len(trabajos)), key=lambda i: -trabajos[i][2])
+    for i in orden:
+        origen, destino, tamano = trabajos[i]
+        cantidad = max(1, min(trozos, tamano // TROZO_MIN))
+        for k in range(cantidad):
+            bytes_ = tamano // cantidad + (1 if k < tamano % cantidad else 0)
+            camino = _ruta_menos_cargada(salientes, carga, capacidades, origen, destino, bytes_)
+            if camino is None:
+                raise ValueError(f"No hay ruta con ancho de banda medido de {origen} a {destino}")
+            sumar(camino, bytes_, 1)
+            piezas.append([i, bytes_, camino])
+
+    def terminar():
+        return max((b / capacidades[e] for e, b in carga.items()), default=0.0)
+
+    mejor, mejor_t = [p[2] for p in piezas], terminar()
+    for _ in range(rondas):
+        for pieza in piezas:
+            i, bytes_, camino = pieza
+            sumar(camino, bytes_, -1)
+            pieza[2] = _ruta_menos_cargada(salientes, carga, capacidades, *trabajos[i][:2], bytes_)
+            sumar(pieza[2], bytes_, 1)
+        if terminar() < mejor_t - 1e-9:
+            mejor, mejor_t = [p[2] for p in piezas], terminar()
+        else:
+            break
+
+    carga = dict.fromkeys(capacidades, 0)
+    rutas = [{} for _ in trabajos]
+    for (i, bytes_, _), camino in zip(piezas, mejor):
+        sumar(camino, bytes_, 1)
+        rutas[i][tuple(camino)] = rutas[i].get(tuple(camino), 0) + bytes_
+    rutas = [[(list(c), b) for c, b in sorted(r.items(), key=lambda x: -x[1])] for r in rutas]
+    return PlanLote(trabajos, rutas, carga, capacidades, cota_flujo(capacidades, trabajos))
+
+
+def transferir_lote(grafo_ancho_banda, origen, envios, puerto=3843, simultaneos=SIMULTANEOS):
+    """Planifica y ejecuta envíos [(destino, archivo), ...] desde este equipo (`origen`).
+
+    Cada trabajo va por su única ruta con enviar_archivo / enviar_por_ruta, o repartido
+    entre varias con enviar_multiruta en proporción a los bytes del plan. Los trabajos
+    más grandes salen primero y hay hasta `simultaneos` en curso a la vez. Devuelve
+    (plan, {índice: 'OK' o motivo del fallo}).
+    """
+    trabajos = [(origen, destino, os.path.getsize(archivo)) for destino, archivo in envios]
+    plan = planificar_lote(grafo_ancho_banda, trabajos)
+    print(f"[INFO] Lote de {len(envios)} envíos: {plan.segundos:.2f} s estimados "
+          f"(cota por flujo máximo {plan.cota:.2f} s)")
+    pendientes = sorted(range(len(envios)), key=lambda i: trabajos[i][2])
+    resultados = {}
+    lock = threading.Lock()
+
+    def enviar(i):
+        archivo = envios[i][1]
+        rutas_ip = [[f"{nodo}:{puerto}" for nodo in camino[1:]] for camino, _ in plan.rutas[i]]
+        if len(rutas_ip) > 1:
+            enviar_multiruta(archivo, rutas_ip, [b for _, b in plan.rutas[i]])
+            return True
+        host = rutas_ip[0][0].split(':')[0]
+        if len(rutas_ip[0]) == 1:
+            return enviar_archivo(host, puerto, archivo)
+        return enviar_por_ruta(host, puerto, archivo, rutas_ip[0][1:])
+
+    def trabajador():
+        while True:
+            with lock:
+                if not pendientes:
+                    return
+                i = pendientes.pop()
+            try:
+                estado = 'OK' if enviar(i) else "el destino no confirmó el envío"
+            except Exception as e:
+                estado = f"{e}"
+            with lock:
+                resultados[i] = estado
+
+    inicio = time.time()
+    hilos = [threading.Thread(target=trabajador) for _ in range(min(simultaneos, len(envios)))]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    fallidos = {i: e for i, e in resultados.items() if e != 'OK'}
+    for i, e in sorted(fallidos.items()):
+        print(f"[ERROR] {envios[i][1]} a {envios[i][0]}: {e}")
+    print(f"[{'OK' if not fallidos else '!'}] Lote: {len(envios) - len(fallidos)}/{len(envios)} envíos "
+          f"en {time.time() - inicio:.2f} s (estimado {plan.segundos:.2f} s)")
+    return plan, resultados
+
+
+def grafo_de_metricas(directorio='.'):
+    """Grafo de ancho de banda como el de la GUI, leído de los metricas_*.csv"""
+    _, anchos_banda, nodos = leer_metricas(directorio)
+    grafo = nx.DiGraph()
+    grafo.add_nodes_from(nodos)
+    for (u, v), mbps in anchos_banda.items():
+        if mbps == mbps and mbps > 0:
+            grafo.add_edge(u, v, weight=1 / mbps, ancho_banda_real=mbps)
+    return grafo
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Envía un lote de archivos repartiendo la carga entre enlaces")
+    parser.add_argument("origen", help="IP de este equipo en la VPN")
+    parser.add_argument("envios", nargs='+', help="Envíos como destino=archivo")
+    parser.add_argument("--dir", default='.', help="Directorio con los metricas_*.csv")
+    parser.add_argument("--puerto", type=int, default=3843)
+    parser.add_argument("--solo-plan", action='store_true', help="Mostrar el plan sin enviar")
+    args = parser.parse_args()
+
+    envios = [tuple(envio.split('=', 1)) for envio in args.envios]
+    grafo = grafo_de_metricas(args.dir)
+    if args.solo_plan:
+        plan = planificar_lote(grafo, [(args.origen, d, os.path.getsize(a)) for d, a in envios])
+        for (destino, archivo), rutas in zip(envios, plan.rutas):
+            print(f"{archivo} -> {destino}")
+            for camino, bytes_ in rutas:
+                print(f"    {' -> '.join(camino)}: {bytes_ / 1e6:.1f} MB")
+        print(f"Estimado {plan.segundos:.2f} s, cota por flujo máximo {plan.cota:.2f} s, "
+              f"enlace más cargado {' -> '.join(plan.cuello or ())}")
+    else:
+        transferir_lote(grafo, args.origen, envios, args.puerto, SIMULTANEOS)
@@ -0,0 +1,134 @@
+"""Árbol de caminos mínimos desde un nodo que se repara al cambiar el peso de un enlace."""
+import heapq
+
+from tabla_rutas import invalidar
+
+
+class RutasDinamicas:
+    """Distancias y caminos mínimos desde `origen` sobre un grafo de networkx vivo.
+
+    Cada cambio de métrica pasa por actualizar(u, v, peso), que también modifica el grafo
+    y lo invalida para la tabla de rutas y las búsquedas.
+    Al estilo de Ramalingam-Reps solo se toca lo afectado:
+    - Si el enlace baja (o aparece) y acorta el camino a v, se propaga un Dijkstra
+      desde v que solo avanza mientras mejora distancias.
+    - Si sube (o desaparece) un enlace del árbol, se invalida el subárbol que colgaba de
+      v. Cada nodo del subárbol toma la mejor entrada desde fuera del subárbol y un
+      Dijkstra limitado al subárbol termina de repararlo. Si el enlace no estaba en el
+      árbol no cambia ninguna distancia.
+    `reparados` dice cuántos nodos se tocaron en la última actualización.
+    """
+
+    def __init__(self, grafo, origen):
+        self.grafo = grafo
+        self.origen = origen
+        self.reparados = 0
+        self.recalcular()
+
+    def recalcular(self):
+        """Dijkstra completo desde el origen (al crear el árbol o para comparar)"""
+        infinito = float('inf')
+        if self.origen not in self.grafo:
+            self.grafo.add_node(self.origen)
+            invalidar(self.grafo)
+        self.distancias = {nodo: infinito for nodo in self.grafo.nodes}
+        self.padres = {nodo: None for nodo in self.grafo.nodes}
+        self.hijos = {nodo: set() for nodo in self.grafo.nodes}
+        self.distancias[self.origen] = 0
+        self.reparados = self._propagar([(0, self.origen)])
+
+    def distancia(self, destino):
+        return self.distancias.get(destino, float('inf'))
+
+    def camino(self, destino):
+        """(camino, costo) como dijkstra: (None, inf) si no se llega"""
+        costo = self.distancia(destino)
+        if costo == float('inf'):
+            return None, costo
+        camino = [destino]
+        while self.padres[camino[-1]] is not None:
+            camino.append(self.padres[camino[-1]])
+        camino.reverse()
+        return camino, costo
+
+    def actualizar(self, u, v, peso=None, **datos):
+        """Fija el 'weight' del enlace u -> v (None lo quita) y repara el árbol"""
+        for nodo in (u, v):
+            if nodo not in self.distancias:
+                self.grafo.add_node(nodo)
+                self.distancias[nodo] = float('inf')
+                self.padres[nodo] = None
+                self.hijos[nodo] = set()
+        viejo = self.grafo[u][v].get('weight', 1) if self.grafo.has_edge(u, v) else None
+        if peso is None:
+            if viejo is None:
+                return
+            self.grafo.remove_edge(u, v)
+        else:
+            self.grafo.add_edge(u, v, weight=peso, **datos)
+        invalidar(self.grafo)
+        self.reparados = 0
+        if peso == viejo:
+            return
+        sentidos = [(u, v)] if self.grafo.is_directed() else [(u, v), (v, u)]
+        if peso is not None and (viejo is None or peso < viejo):
+            for a, b in sentidos:
+                if self.distancias[a] + peso < self.distancias[b]:
+                    self._colgar(b, a, self.distancias[a] + peso)
+                    self.reparados += self._propagar([(self.distancias[b], b)])
+        else:
+            for a, b in sentidos:
+                if self.padres[b] == a:
+                    self.reparados += self._reparar(b)
+
+    def _colgar(self, nodo, padre, distancia):
+        if self.padres[nodo] is not None:
+            self.hijos[self.padres[nodo]].discard(nodo)
+        self.padres[nodo] = padre
+        self.hijos[padre].add(nodo)
+        self.distancias[nodo] = distancia
+
+    def _propagar(self, heap, dentro=None):
+        """Dijkstra desde las entradas de `heap`; con `dentro`, sin salir de ese conjunto"""
+        heapq.heapify(heap)
+        cerrados = 0
+        while heap:
+            distancia, x = heapq.heappop(heap)
+            if distancia > self.distancias[x]:
+                continue
+            cerrados += 1
+            for y, d in self.grafo.adj[x].items():
+                if dentro is not None and y not in dentro:
+                    continue
+                nueva = distancia + d.get('weight', 1)
+                if nueva < self.distancias[y]:
+                    self._colgar(y, x, nueva)
+                    heapq.heappush(heap, (nueva, y))
+        return cerrados
+
+    def _reparar(self, raiz):
+        """Recalcula el subárbol de `raiz` después de que su enlace de entrada empeoró"""
+        afectados = {raiz}
+        pendientes = [raiz]
+        while pendientes:
+            for hijo in self.hijos[pendientes.pop()]:
+                afectados.add(hijo)
+                pendientes.append(hijo)
+        infinito = float('inf')
+        for x in afectados:
+            if self.padres[x] is not None:
+                self.hijos[self.padres[x]].discard(x)
+            self.padres[x] = None
+            self.distancias[x] = infinito
+        entradas = self.grafo.pred if self.grafo.is_directed() else self.grafo.adj
+        heap = []
+        for x in afectados:
+            mejor, padre = infinito, None
+            for p, d in entradas[x].items():
+                if p not in afectados and self.distancias[p] + d.get('weight', 1) < mejor:
+                    mejor, padre = self.distancias[p] + d.get('weight', 1), p
+            if padre is not None:
+                self._colgar(x, padre, mejor)
+                heap.append((mejor, x))
+        self._propagar(heap, afectados)
+        return len(afectados)
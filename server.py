@@ -1,169 +1,890 @@
+import argparse
 import socket
 import struct
+import json
 import threading
+import time
 import os
+import shutil
+
+from admision import CODIGO_OCUPADO, COLA, OP_ADMISION, ControlAdmision
+from ajuste import ajustar, chunk_recomendado, conectar_ajustado, informe, registrar_envio
+from cache import DIRECTORIO as DIRECTORIO_CACHE, CacheContenido
+from compresion import NOMBRES, SIN_COMPRESION, disponibles
+from delta import empaquetar_firmas, firmas_de, recibir_delta
+from estadisticas import (OP_STATS, actual, cerrar_conexion, contar_error, esperando_ack, iniciar_operacion,
+                          instantanea, registrar_conexion, terminar_operacion)
+from manifiesto import (BloqueCorrupto, HashContenido, bloques_verificados, empaquetar_manifiesto,
+                         leer_manifiesto, manifiesto_de, recibir_verificando)
+import transporte
+from transporte import (POOL, PoolConexiones, cerrar_suave, configurar_chunk, enviar_desde_archivo,
+                        esperar_datos, puentear, recibir_a_archivo, recv_all, retransmitir, tasas)
 
 # Opcodes
 OP_REQUEST = 0x01
 OP_SEND = 0x02
 OP_RELAY = 0x03
 OP_RESPONSE = 0x04
+OP_SEND_RANGO = 0x05
+OP_TUNEL = 0x06
+OP_SEND_REANUDABLE = 0x07
+OP_OFFSET = 0x08
+OP_MANIFIESTO = 0x09
+OP_REQUEST_RANGO = 0x0A
+OP_HOLA = 0x0B
+OP_LOTE = 0x0C
+OP_MULTICAST = 0x0D
+OP_FIRMAS = 0x0E
+OP_DELTA = 0x0F
+OP_RELAY_CACHE = 0x10
+# OP_STATS = 0x11 (definido en estadisticas), OP_ADMISION = 0x12 (definido en admision)
+
+NOMBRES_OPCODES = {valor: nombre for nombre, valor in list(globals().items()) if nombre.startswith('OP_')}
+
+# Opcodes que mueven datos de archivo y necesitan turno del control de admisión.
+# OP_TUNEL no: la sesión de un túnel puede quedar ociosa en el pool y el turno lo pide el destino.
+OPS_TRANSFERENCIA = {OP_REQUEST, OP_SEND, OP_RELAY, OP_SEND_RANGO, OP_SEND_REANUDABLE, OP_REQUEST_RANGO,
+                     OP_LOTE, OP_MULTICAST, OP_DELTA, OP_RELAY_CACHE}
+
+# Tipos de entrada dentro de un OP_LOTE
+ENTRADA_FIN = 0x00
+ENTRADA_ARCHIVO = 0x01
+ENTRADA_DIRECTORIO = 0x02
+
+# Códigos de OP_RESPONSE: 0x00 OK, 0x01 error, 0x02 opcode no soportado
 
 HOST = '0.0.0.0'
 PORT = 3843
 
+# Una sesión sin opcodes durante este tiempo se cierra (keep-alive del servidor)
+TIEMPO_INACTIVO = 300
+# Segundos que se guarda un turno de OP_ADMISION esperando la transferencia que lo pidió
+ESPERA_TURNO = 10
+
+# Conexiones reutilizables hacia el siguiente salto de OP_RELAY
+POOL_SALIDA = PoolConexiones()
+
+# Caché de contenido de los relays (None = desactivada, ver configurar_cache)
+CACHE = None
+# Prefijo con el que OP_REQUEST pide un contenido de la caché por su clave
+PREFIJO_CACHE = 'sha256:'
+
+
+# Control de admisión (None = sin límite de transferencias, ver configurar_admision)
+ADMISION = None
+
+# Rangos ya escritos de cada archivo que llega por OP_SEND_RANGO: {nombre: (total, [(inicio, fin), ...])}
+_rangos = {}
+_lock_rangos = threading.Lock()
+
+
+def configurar_admision(maximo, cola):
+    global ADMISION
+    ADMISION = ControlAdmision(maximo, cola)
+    print(f"[*] Admisión: {maximo} transferencias simultáneas, cola de {cola}")
+
+
+def configurar_cache(directorio=DIRECTORIO_CACHE, capacidad_mb=1024):
+    global CACHE
+    CACHE = CacheContenido(directorio, int(capacidad_mb * 1024 * 1024))
+    print(f"[*] Caché de relay en {directorio} ({capacidad_mb} MB)")
+
+
+def leer_nombre(conn):
+    name_len = struct.unpack('>I', recv_all(conn, 4))[0]
+    return recv_all(conn, name_len).decode()
+
+
+def leer_nodos(conn):
+    """Lista de saltos: 1 byte con la cantidad y cada nodo como 'ip:puerto' en 22 bytes"""
+    node_count = ord(recv_all(conn, 1))
+    return [recv_all(conn, 22).decode().strip() for _ in range(node_count)]
+
+
+def empaquetar_nodos(nodes):
+    # pad/truncate each to 22 bytes if needed
+    return struct.pack('B', len(nodes)) + b''.join(ip_p.ljust(22).encode() for ip_p in nodes)
+
+
+def leer_arbol(conn):
+    """Subárbol de multicast: 1 byte con la cantidad de hijos y, por cada uno, el nodo
+    en 22 bytes seguido de su propio subárbol. Devuelve [(nodo, subarbol), ...]"""
+    hijos = []
+    for _ in range(ord(recv_all(conn, 1))):
+        nodo = recv_all(conn, 22).decode().strip()
+        hijos.append((nodo, leer_arbol(conn)))
+    return hijos
+
+
+def empaquetar_arbol(hijos):
+    return struct.pack('B', len(hijos)) + b''.join(
+        nodo.ljust(22).encode() + empaquetar_arbol(subarbol) for nodo, subarbol in hijos)
+
+
+def nodos_arbol(nodo, subarbol):
+    """El nodo y todos sus descendientes"""
+    nodos = [nodo]
+    for hijo, nietos in subarbol:
+        nodos.extend(nodos_arbol(hijo, nietos))
+    return nodos
+
+
+def responder(conn, codigo, msg):
+    if codigo not in (0x00, CODIGO_OCUPADO):
+        contar_error()
+    msg = msg.encode()
+    conn.sendall(struct.pack('>BBI', OP_RESPONSE, codigo, len(msg)) + msg)
+
+
+def leer_respuesta(s):
+    op_code = ord(recv_all(s, 1))
+    if op_code != OP_RESPONSE:
+        raise Exception("Nodo destino no respondió correctamente")
+    cod = ord(recv_all(s, 1))
+    msg_len = struct.unpack('>I', recv_all(s, 4))[0]
+    return cod, recv_all(s, msg_len).decode()
+
+
+def atender_request(conn):
+    filename = leer_nombre(conn)
+    print(f"[*] Solicitud de archivo: {filename}")
+    # Se abre antes de responder: el tamaño sale del archivo abierto, que no puede
+    # desaparecer (desalojo de la caché, borrado) a mitad del envío
+    try:
+        f = open(filename, 'rb')
+    except OSError:
+        f = None
+    if f is None and CACHE is not None and filename.startswith(PREFIJO_CACHE):
+        # 'sha256:<clave>' se sirve desde la caché de relay
+        f = CACHE.abrir(filename[len(PREFIJO_CACHE):])
+    if f is None:
+        responder(conn, 0x01, f"Archivo no encontrado: {filename}")
+        return
+
+    with f:
+        filesize = os.fstat(f.fileno()).st_size
+        conn.sendall(struct.pack('B', OP_SEND))
+        conn.sendall(struct.pack('>I', len(filename)) + filename.encode())
+        conn.sendall(struct.pack('>Q', filesize))
+        enviar_desde_archivo(conn, f)
+
+
+def abrir_sin_truncar(ruta):
+    fd = os.open(ruta, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+    return os.fdopen(fd, 'r+b')
+
+
+def atender_send(conn):
+    filename = leer_nombre(conn)
+    filesize = struct.unpack('>Q', recv_all(conn, 8))[0]
+    # Se escribe en .part y solo se renombra completo: un corte no deja un archivo truncado
+    with open(filename + '.part', 'wb') as f:
+        recibir_a_archivo(conn, f, filesize)
+    os.replace(filename + '.part', filename)
+    print(f"[+] Archivo recibido: {filename} ({filesize} bytes)")
+
+    # Enviar confirmación (código 0x00 = OK)
+    responder(conn, 0x00, "Archivo recibido correctamente")
+
+
+def atender_send_rango(conn):
+    """Recibe el rango [offset, offset+largo) de un archivo de `total` bytes.
+
+    Varias conexiones pueden escribir rangos distintos del mismo archivo a la vez
+    (transferencias multiruta), por eso el .part se abre sin truncar y cada rango se
+    escribe en su posición. Se lleva la cuenta de los rangos que llegaron completos y el
+    .part se renombra solo cuando cubren todo el archivo: si una ruta falla, no queda un
+    archivo del tamaño final con huecos en cero. Un rango que llega con el archivo ya
+    completo (un tramo reenviado al reconectar) se compara con el disco: si coincide se
+    confirma sin abrir otro .part.
+    """
+    filename = leer_nombre(conn)
+    total, offset, largo = struct.unpack('>QQQ', recv_all(conn, 24))
+    if offset + largo > total:
+        raise ValueError(f"Rango fuera del archivo: {offset}+{largo} > {total}")
+    parcial = filename + '.part'
+
+    with _lock_rangos:
+        if _rangos.get(filename, (total,))[0] != total:
+            # Otro envío del mismo nombre con otro tamaño: lo recibido no sirve
+            del _rangos[filename]
+        ya_completo = (filename not in _rangos and not os.path.exists(parcial)
+                       and os.path.isfile(filename) and os.path.getsize(filename) == total)
+        if not ya_completo:
+            _rangos.setdefault(filename, (total, []))
+    pos, distinto = offset, b''
+    if ya_completo:
+        pos, distinto = comparar_rango(conn, filename, offset, largo)
+        if pos == offset + largo:
+            print(f"[*] Rango repetido: {filename} [{offset}, {offset + largo}) ya estaba completo")
+            responder(conn, 0x00, f"Rango {offset}-{offset + largo} recibido")
+            return
+        # Contenido distinto: es un envío nuevo con el mismo nombre y tamaño. El .part
+        # parte de una copia del archivo, así lo ya comparado queda en su sitio
+        with _lock_rangos:
+            if filename not in _rangos:
+                if not os.path.exists(parcial):
+                    shutil.copyfile(filename, parcial)
+                _rangos[filename] = (total, [])
+    with abrir_sin_truncar(parcial) as f:
+        if os.fstat(f.fileno()).st_size != total:
+            f.truncate(total)
+        f.seek(pos)
+        f.write(distinto)
+        recibir_a_archivo(conn, f, offset + largo - pos - len(distinto))
+
+    with _lock_rangos:
+        recibidos = _rangos[filename][1]
+        if largo or not total:
+            recibidos = unir_rango(recibidos, offset, offset + largo)
+        completo = recibidos == [(0, total)]
+        if completo:
+            del _rangos[filename]
+            os.replace(parcial, filename)
+        else:
+            _rangos[filename] = (total, recibidos)
+    print(f"[+] Rango recibido: {filename} [{offset}, {offset + largo}) de {total} bytes"
+          f"{' (completo)' if completo else ''}")
+    responder(conn, 0x00, f"Rango {offset}-{offset + largo} recibido")
+
+
+def comparar_rango(conn, filename, offset, largo):
+    """Lee el rango de conn comparándolo con el archivo en disco.
+
+    Devuelve (pos, trozo): si todo coincide, (offset + largo, b''); si no, la posición
+    del primer trozo distinto y ese trozo (ya leído del socket). El resto queda sin leer.
+    """
+    fin = offset + largo
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        pos = offset
+        while pos < fin:
+            trozo = recv_all(conn, min(transporte.TAM_CHUNK, fin - pos))
+            if f.read(len(trozo)) != trozo:
+                return pos, trozo
+            pos += len(trozo)
+    return pos, b''
+
+
+def unir_rango(rangos, inicio, fin):
+    """Une [inicio, fin) a una lista ordenada de intervalos disjuntos"""
+    resultado = []
+    for a, b in sorted(rangos + [(inicio, fin)]):
+        if resultado and a <= resultado[-1][1]:
+            resultado[-1] = (resultado[-1][0], max(resultado[-1][1], b))
+        else:
+            resultado.append((a, b))
+    return resultado
+
+
+def atender_send_reanudable(conn):
+    """OP_SEND con manifiesto: se responde con el offset del último bloque verificado
+    del .part y se reciben solo los bytes que faltan, comprobando cada bloque."""
+    filename = leer_nombre(conn)
+    total, codec = struct.unpack('>QB', recv_all(conn, 9))
+    tam_bloque, hashes = leer_manifiesto(conn)
+    parcial = filename + '.part'
+    if codec != SIN_COMPRESION and codec not in disponibles():
+        responder(conn, 0x01, f"Codec no soportado: {codec}")
+        cerrar_suave(conn)
+        return True
+
+    offset = min(bloques_verificados(parcial, hashes, tam_bloque, total) * tam_bloque, total)
+    with abrir_sin_truncar(parcial) as f:
+        f.truncate(offset)
+        conn.sendall(struct.pack('>BQ', OP_OFFSET, offset))
+        if offset:
+            print(f"[*] Reanudando {filename} desde el byte {offset} de {total}")
+        if codec != SIN_COMPRESION:
+            print(f"[*] {filename} llega comprimido con {NOMBRES[codec]}")
+        try:
+            recibir_verificando(conn, f, offset, total, hashes, tam_bloque, codec)
+        except (BloqueCorrupto, ValueError) as e:
+            # ValueError: trama comprimida más larga de lo que puede ocupar un bloque
+            print(f"[!] {filename}: {e}")
+            responder(conn, 0x01, str(e))
+            # El cliente sigue enviando el resto: se corta la conexión y reanudará
+            return True
+
+    os.replace(parcial, filename)
+    print(f"[+] Archivo recibido: {filename} ({total} bytes, {total - offset} transferidos)")
+    responder(conn, 0x00, "Archivo recibido correctamente")
+
+
+def atender_hola(conn):
+    """Negociación de capacidades: el cliente ofrece codecs y se responde con los comunes"""
+    cantidad = ord(recv_all(conn, 1))
+    ofrecidos = set(recv_all(conn, cantidad))
+    comunes = [c for c in disponibles() if c in ofrecidos]
+    conn.sendall(struct.pack('BB', OP_HOLA, len(comunes)) + bytes(comunes))
+
+
+def atender_manifiesto(conn):
+    filename = leer_nombre(conn)
+    if not os.path.exists(filename):
+        responder(conn, 0x01, f"Archivo no encontrado: {filename}")
+        return
+    total = os.path.getsize(filename)
+    conn.sendall(struct.pack('>BQ', OP_MANIFIESTO, total) + empaquetar_manifiesto(manifiesto_de(filename)))
+
+
+def atender_request_rango(conn):
+    """OP_REQUEST desde un offset: se responde con un OP_SEND_RANGO"""
+    filename = leer_nombre(conn)
+    offset, largo = struct.unpack('>QQ', recv_all(conn, 16))
+    if not os.path.exists(filename):
+        responder(conn, 0x01, f"Archivo no encontrado: {filename}")
+        return
+    total = os.path.getsize(filename)
+    largo = max(0, min(largo, total - offset))
+    print(f"[*] Solicitud de rango: {filename} [{offset}, {offset + largo})")
+    conn.sendall(struct.pack('>BI', OP_SEND_RANGO, len(filename)) + filename.encode() +
+                 struct.pack('>QQQ', total, offset, largo))
+    if largo:
+        with open(filename, 'rb') as f:
+            enviar_desde_archivo(conn, f, offset, largo)
+
+
+def atender_firmas(conn):
+    """Firmas (suma débil + fuerte por bloque) de la copia local, para un envío delta.
+
+    Si el archivo no existe se responde con cero bloques y el emisor lo manda entero.
+    """
+    filename = leer_nombre(conn)
+    if os.path.exists(filename):
+        firmas = firmas_de(filename)
+        print(f"[*] Firmas de {filename}: {len(firmas[2])} bloques de {firmas[1]} bytes")
+    else:
+        firmas = (0, 0, [])
+    conn.sendall(struct.pack('B', OP_FIRMAS) + empaquetar_firmas(*firmas))
+
+
+def atender_delta(conn):
+    """Reconstruye el archivo con bloques de la copia local y literales del emisor.
+
+    El resultado se escribe en .part y solo reemplaza al original si su sha256
+    coincide con el que anuncia el emisor al final del flujo.
+    """
+    filename = leer_nombre(conn)
+    total, tam_bloque = struct.unpack('>QI', recv_all(conn, 12))
+    parcial = filename + '.part'
+    base = open(filename, 'rb') if os.path.exists(filename) else None
+    try:
+        with open(parcial, 'wb') as f:
+            calculado, esperado = recibir_delta(conn, base, f, tam_bloque)
+            escritos = f.tell()
+    except ValueError as e:
+        print(f"[!] {filename}: {e}")
+        responder(conn, 0x01, str(e))
+        cerrar_suave(conn)
+        return True
+    finally:
+        if base is not None:
+            base.close()
 
-def recv_all(sock, length):
-    data = b''
-    while len(data) < length:
-        more = sock.recv(length - len(data))
-        if not more:
-            raise EOFError('Socket closed prematurely')
-        data += more
-    return data
+    if calculado != esperado or escritos != total:
+        os.remove(parcial)
+        print(f"[!] {filename}: el delta no reproduce el archivo del emisor")
+        responder(conn, 0x01, "El delta no coincide con la copia local")
+        return
+    os.replace(parcial, filename)
+    print(f"[+] Archivo actualizado por delta: {filename} ({total} bytes)")
+    responder(conn, 0x00, "Archivo actualizado correctamente")
+
+
+def ruta_segura(base, relativa):
+    """Une base con una ruta relativa recibida ('a/b/c'), rechazando rutas absolutas o con '..'"""
+    partes = [p for p in relativa.replace('\\', '/').split('/') if p not in ('', '.')]
+    if relativa.startswith('/') or any(p == '..' or ':' in p for p in partes):
+        raise ValueError(f"Ruta no permitida: {relativa}")
+    return os.path.join(base, *partes)
+
+
+def atender_lote(conn):
+    """Recibe muchos archivos en un solo flujo y responde una única confirmación.
+
+    Cada entrada es: tipo (B), ruta relativa (>I + bytes), modo (>I), tamaño (>Q) y,
+    si es un archivo, sus datos. Cada archivo se escribe a disco según llega.
+    """
+    base = ruta_segura('.', leer_nombre(conn))
+    os.makedirs(base, exist_ok=True)
+    archivos = directorios = total = 0
+    while True:
+        tipo = ord(recv_all(conn, 1))
+        if tipo == ENTRADA_FIN:
+            break
+        destino = ruta_segura(base, leer_nombre(conn))
+        modo, tamano = struct.unpack('>IQ', recv_all(conn, 12))
+        if tipo == ENTRADA_DIRECTORIO:
+            os.makedirs(destino, exist_ok=True)
+            directorios += 1
+            continue
+
+        os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+        with open(destino + '.part', 'wb') as f:
+            recibir_a_archivo(conn, f, tamano)
+        os.replace(destino + '.part', destino)
+        try:
+            os.chmod(destino, modo & 0o777)
+        except OSError:
+            pass
+        archivos += 1
+        total += tamano
+
+    msg = f"{archivos} archivos y {directorios} directorios recibidos en {base} ({total} bytes)"
+    print(f"[+] Lote: {msg}")
+    responder(conn, 0x00, msg)
+
+
+def atender_multicast(conn):
+    """Guarda el archivo y lo reenvía a la vez a los hijos del árbol, chunk a chunk.
+
+    Cabecera: nombre, tamaño (>Q), el propio nodo tal como lo nombra el árbol (22 bytes)
+    y el subárbol que cuelga de él. Cada chunk recibido se escribe a disco y se manda a
+    todos los hijos antes de leer el siguiente, así el archivo baja por el árbol sin
+    esperar a que cada salto lo tenga completo. La respuesta agrega el resultado de todo
+    el subárbol: una línea 'nodo OK' o 'nodo ERROR: motivo' por nodo.
+    """
+    filename = leer_nombre(conn)
+    filesize = struct.unpack('>Q', recv_all(conn, 8))[0]
+    yo = recv_all(conn, 22).decode().strip()
+    hijos = leer_arbol(conn)
+
+    salidas = []  # (nodo, subarbol, clave, sock, sesion)
+    fallos = {}
+    for nodo, subarbol in hijos:
+        ip, puerto = nodo.split(':')
+        clave = (ip, int(puerto))
+        try:
+            s, sesion, _ = POOL_SALIDA.obtener(clave, lambda: conectar_ajustado(clave))
+            nombre = filename.encode()
+            s.sendall(struct.pack('>BI', OP_MULTICAST, len(nombre)) + nombre + struct.pack('>Q', filesize) +
+                      nodo.ljust(22).encode() + empaquetar_arbol(subarbol))
+            salidas.append((nodo, subarbol, clave, s, sesion))
+        except OSError as e:
+            for n in nodos_arbol(nodo, subarbol):
+                fallos[n] = f"no alcanzable desde {yo}: {e}"
+    print(f"[*] Multicast {filename}: reenviando a {len(salidas)} hijos")
+
+    def descartar(salida, motivo):
+        salidas.remove(salida)
+        salida[3].close()
+        for n in nodos_arbol(salida[0], salida[1]):
+            fallos[n] = motivo
+
+    c = actual()
+    try:
+        with open(filename + '.part', 'wb') as f, POOL.prestado() as vista:
+            restante = filesize
+            while restante > 0:
+                n = conn.recv_into(vista, min(len(vista), restante))
+                if not n:
+                    raise EOFError('Socket closed prematurely')
+                c.bytes_entrada += n
+                inicio = time.perf_counter()
+                f.write(vista[:n])
+                c.disco_escritura += time.perf_counter() - inicio
+                for salida in list(salidas):
+                    try:
+                        salida[3].sendall(vista[:n])
+                        c.bytes_salida += n
+                    except OSError as e:
+                        descartar(salida, f"reenvío cortado en {yo}: {e}")
+                restante -= n
+        os.replace(filename + '.part', filename)
+        print(f"[+] Archivo recibido por multicast: {filename} ({filesize} bytes)")
+
+        lineas = [f"{yo} OK"]
+        for salida in list(salidas):
+            nodo, subarbol, clave, s, sesion = salida
+            try:
+                with esperando_ack():
+                    cod, msg = leer_respuesta(s)
+            except Exception as e:
+                descartar(salida, f"sin respuesta: {e}")
+                continue
+            if cod == 0x02:
+                descartar(salida, msg)
+                continue
+            lineas.extend(msg.splitlines())
+            salidas.remove(salida)
+            POOL_SALIDA.devolver(clave, s, sesion)
+    except Exception:
+        for salida in salidas:
+            salida[3].close()
+        raise
+
+    lineas.extend(f"{n} ERROR: {motivo}" for n, motivo in fallos.items())
+    codigo = 0x00 if all(linea.endswith(' OK') for linea in lineas) else 0x01
+    responder(conn, codigo, '\n'.join(lineas))
+
+
+def atender_relay(conn):
+    filename = leer_nombre(conn)
+    nodes = leer_nodos(conn)
+    filesize = struct.unpack('>Q', recv_all(conn, 8))[0]
+
+    # Pop off the next hop
+    next_ip, next_port = nodes.pop(0).split(':')
+    next_port = int(next_port)
+
+    clave = (next_ip, next_port)
+    s = None
+    try:
+        s, sesion, reusada = POOL_SALIDA.obtener(clave, lambda: conectar_ajustado(clave))
+        if reusada:
+            print(f"[*] Reutilizando conexión con {next_ip}:{next_port}")
+        if nodes:
+            # More hops remain → forward as OP_RELAY
+            print(f"[*] Relaying to {next_ip}:{next_port} (relay, {len(nodes)} left)")
+            s.sendall(struct.pack('B', OP_RELAY))
+            s.sendall(struct.pack('>I', len(filename)) + filename.encode())
+            s.sendall(empaquetar_nodos(nodes))
+            s.sendall(struct.pack('>Q', filesize))
+        else:
+            # This is the last hop → send as OP_SEND
+            print(f"[*] Relaying to {next_ip}:{next_port} (final send)")
+            s.sendall(struct.pack('B', OP_SEND))
+            s.sendall(struct.pack('>I', len(filename)) + filename.encode())
+            s.sendall(struct.pack('>Q', filesize))
+
+        # Stream the file bytes through (splice o recv_into, sin copias por chunk)
+        duracion, escribiendo = retransmitir(conn, s, filesize)
+
+        # Esperar confirmación del siguiente nodo
+        with esperando_ack():
+            cod, msg = leer_respuesta(s)
+        if cod == 0x00:
+            print(f"[OK] Confirmación del siguiente nodo: {msg}")
+            if escribiendo >= duracion / 2:
+                # El salto de salida marcó el ritmo: la tasa es la de ese enlace
+                registrar_envio(s, filesize, duracion)
+            POOL_SALIDA.devolver(clave, s, sesion)
+        else:
+            print(f"[ERROR] Nodo intermedio falló: {msg}")
+            s.close()
+        responder(conn, cod, msg)
+
+    except Exception as e:
+        if s is not None:
+            s.close()
+        error_msg = f"Fallo al retransmitir: {e}"
+        print(f"[!] {error_msg}")
+        responder(conn, 0x01, error_msg)
+        # Parte del archivo pudo quedar sin leer: la sesión ya no está sincronizada
+        return True
+
+
+def abrir_salto_cache(filename, nodes, filesize, clave):
+    """Conecta con nodes[0] y le manda la cabecera del archivo.
+
+    Si quedan más saltos se usa OP_RELAY_CACHE, y el siguiente relay puede responder que
+    ya tiene el contenido; si no lo soporta se repite con OP_RELAY. En el último salto
+    va un OP_SEND. Devuelve (sock, sesion, clave_pool, bytes que hay que mandarle).
+    """
+    next_ip, next_port = nodes[0].split(':')
+    clave_pool = (next_ip, int(next_port))
+    nombre = struct.pack('>I', len(filename)) + filename.encode()
+    s, sesion, _ = POOL_SALIDA.obtener(clave_pool, lambda: conectar_ajustado(clave_pool))
+    if len(nodes) == 1:
+        s.sendall(struct.pack('B', OP_SEND) + nombre + struct.pack('>Q', filesize))
+        return s, sesion, clave_pool, filesize
+
+    s.sendall(struct.pack('B', OP_RELAY_CACHE) + nombre + empaquetar_nodos(nodes[1:]) +
+              struct.pack('>Q32s', filesize, clave))
+    with esperando_ack():
+        opcode = ord(recv_all(s, 1))
+    if opcode == OP_OFFSET:
+        return s, sesion, clave_pool, filesize - struct.unpack('>Q', recv_all(s, 8))[0]
+    cod = ord(recv_all(s, 1))
+    msg = recv_all(s, struct.unpack('>I', recv_all(s, 4))[0]).decode()
+    s.close()
+    if cod != 0x02:
+        raise Exception(msg)
+    s = conectar_ajustado(clave_pool)
+    s.sendall(struct.pack('B', OP_RELAY) + nombre + empaquetar_nodos(nodes[1:]) + struct.pack('>Q', filesize))
+    return s, {}, clave_pool, filesize
+
+
+def atender_relay_cache(conn):
+    """OP_RELAY con la clave de contenido del archivo (>Q tamaño + 32 bytes de clave).
+
+    Se responde OP_OFFSET con los bytes que el emisor puede saltarse: todo el archivo si
+    este relay lo tiene en caché (lo reenvía desde disco) o si algún relay posterior ya
+    lo tiene; si no, 0, y el contenido se guarda en la caché mientras se retransmite.
+    """
+    filename = leer_nombre(conn)
+    nodes = leer_nodos(conn)
+    filesize, clave = struct.unpack('>Q32s', recv_all(conn, 40))
+    # Abierto ya: un desalojo durante el handshake con el siguiente salto no lo borra
+    en_cache = CACHE.abrir(clave.hex()) if CACHE is not None else None
+    if en_cache:
+        print(f"[*] {filename} en caché ({clave.hex()[:12]}…)")
+
+    s = None
+    try:
+        s, sesion, clave_pool, pendiente = abrir_salto_cache(filename, nodes, filesize, clave)
+        print(f"[*] Relaying to {nodes[0]} ({len(nodes) - 1} left, {pendiente} bytes pendientes)")
+        if en_cache or not pendiente:
+            conn.sendall(struct.pack('>BQ', OP_OFFSET, filesize))
+            if pendiente:
+                enviar_desde_archivo(s, en_cache, 0, filesize)
+        else:
+            conn.sendall(struct.pack('>BQ', OP_OFFSET, 0))
+            if CACHE is None:
+                retransmitir(conn, s, filesize)
+            else:
+                retransmitir_a_cache(conn, s, filesize, clave)
+
+        with esperando_ack():
+            cod, msg = leer_respuesta(s)
+        if cod == 0x00:
+            print(f"[OK] Confirmación del siguiente nodo: {msg}")
+            POOL_SALIDA.devolver(clave_pool, s, sesion)
+        else:
+            print(f"[ERROR] Nodo intermedio falló: {msg}")
+            s.close()
+        responder(conn, cod, msg)
+
+    except Exception as e:
+        if s is not None:
+            s.close()
+        error_msg = f"Fallo al retransmitir: {e}"
+        print(f"[!] {error_msg}")
+        responder(conn, 0x01, error_msg)
+        return True
+    finally:
+        if en_cache is not None:
+            en_cache.close()
+
+
+def retransmitir_a_cache(origen, destino, longitud, clave):
+    """retransmitir guardando una copia en la caché; solo se conserva si la clave coincide"""
+    hasher = HashContenido()
+    c = actual()
+    with CACHE.guardando(longitud) as entrada, POOL.prestado() as vista:
+        restante = longitud
+        while restante > 0:
+            n = origen.recv_into(vista, min(len(vista), restante))
+            if not n:
+                raise EOFError('Socket closed prematurely')
+            c.bytes_entrada += n
+            destino.sendall(vista[:n])
+            c.bytes_salida += n
+            inicio = time.perf_counter()
+            entrada.write(vista[:n])
+            c.disco_escritura += time.perf_counter() - inicio
+            hasher.update(vista[:n])
+            restante -= n
+        if hasher.digest() == clave:
+            entrada.confirmar(clave.hex())
+        else:
+            print(f"[!] El contenido no coincide con su clave {clave.hex()[:12]}…, no se guarda en caché")
+
+
+def atender_tunel(conn):
+    """Conecta con el siguiente salto y copia bytes en ambos sentidos hasta que se cierre.
+
+    Cualquier opcode puede viajar por el túnel hasta el último nodo de la lista. Los bytes
+    y segundos de cada sentido van a las estadísticas (ruta de copia 'tunel'), al informe
+    de ajuste y a las métricas pasivas, igual que los de OP_RELAY. Devuelve True porque
+    la conexión queda consumida por el túnel.
+    """
+    nodes = leer_nodos(conn)
+    next_ip, next_port = nodes.pop(0).split(':')
+    next_port = int(next_port)
+    try:
+        s = conectar_ajustado((next_ip, next_port))
+    except Exception as e:
+        error_msg = f"Fallo al abrir túnel: {e}"
+        print(f"[!] {error_msg}")
+        responder(conn, 0x01, error_msg)
+        cerrar_suave(conn)
+        return True
+
+    print(f"[*] Túnel hacia {next_ip}:{next_port} ({len(nodes)} saltos restantes)")
+    with s:
+        if nodes:
+            s.sendall(struct.pack('B', OP_TUNEL) + empaquetar_nodos(nodes))
+
+        def tramo(sentido, nbytes, segundos, escribiendo):
+            # Como en OP_RELAY: si escribir marcó el ritmo, la tasa es la del enlace de salida
+            if escribiendo >= segundos / 2:
+                registrar_envio(s if sentido == 'ida' else conn, nbytes, segundos)
+
+        puentear(conn, s, tramo)
+    return True
+
+
+def sigue_conectado(conn):
+    """False si el cliente cerró la conexión (mira sin consumir lo que haya pendiente)"""
+    if not esperar_datos(conn, 0):
+        return True
+    try:
+        return conn.recv(1, socket.MSG_PEEK) != b''
+    except OSError:
+        return False
+
+
+def atender_admision(conn):
+    """Turno para la siguiente transferencia de la sesión, con su prioridad y tamaño.
+
+    Espera en la cola si están todos los huecos ocupados. Si la cola está llena responde
+    CODIGO_OCUPADO y la sesión sigue abierta para que el cliente lo vuelva a pedir. El
+    turno se libera si en ESPERA_TURNO segundos no llega una transferencia.
+    """
+    prioridad, tamano = struct.unpack('>BQ', recv_all(conn, 9))
+    if ADMISION is None or ADMISION.dentro():
+        responder(conn, 0x00, "Admitido")
+    elif ADMISION.entrar(prioridad, tamano, lambda: sigue_conectado(conn)):
+        responder(conn, 0x00, "Admitido")
+    else:
+        responder(conn, CODIGO_OCUPADO, ADMISION.resumen())
+
+
+def admitir(conn):
+    """Turno para una transferencia que no lo pidió con OP_ADMISION (p. ej. un cliente
+    antiguo o el salto anterior de un relay). Con la cola llena responde ocupado y
+    devuelve False: los datos ya vienen detrás de la cabecera y la sesión se cierra."""
+    if ADMISION is None or ADMISION.dentro():
+        return True
+    if ADMISION.entrar(sigue_ahi=lambda: sigue_conectado(conn)):
+        return True
+    responder(conn, CODIGO_OCUPADO, ADMISION.resumen())
+    cerrar_suave(conn)
+    return False
+
+
+def atender_stats(conn):
+    """Contadores del servidor en JSON: conexiones activas, bytes, esperas, disco y errores"""
+    datos = instantanea()
+    datos['rutas_copia'] = {ruta: {'bytes': b, 'segundos': seg} for ruta, (b, seg, _) in tasas().items()}
+    if CACHE is not None:
+        datos['cache'] = CACHE.estadisticas()
+    if ADMISION is not None:
+        datos['admision'] = ADMISION.estadisticas()
+    datos['ajuste'] = informe()
+    datos['chunk'] = transporte.TAM_CHUNK
+    cuerpo = json.dumps(datos).encode()
+    conn.sendall(struct.pack('>BI', OP_STATS, len(cuerpo)) + cuerpo)
+
+
+MANEJADORES = {
+    OP_REQUEST: atender_request,
+    OP_SEND: atender_send,
+    OP_RELAY: atender_relay,
+    OP_SEND_RANGO: atender_send_rango,
+    OP_TUNEL: atender_tunel,
+    OP_SEND_REANUDABLE: atender_send_reanudable,
+    OP_MANIFIESTO: atender_manifiesto,
+    OP_REQUEST_RANGO: atender_request_rango,
+    OP_HOLA: atender_hola,
+    OP_LOTE: atender_lote,
+    OP_MULTICAST: atender_multicast,
+    OP_FIRMAS: atender_firmas,
+    OP_DELTA: atender_delta,
+    OP_RELAY_CACHE: atender_relay_cache,
+    OP_STATS: atender_stats,
+    OP_ADMISION: atender_admision,
+}
 
 
 def handle_client(conn, addr):
     print(f"[+] Conectado: {addr}")
+    estado = registrar_conexion(f"{addr[0]}:{addr[1]}")
     try:
+        # La sesión atiende opcodes seguidos hasta que el cliente cierre o quede inactiva
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        ajustar(conn)
         while True:
+            # Un turno concedido por OP_ADMISION no se guarda mientras la sesión está ociosa
+            if ADMISION is not None and ADMISION.dentro() and not esperar_datos(conn, ESPERA_TURNO):
+                print(f"[*] {addr} no usó su turno en {ESPERA_TURNO} s, liberándolo")
+                ADMISION.salir()
+            if not esperar_datos(conn, TIEMPO_INACTIVO):
+                print(f"[*] Sesión inactiva con {addr}, cerrando")
+                break
             op = conn.recv(1)
             if not op:
                 break
             op = ord(op)
 
-            if op == OP_REQUEST:
-                name_len = struct.unpack('>I', recv_all(conn, 4))[0]
-                filename = recv_all(conn, name_len).decode()
-                print(f"[*] Solicitud de archivo: {filename}")
-                if os.path.exists(filename):
-                    filesize = os.path.getsize(filename)
-                    conn.sendall(struct.pack('B', OP_SEND))
-                    conn.sendall(struct.pack('>I', len(filename)) + filename.encode())
-                    conn.sendall(struct.pack('>Q', filesize))
-                    with open(filename, 'rb') as f:
-                        while chunk := f.read(4096):
-                            conn.sendall(chunk)
-                else:
-                    msg = f"Archivo no encontrado: {filename}"
-                    conn.sendall(struct.pack('B', OP_RESPONSE))
-                    conn.sendall(struct.pack('B', 0x01))
-                    conn.sendall(struct.pack('>I', len(msg)) + msg.encode())
-
-            elif op == OP_SEND:
-                name_len = struct.unpack('>I', recv_all(conn, 4))[0]
-                filename = recv_all(conn, name_len).decode()
-                filesize = struct.unpack('>Q', recv_all(conn, 8))[0]
-                with open(filename, 'wb') as f:
-                    received = 0
-                    while received < filesize:
-                        chunk = conn.recv(min(4096, filesize - received))
-                        if not chunk:
-                            break
-                        f.write(chunk)
-                        received += len(chunk)
-                print(f"[+] Archivo recibido: {filename} ({filesize} bytes)")
-
-                # Enviar confirmación
-                msg = "Archivo recibido correctamente"
-                conn.sendall(struct.pack('B', OP_RESPONSE))
-                conn.sendall(struct.pack('B', 0x00))  # Código 0x00 = OK
-                conn.sendall(struct.pack('>I', len(msg)) + msg.encode())
-
-
-            elif op == OP_RELAY:
-                # Read filename
-                name_len = struct.unpack('>I', recv_all(conn, 4))[0]
-                filename = recv_all(conn, name_len).decode()
-            
-                # Read nodes list
-                node_count = ord(recv_all(conn, 1))
-                nodes = []
-                for _ in range(node_count):
-                    ip_port = recv_all(conn, 22).decode().strip()
-                    nodes.append(ip_port)
-            
-                # Read file size
-                filesize = struct.unpack('>Q', recv_all(conn, 8))[0]
-            
-                # Pop off the next hop
-                next_ip_port = nodes.pop(0)
-                next_ip, next_port = next_ip_port.split(':')
-                next_port = int(next_port)
-            
-                try:
-                    with socket.create_connection((next_ip, next_port)) as s:
-                        if nodes:
-                            # More hops remain → forward as OP_RELAY
-                            print(f"[*] Relaying to {next_ip}:{next_port} (relay, {len(nodes)} left)")
-                            s.sendall(struct.pack('B', OP_RELAY))
-                            # filename
-                            s.sendall(struct.pack('>I', len(filename)) + filename.encode())
-                            # new node count
-                            s.sendall(struct.pack('B', len(nodes)))
-                            # remaining node list
-                            for ip_p in nodes:
-                                # pad/truncate each to 22 bytes if needed
-                                s.sendall(ip_p.ljust(22).encode())
-                            # file size
-                            s.sendall(struct.pack('>Q', filesize))
-                        else:
-                            # This is the last hop → send as OP_SEND
-                            print(f"[*] Relaying to {next_ip}:{next_port} (final send)")
-                            s.sendall(struct.pack('B', OP_SEND))
-                            s.sendall(struct.pack('>I', len(filename)) + filename.encode())
-                            s.sendall(struct.pack('>Q', filesize))
-            
-                        # Stream the file bytes through
-                        bytes_remaining = filesize
-                        while bytes_remaining > 0:
-                            chunk = recv_all(conn, min(4096, bytes_remaining))
-                            s.sendall(chunk)
-                            bytes_remaining -= len(chunk)
-
-                        # Esperar confirmación del siguiente nodo
-                        op_code = ord(recv_all(s, 1))
-                        if op_code != OP_RESPONSE:
-                            raise Exception("Nodo destino no respondió correctamente")
-
-                        cod = ord(recv_all(s, 1))
-                        msg_len = struct.unpack('>I', recv_all(s, 4))[0]
-                        msg = recv_all(s, msg_len).decode()
-
-                        if cod == 0x00:
-                            print(f"[OK] Confirmación del siguiente nodo: {msg}")
-                            conn.sendall(struct.pack('B', OP_RESPONSE))
-                            conn.sendall(struct.pack('B', 0x00))
-                            conn.sendall(struct.pack('>I', len(msg)) + msg.encode())
-                        else:
-                            print(f"[ERROR] Nodo intermedio falló: {msg}")
-                            conn.sendall(struct.pack('B', OP_RESPONSE))
-                            conn.sendall(struct.pack('B', 0x01))
-                            conn.sendall(struct.pack('>I', len(msg)) + msg.encode())
-
-                except Exception as e:
-                    error_msg = f"Fallo al retransmitir: {e}"
-                    print(f"[!] {error_msg}")
-                    conn.sendall(struct.pack('B', OP_RESPONSE))
-                    conn.sendall(struct.pack('B', 0x01))
-                    conn.sendall(struct.pack('>I', len(error_msg)) + error_msg.encode())
-
+            manejador = MANEJADORES.get(op)
+            if manejador is None:
+                responder(conn, 0x02, f"Opcode no soportado: {op:#04x}")
+                cerrar_suave(conn)
+                break
+            transferencia = op in OPS_TRANSFERENCIA
+            if not transferencia and op != OP_ADMISION and ADMISION is not None:
+                # El turno reservado era para una transferencia, no para este opcode
+                ADMISION.salir()
+            if transferencia and not admitir(conn):
+                break
+            iniciar_operacion(estado, NOMBRES_OPCODES[op])
+            fin = manejador(conn)
+            terminar_operacion(estado, registrar=op not in (OP_STATS, OP_ADMISION))
+            if transferencia and ADMISION is not None:
+                ADMISION.salir()
+            if fin:
+                break
 
     except Exception as e:
+        contar_error()
         print(f"[!] Error: {e}")
     finally:
+        terminar_operacion(estado)
+        cerrar_conexion(estado)
+        if ADMISION is not None:
+            ADMISION.salir()
         conn.close()
 
 
-def start_server():
-    print(f"[*] Iniciando servidor en {HOST}:{PORT}")
+def start_server(host=HOST, port=PORT, modo='hilos'):
+    """Inicia el servidor. modo='hilos' usa un hilo por conexión, modo='async' un único event loop"""
+    if modo == 'async':
+        from server_async import start_server_async
+        start_server_async(host, port)
+        return
+
+    print(f"[*] Iniciando servidor en {host}:{port}")
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
-        server.bind((HOST, PORT))
-        server.listen()
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((host, port))
+        server.listen(socket.SOMAXCONN)
         while True:
             conn, addr = server.accept()
             threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
 
 
 if __name__ == '__main__':
-    start_server()
+    parser = argparse.ArgumentParser(description="Servidor de transferencia de archivos")
+    parser.add_argument("--host", default=HOST, help="Dirección de escucha")
+    parser.add_argument("--puerto", type=int, default=PORT, help="Puerto TCP")
+    parser.add_argument("--modo", choices=["hilos", "async"], default="hilos",
+                        help="hilos: un hilo por conexión; async: event loop con asyncio")
+    parser.add_argument("--chunk", type=int, default=None,
+                        help="Tamaño de chunk de recepción/retransmisión en bytes (p. ej. 262144 - 4194304)")
+    parser.add_argument("--cache-mb", type=float, default=None,
+                        help="Activa la caché de contenido de los relays con este tope en MB")
+    parser.add_argument("--cache-dir", default=DIRECTORIO_CACHE, help="Directorio de la caché de relays")
+    parser.add_argument("--max-transferencias", type=int, default=None,
+                        help="Transferencias simultáneas como máximo; el resto espera en cola (sin límite si se omite)")
+    parser.add_argument("--cola", type=int, default=COLA,
+                        help="Transferencias que pueden esperar turno; con la cola llena se responde ocupado")
+    args = parser.parse_args()
+    if args.modo == 'async' and (args.cache_mb or args.max_transferencias):
+        parser.error("--modo async solo atiende OP_REQUEST, OP_SEND y OP_RELAY: "
+                     "no admite --cache-mb ni --max-transferencias")
+    if args.chunk:
+        configurar_chunk(args.chunk)
+    else:
+        # Sin --chunk, el del enlace con más BDP de las métricas
+        chunk = chunk_recomendado()
+        if chunk is not None:
+            configurar_chunk(chunk)
+            print(f"[*] Chunk ajustado al BDP de los enlaces: {chunk} bytes")
+    if args.cache_mb:
+        configurar_cache(args.cache_dir, args.cache_mb)
+    if args.max_transferencias:
+        configurar_admision(args.max_transferencias, args.cola)
+    start_server(args.host, args.puerto, args.modo)
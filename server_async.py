@@ -0,0 +1,206 @@
+import asyncio
+import os
+import struct
+import time
+
+from server import OP_REQUEST, OP_SEND, OP_RELAY, OP_RESPONSE, HOST, PORT
+from ajuste import ajustar
+import transporte
+from transporte import registrar_tasa
+
+# Modo limitado: solo los opcodes básicos. El resto (reanudación, túneles, lotes, multicast,
+# delta, caché, OP_STATS, admisión) recibe 0x02 y el cliente vuelve al envío clásico.
+OPS_ASYNC = {OP_REQUEST: 'OP_REQUEST', OP_SEND: 'OP_SEND', OP_RELAY: 'OP_RELAY'}
+
+# Tope de datos pendientes por conexión, tanto en lectura (StreamReader)
+# como en la cola de escritura del transporte. Al superarlo se aplica
+# contrapresión en vez de acumular el archivo en memoria.
+LIMITE_BUFFER = 256 * 1024
+
+
+async def leer_nombre(reader):
+    name_len = struct.unpack('>I', await reader.readexactly(4))[0]
+    return (await reader.readexactly(name_len)).decode()
+
+
+async def responder(writer, codigo, msg):
+    msg = msg.encode()
+    writer.write(struct.pack('>BBI', OP_RESPONSE, codigo, len(msg)) + msg)
+    await writer.drain()
+
+
+async def leer_respuesta(reader):
+    op_code = (await reader.readexactly(1))[0]
+    if op_code != OP_RESPONSE:
+        raise Exception("Nodo destino no respondió correctamente")
+    cod = (await reader.readexactly(1))[0]
+    msg_len = struct.unpack('>I', await reader.readexactly(4))[0]
+    msg = (await reader.readexactly(msg_len)).decode()
+    return cod, msg
+
+
+async def copiar(reader, writer, restante):
+    """Pasa exactamente `restante` bytes de reader a writer respetando los límites de buffer"""
+    while restante > 0:
+        chunk = await reader.read(min(transporte.TAM_CHUNK, restante))
+        if not chunk:
+            raise EOFError('Socket closed prematurely')
+        writer.write(chunk)
+        await writer.drain()
+        restante -= len(chunk)
+
+
+def abrir_writer(writer):
+    writer.transport.set_write_buffer_limits(high=LIMITE_BUFFER)
+    return writer
+
+
+async def atender_request(reader, writer):
+    filename = await leer_nombre(reader)
+    print(f"[*] Solicitud de archivo: {filename}")
+    if not os.path.exists(filename):
+        await responder(writer, 0x01, f"Archivo no encontrado: {filename}")
+        return
+
+    filesize = os.path.getsize(filename)
+    writer.write(struct.pack('B', OP_SEND))
+    writer.write(struct.pack('>I', len(filename)) + filename.encode())
+    writer.write(struct.pack('>Q', filesize))
+    await writer.drain()
+    with open(filename, 'rb') as f:
+        # loop.sendfile usa os.sendfile si el transporte lo permite y si no lee por bloques
+        inicio = time.perf_counter()
+        enviados = await asyncio.get_running_loop().sendfile(writer.transport, f)
+        registrar_tasa('sendfile', enviados, time.perf_counter() - inicio)
+
+
+async def atender_send(reader, writer):
+    filename = await leer_nombre(reader)
+    filesize = struct.unpack('>Q', await reader.readexactly(8))[0]
+    with open(filename + '.part', 'wb') as f:
+        received = 0
+        while received < filesize:
+            chunk = await reader.read(min(transporte.TAM_CHUNK, filesize - received))
+            if not chunk:
+                raise EOFError('Socket closed prematurely')
+            f.write(chunk)
+            received += len(chunk)
+    os.replace(filename + '.part', filename)
+    print(f"[+] Archivo recibido: {filename} ({filesize} bytes)")
+    await responder(writer, 0x00, "Archivo recibido correctamente")
+
+
+class _Descarte:
+    """Writer mínimo que descarta lo que recibe (para vaciar un payload sin destino)"""
+
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        pass
+
+
+async def atender_relay(reader, writer):
+    filename = await leer_nombre(reader)
+    node_count = (await reader.readexactly(1))[0]
+    nodes = [(await reader.readexactly(22)).decode().strip() for _ in range(node_count)]
+    filesize = struct.unpack('>Q', await reader.readexactly(8))[0]
+
+    next_ip, next_port = nodes.pop(0).split(':')
+    next_port = int(next_port)
+
+    try:
+        down_reader, down_writer = await asyncio.open_connection(next_ip, next_port, limit=LIMITE_BUFFER)
+    except Exception as e:
+        # Hay que consumir el archivo igualmente para poder responder por esta conexión
+        await copiar(reader, _Descarte(), filesize)
+        await responder(writer, 0x01, f"Fallo al retransmitir: {e}")
+        return
+
+    abrir_writer(down_writer)
+    ajustar(down_writer.get_extra_info('socket'))
+    try:
+        if nodes:
+            print(f"[*] Relaying to {next_ip}:{next_port} (relay, {len(nodes)} left)")
+            down_writer.write(struct.pack('B', OP_RELAY))
+            down_writer.write(struct.pack('>I', len(filename)) + filename.encode())
+            down_writer.write(struct.pack('B', len(nodes)))
+            for ip_p in nodes:
+                down_writer.write(ip_p.ljust(22).encode())
+        else:
+            print(f"[*] Relaying to {next_ip}:{next_port} (final send)")
+            down_writer.write(struct.pack('B', OP_SEND))
+            down_writer.write(struct.pack('>I', len(filename)) + filename.encode())
+        down_writer.write(struct.pack('>Q', filesize))
+
+        await copiar(reader, down_writer, filesize)
+
+        cod, msg = await leer_respuesta(down_reader)
+        if cod == 0x00:
+            print(f"[OK] Confirmación del siguiente nodo: {msg}")
+        else:
+            print(f"[ERROR] Nodo intermedio falló: {msg}")
+        await responder(writer, cod, msg)
+    except Exception as e:
+        error_msg = f"Fallo al retransmitir: {e}"
+        print(f"[!] {error_msg}")
+        await responder(writer, 0x01, error_msg)
+    finally:
+        down_writer.close()
+
+
+async def cerrar_suave(reader, writer, timeout=5):
+    """Equivalente a transporte.cerrar_suave: el cliente recibe la respuesta antes del cierre"""
+    async def descartar():
+        while await reader.read(transporte.TAM_CHUNK):
+            pass
+
+    try:
+        writer.write_eof()
+        await asyncio.wait_for(descartar(), timeout)
+    except (OSError, asyncio.TimeoutError):
+        pass
+
+
+async def manejar_cliente(reader, writer):
+    addr = writer.get_extra_info('peername')
+    print(f"[+] Conectado: {addr}")
+    abrir_writer(writer)
+    ajustar(writer.get_extra_info('socket'))
+    try:
+        while True:
+            op = await reader.read(1)
+            if not op:
+                break
+            op = op[0]
+
+            if op == OP_REQUEST:
+                await atender_request(reader, writer)
+            elif op == OP_SEND:
+                await atender_send(reader, writer)
+            elif op == OP_RELAY:
+                await atender_relay(reader, writer)
+            else:
+                # 0x02: el cliente puede volver a intentarlo con los opcodes básicos
+                await responder(writer, 0x02, f"Opcode no soportado: {op:#04x}")
+                await cerrar_suave(reader, writer)
+                break
+    except Exception as e:
+        print(f"[!] Error: {e}")
+    finally:
+        writer.close()
+
+
+async def servir(host=HOST, port=PORT):
+    server = await asyncio.start_server(manejar_cliente, host, port,
+                                        limit=LIMITE_BUFFER, backlog=4096,
+                                        reuse_address=True)
+    print(f"[*] Iniciando servidor async en {host}:{port}")
+    print(f"[!] Modo async limitado a {', '.join(OPS_ASYNC.values())}: sin reanudación, túneles, "
+          f"lotes, multicast, delta, caché, estadísticas ni control de admisión")
+    async with server:
+        await server.serve_forever()
+
+
+def start_server_async(host=HOST, port=PORT):
+    asyncio.run(servir(host, port))
@@ -0,0 +1,109 @@
+"""Tabla de rutas entre todos los pares de nodos, precalculada con NumPy."""
+import weakref
+
+import numpy as np
+
+# Por encima de estos nodos Floyd-Warshall (n³) deja de compensar frente a búsquedas sueltas
+MAX_NODOS = 500
+
+# Tabla de cada grafo vivo, con la versión de métricas con la que se calculó
+_tablas = weakref.WeakKeyDictionary()
+
+
+def version(grafo):
+    """Versión de las métricas del grafo; sube con cada invalidar()"""
+    return grafo.graph.get('version', 0)
+
+
+def invalidar(grafo):
+    """Avisa que cambiaron nodos o pesos del grafo: la próxima consulta recalcula la tabla.
+
+    Lo llama quien edita el grafo (RutasDinamicas.actualizar, la recarga de métricas de
+    la GUI); los grafos que se arman una vez y no se tocan no necesitan llamarlo.
+    """
+    grafo.graph['version'] = version(grafo) + 1
+
+
+def firma(grafo):
+    """Nodos y aristas con su peso (recorre todo el grafo: solo para depurar con vigente())"""
+    return (grafo.is_directed(), tuple(grafo.nodes),
+            tuple((u, v, d.get('weight', 1)) for u, v, d in grafo.edges(data=True)))
+
+
+def floyd_warshall(pesos):
+    """Caminos mínimos entre todos los pares de una matriz de adyacencia (inf = sin arista).
+
+    Cada paso k relaja a la vez todos los pares (i, j) a través de k con operaciones
+    de matriz. Devuelve (distancias, siguiente), donde siguiente[i, j] es el primer salto
+    de i hacia j (-1 si no hay camino).
+    """
+    n = len(pesos)
+    distancias = pesos.copy()
+    np.fill_diagonal(distancias, 0)
+    siguiente = np.where(np.isfinite(distancias), np.arange(n), -1)
+    for k in range(n):
+        via = distancias[:, k, None] + distancias[None, k, :]
+        mejor = via < distancias
+        distancias = np.where(mejor, via, distancias)
+        siguiente = np.where(mejor, siguiente[:, k, None], siguiente)
+    return distancias, siguiente
+
+
+class TablaRutas:
+    """Distancias y primer salto de cada par de nodos de un grafo de networkx.
+
+    Se calcula una vez con Floyd-Warshall vectorizado; luego cada consulta solo sigue
+    la matriz de siguientes saltos (coste proporcional al largo del camino). Usa el
+    atributo 'weight' de las aristas (1 si falta), igual que dijkstra.
+    """
+
+    def __init__(self, grafo):
+        self.version = version(grafo)
+        self.firma = firma(grafo)
+        self.nodos = list(grafo.nodes)
+        self.indice = {nodo: i for i, nodo in enumerate(self.nodos)}
+        pesos = np.full((len(self.nodos), len(self.nodos)), np.inf)
+        for u, v, d in grafo.edges(data=True):
+            i, j = self.indice[u], self.indice[v]
+            pesos[i, j] = min(pesos[i, j], d.get('weight', 1))
+            if not grafo.is_directed():
+                pesos[j, i] = pesos[i, j]
+        self.distancias, self.siguiente = floyd_warshall(pesos)
+
+    def vigente(self, grafo):
+        """Comprobación de depuración: False si el grafo cambió sin pasar por invalidar()"""
+        return firma(grafo) == self.firma
+
+    def camino(self, origen, destino):
+        """(camino, costo) como dijkstra: (None, inf) si no hay ruta"""
+        i, j = self.indice.get(origen), self.indice.get(destino)
+        if i is None or j is None or self.siguiente[i, j] < 0:
+            return None, float('inf')
+        camino = [origen]
+        while i != j:
+            i = int(self.siguiente[i, j])
+            camino.append(self.nodos[i])
+        return camino, float(self.distancias[self.indice[origen], j])
+
+    def rutas_desde(self, origen):
+        """{destino: (camino, costo)} para todos los destinos alcanzables desde origen"""
+        rutas = {}
+        for destino in self.nodos:
+            if destino != origen:
+                camino, costo = self.camino(origen, destino)
+                if camino:
+                    rutas[destino] = (camino, costo)
+        return rutas
+
+
+def tabla_de(grafo):
+    """TablaRutas del grafo, recalculada solo si se invalidó desde la última vez"""
+    tabla = _tablas.get(grafo)
+    if tabla is None or tabla.version != version(grafo):
+        tabla = _tablas[grafo] = TablaRutas(grafo)
+    return tabla
+
+
+def ruta(grafo, origen, destino):
+    """Igual que dijkstra(grafo, origen, destino) pero consultando la tabla precalculada"""
+    return tabla_de(grafo).camino(origen, destino)
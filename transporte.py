@@ -0,0 +1,375 @@
+import errno
+import os
+import selectors
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from estadisticas import actual
+
+# Tamaño de chunk por defecto para recepción y retransmisión (configurable)
+TAM_CHUNK = 256 * 1024
+TAM_CHUNK_MIN = 4 * 1024
+TAM_CHUNK_MAX = 16 * 1024 * 1024
+# Las copias más pequeñas se acumulan en tasas() pero no se imprimen una a una
+UMBRAL_LOG = 1024 * 1024
+# Con callback de progreso, sendfile se hace en tramos de este tamaño
+TAM_TRAMO_PROGRESO = 4 * 1024 * 1024
+# Capacidad de la tubería intermedia de splice (Linux permite ampliarla con F_SETPIPE_SZ)
+TAM_TUBERIA = 1024 * 1024
+# Segundos sin datos tras los que un túnel se considera ocioso (fin de un tramo medido)
+PAUSA_TUNEL = 0.2
+
+_tasas = {}
+_lock_tasas = threading.Lock()
+
+
+class PoolBuffers:
+    """Buffers bytearray reutilizables para recv_into; evita asignar memoria por chunk"""
+
+    def __init__(self, tamano, maximo=64):
+        self.tamano = tamano
+        self.maximo = maximo
+        self._libres = []
+        self._lock = threading.Lock()
+        self.creados = 0
+
+    def obtener(self):
+        with self._lock:
+            if self._libres:
+                return self._libres.pop()
+            self.creados += 1
+        return bytearray(self.tamano)
+
+    def devolver(self, buffer):
+        with self._lock:
+            if len(buffer) == self.tamano and len(self._libres) < self.maximo:
+                self._libres.append(buffer)
+
+    def redimensionar(self, tamano):
+        with self._lock:
+            self.tamano = tamano
+            self._libres.clear()
+
+    @contextmanager
+    def prestado(self):
+        buffer = self.obtener()
+        try:
+            yield memoryview(buffer)
+        finally:
+            self.devolver(buffer)
+
+
+POOL = PoolBuffers(TAM_CHUNK)
+
+
+def configurar_chunk(tamano):
+    """Cambia el tamaño de chunk de todo el proceso (p. ej. 256 KiB - 4 MiB)"""
+    global TAM_CHUNK
+    if not TAM_CHUNK_MIN <= tamano <= TAM_CHUNK_MAX:
+        raise ValueError(f"Tamaño de chunk fuera de rango: {tamano}")
+    TAM_CHUNK = tamano
+    POOL.redimensionar(tamano)
+
+
+def recv_all(sock, length):
+    """Lee exactamente `length` bytes con una sola reserva (sin concatenaciones cuadráticas)"""
+    data = bytearray(length)
+    recv_exacto(sock, memoryview(data))
+    return data
+
+
+def recv_exacto(sock, vista):
+    """Llena por completo la memoryview `vista` desde el socket"""
+    recibidos = 0
+    total = len(vista)
+    while recibidos < total:
+        n = sock.recv_into(vista[recibidos:])
+        if not n:
+            raise EOFError('Socket closed prematurely')
+        recibidos += n
+    actual().bytes_entrada += total
+
+
+def recibir_a_archivo(sock, f, longitud):
+    """Copia `longitud` bytes del socket al archivo usando un buffer del pool"""
+    c = actual()
+    with POOL.prestado() as vista:
+        restante = longitud
+        while restante > 0:
+            n = sock.recv_into(vista, min(len(vista), restante))
+            if not n:
+                raise EOFError('Socket closed prematurely')
+            c.bytes_entrada += n
+            inicio = time.perf_counter()
+            f.write(vista[:n])
+            c.disco_escritura += time.perf_counter() - inicio
+            restante -= n
+
+
+def registrar_tasa(ruta, nbytes, segundos):
+    """Acumula bytes/segundos por ruta de copia (sendfile, splice, recv_into...) e imprime la tasa"""
+    with _lock_tasas:
+        total = _tasas.setdefault(ruta, [0, 0.0])
+        total[0] += nbytes
+        total[1] += segundos
+    if segundos > 0 and nbytes >= UMBRAL_LOG:
+        print(f"[*] {ruta}: {nbytes} bytes en {segundos:.3f} s ({nbytes / segundos / 1e6:.1f} MB/s)")
+
+
+def tasas():
+    """Devuelve {ruta: (bytes, segundos, bytes_por_segundo)} acumulado desde el arranque"""
+    with _lock_tasas:
+        return {ruta: (b, s, b / s if s else 0.0) for ruta, (b, s) in _tasas.items()}
+
+
+def enviar_desde_archivo(sock, f, offset=0, count=None, progreso=None):
+    """Envía un archivo abierto por el socket sin copiarlo a espacio de usuario cuando se puede.
+
+    socket.sendfile usa os.sendfile si existe y, si no, cae internamente a send() con un
+    buffer fijo, así la memoria no crece con el archivo. progreso(n) se llama con los
+    bytes de cada tramo de TAM_TRAMO_PROGRESO ya entregado al socket.
+    """
+    ruta = 'sendfile' if hasattr(os, 'sendfile') else 'send'
+    inicio = time.perf_counter()
+    if progreso is None:
+        enviados = sock.sendfile(f, offset, count)
+    else:
+        if count is None:
+            count = os.fstat(f.fileno()).st_size - offset
+        enviados = 0
+        while enviados < count:
+            n = sock.sendfile(f, offset + enviados, min(TAM_TRAMO_PROGRESO, count - enviados))
+            if not n:
+                break
+            enviados += n
+            progreso(n)
+    registrar_tasa(ruta, enviados, time.perf_counter() - inicio)
+    actual().bytes_salida += enviados
+    return enviados
+
+
+def _retransmitir_splice(origen, destino, restante):
+    """socket -> tubería -> socket con os.splice; los datos nunca pasan por Python.
+
+    Devuelve los segundos bloqueado escribiendo en `destino`, o None sin haber movido
+    nada si el kernel no soporta splice para estos descriptores.
+    """
+    lectura, escritura = os.pipe()
+    try:
+        try:
+            import fcntl
+            fcntl.fcntl(escritura, fcntl.F_SETPIPE_SZ, TAM_TUBERIA)
+        except (ImportError, AttributeError, OSError):
+            pass
+        c = actual()
+        primero = True
+        escribiendo = 0.0
+        while restante > 0:
+            try:
+                movidos = os.splice(origen.fileno(), escritura, min(TAM_TUBERIA, restante))
+            except OSError as e:
+                if primero and e.errno in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+                    return None
+                raise
+            primero = False
+            if movidos == 0:
+                raise EOFError('Socket closed prematurely')
+            c.bytes_entrada += movidos
+            pendientes = movidos
+            inicio = time.perf_counter()
+            while pendientes > 0:
+                pendientes -= os.splice(lectura, destino.fileno(), pendientes)
+            escribiendo += time.perf_counter() - inicio
+            c.bytes_salida += movidos
+            restante -= movidos
+        return escribiendo
+    finally:
+        os.close(lectura)
+        os.close(escritura)
+
+
+def _retransmitir_buffer(origen, destino, restante):
+    """Copia con recv_into sobre un buffer del pool; devuelve los segundos en sendall"""
+    c = actual()
+    escribiendo = 0.0
+    with POOL.prestado() as vista:
+        while restante > 0:
+            n = origen.recv_into(vista, min(len(vista), restante))
+            if not n:
+                raise EOFError('Socket closed prematurely')
+            c.bytes_entrada += n
+            inicio = time.perf_counter()
+            destino.sendall(vista[:n])
+            escribiendo += time.perf_counter() - inicio
+            c.bytes_salida += n
+            restante -= n
+    return escribiendo
+
+
+def _splice_disponible(origen, destino):
+    # splice necesita sockets bloqueantes; con timeout Python los pone en modo no bloqueante
+    return (hasattr(os, 'splice')
+            and origen.gettimeout() is None
+            and destino.gettimeout() is None)
+
+
+def retransmitir(origen, destino, longitud):
+    """Pasa exactamente `longitud` bytes de un socket a otro por la ruta más barata disponible.
+
+    Devuelve (segundos, segundos bloqueado escribiendo en destino): si escribir se llevó
+    la mayor parte del tiempo, el límite fue el enlace de salida y no el de entrada.
+    """
+    inicio = time.perf_counter()
+    escribiendo = None
+    if _splice_disponible(origen, destino):
+        escribiendo = _retransmitir_splice(origen, destino, longitud)
+    if escribiendo is not None:
+        ruta = 'splice'
+    else:
+        ruta = 'recv_into'
+        escribiendo = _retransmitir_buffer(origen, destino, longitud)
+    duracion = time.perf_counter() - inicio
+    registrar_tasa(ruta, longitud, duracion)
+    return duracion, escribiendo
+
+
+def puentear(a, b, al_cerrar_tramo=None):
+    """Copia en ambos sentidos entre dos sockets hasta que los dos lados cierran su escritura.
+
+    En las estadísticas, lo que llega por `a` cuenta como entrada y lo que sale por `a`
+    como salida; cada sentido escribe solo su contador. Cada sentido se mide por tramos:
+    un tramo termina cuando no llega nada en PAUSA_TUNEL segundos (el túnel queda ocioso
+    entre operaciones) o al cerrar. Cada tramo se suma a tasas() como 'tunel' y se pasa
+    a al_cerrar_tramo(sentido, bytes, segundos, segundos bloqueado escribiendo), con
+    sentido 'ida' (a -> b) o 'vuelta' (b -> a), como lo que devuelve retransmitir.
+    """
+    c = actual()
+
+    def copiar(origen, destino, campo, sentido):
+        tramo = [0, 0.0, 0.0]
+
+        def cerrar_tramo():
+            if tramo[0]:
+                registrar_tasa('tunel', tramo[0], tramo[1])
+                if al_cerrar_tramo is not None:
+                    al_cerrar_tramo(sentido, *tramo)
+            tramo[:] = [0, 0.0, 0.0]
+
+        try:
+            with POOL.prestado() as vista:
+                while True:
+                    inicio = time.perf_counter()
+                    if not esperar_datos(origen, PAUSA_TUNEL):
+                        cerrar_tramo()
+                        esperar_datos(origen, None)
+                        inicio = time.perf_counter()
+                    n = origen.recv_into(vista)
+                    if not n:
+                        break
+                    escribiendo = time.perf_counter()
+                    destino.sendall(vista[:n])
+                    fin = time.perf_counter()
+                    tramo[0] += n
+                    tramo[1] += fin - inicio
+                    tramo[2] += fin - escribiendo
+                    setattr(c, campo, getattr(c, campo) + n)
+        except OSError:
+            pass
+        finally:
+            try:
+                destino.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+            cerrar_tramo()
+
+    hilo = threading.Thread(target=copiar, args=(b, a, 'bytes_salida', 'vuelta'), daemon=True)
+    hilo.start()
+    copiar(a, b, 'bytes_entrada', 'ida')
+    hilo.join()
+
+
+def cerrar_suave(sock, timeout=5):
+    """Cierra la escritura y descarta lo que el otro extremo aún esté enviando.
+
+    Cerrar un socket con datos sin leer provoca un RST que puede hacer que el cliente
+    pierda la última respuesta; así la recibe antes de ver el cierre.
+    """
+    try:
+        sock.shutdown(socket.SHUT_WR)
+        sock.settimeout(timeout)
+        with POOL.prestado() as vista:
+            while sock.recv_into(vista):
+                pass
+    except OSError:
+        pass
+
+
+class PoolConexiones:
+    """Conexiones TCP ociosas reutilizables por clave ((ip, puerto) o una ruta completa).
+
+    Cada conexión lleva un dict de sesión (p. ej. los codecs ya negociados) que se
+    conserva mientras la conexión siga en el pool.
+    """
+
+    def __init__(self, max_por_clave=4, inactividad=60):
+        self.max_por_clave = max_por_clave
+        self.inactividad = inactividad
+        self._libres = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, crear):
+        """Devuelve (sock, sesion, reusada); si no hay una conexión viva, llama a crear()"""
+        with self._lock:
+            libres = self._libres.get(clave, [])
+            while libres:
+                sock, sesion, desde = libres.pop()
+                if time.monotonic() - desde < self.inactividad and _sigue_abierta(sock):
+                    return sock, sesion, True
+                sock.close()
+        return crear(), {}, False
+
+    def devolver(self, clave, sock, sesion):
+        with self._lock:
+            libres = self._libres.setdefault(clave, [])
+            if len(libres) < self.max_por_clave:
+                libres.append((sock, sesion, time.monotonic()))
+                return
+        sock.close()
+
+    def cerrar_todo(self):
+        with self._lock:
+            for libres in self._libres.values():
+                for sock, _, _ in libres:
+                    sock.close()
+            self._libres.clear()
+
+
+def _legible(sock, timeout):
+    """True si el socket tiene algo que leer (o se cerró) antes de `timeout` segundos.
+
+    selectors usa epoll/kqueue donde los hay: select.select falla con descriptores
+    mayores que 1024, que un servidor con cientos de conexiones alcanza enseguida.
+    Lanza OSError o ValueError si el socket ya está cerrado.
+    """
+    with selectors.DefaultSelector() as selector:
+        selector.register(sock, selectors.EVENT_READ)
+        return bool(selector.select(timeout))
+
+
+def _sigue_abierta(sock):
+    # Una conexión ociosa no debería tener nada que leer: si el selector la marca como
+    # legible es que el otro extremo la cerró (o mandó algo inesperado).
+    try:
+        return not _legible(sock, 0)
+    except (OSError, ValueError):
+        return False
+
+
+def esperar_datos(sock, timeout):
+    """True si llegan datos (o el cierre) antes de `timeout` segundos"""
+    try:
+        return _legible(sock, timeout)
+    except (OSError, ValueError):
+        return True